@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import datetime
 from pathlib import Path
 
 import tldextract
@@ -79,6 +80,7 @@ Define request and response settings
 """
 
 MIDDLEWARE = [
+    'rvme.core.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -119,6 +121,53 @@ DEBUG_TOOLBAR_CONFIG = {
 
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
 
+# Number of the latest requests whose timings each process keeps for the request timings page
+REQUEST_TIMINGS_MAX_ENTRIES = 10000
+
+# Directory that profiles of admin changelists are saved to
+CHANGELIST_PROFILE_DIR = str(BASE_DIR.joinpath("profiles"))
+
+# Fraction of admin changelist requests profiled without being asked to with ?_profile=1
+CHANGELIST_PROFILE_SAMPLE_RATE = 0
+
+
+"""
+Define cache settings
+"""
+
+# Admin summary pages are cached per process against data versions held in the default
+# cache, so in production CACHES must point at a cache shared by every process.
+SUMMARY_CACHE_MAX_ENTRIES = 500
+
+# Values listed by each admin list filter, cached the same way
+LIST_FILTER_CACHE_MAX_ENTRIES = 500
+
+# Filters with more values than this show a search box instead of listing them all
+LIST_FILTER_SEARCH_THRESHOLD = 50
+
+
+"""
+Define telematics settings
+"""
+
+# Directory of the default storage that monthly archives of Events and Trips are written to
+TELEMATICS_ARCHIVE_DIR = 'telematics-archive'
+
+# Number of recent months of Events and Trips kept in the database by archive_telematics
+TELEMATICS_HOT_MONTHS = 12
+
+# Number of recent local days of raw Events kept by compact_events, older Events being kept only as
+# hourly counts
+TELEMATICS_RAW_EVENT_DAYS = 90
+
+
+"""
+Define booking settings
+"""
+
+# Length of a Booking imported without an end time, before rounding up to the next half hour
+BOOKING_DEFAULT_DURATION = datetime.timedelta(days=30)
+
 
 """
 Define applications
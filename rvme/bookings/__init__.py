@@ -0,0 +1 @@
+default_app_config = 'rvme.bookings.apps.BookingsConfig'
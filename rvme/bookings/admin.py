@@ -4,9 +4,12 @@ from django.forms import BaseInlineFormSet
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.formats import localize
+from django.utils.html import format_html, format_html_join
 from django.utils.safestring import mark_safe
 
-from .models import Booking, Car, Location, Key, KeyHistory, CarClass, CarModel
+from rvme.core.mixins import KeysetPaginationMixin, PrefetchPlanMixin
+from .models import Booking, Car, Location, Key, KeyHistory, CarClass, CarModel, CarDaySlots
+from .slots import slots_free
 
 
 class KeyHistoryInlineAdmin(admin.TabularInline):
@@ -22,11 +25,13 @@ class KeyHistoryInlineAdmin(admin.TabularInline):
 
 class KeyInlineFormSet(BaseInlineFormSet):
     def get_queryset(self):
-        qs = super(KeyInlineFormSet, self).get_queryset()
-        return qs[:20]
+        # Kept, as each form looks its instance up in it and a new slice would query again
+        if not hasattr(self, '_sliced_queryset'):
+            self._sliced_queryset = super(KeyInlineFormSet, self).get_queryset()[:20]
+        return self._sliced_queryset
 
 
-class KeyInlineAdmin(admin.TabularInline):
+class KeyInlineAdmin(PrefetchPlanMixin, admin.TabularInline):
     extra = 0
     # exclude = ['user', ]
     fields = readonly_fields = [
@@ -35,6 +40,10 @@ class KeyInlineAdmin(admin.TabularInline):
     ]
     formset = KeyInlineFormSet
     model = Key
+    prefetch_plan = {
+        'booking': ['booking__user', 'booking__car', 'booking__start_location', 'booking__end_location'],
+        'history_display': ['history'],
+    }
 
     def history_display(self, instance):
         output = []
@@ -49,12 +58,16 @@ class KeyInlineAdmin(admin.TabularInline):
 
 
 @register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(KeysetPaginationMixin, PrefetchPlanMixin, admin.ModelAdmin):
     inlines = [KeyInlineAdmin, ]
+    keyset_ordering = ['-start_time', '-id']
     list_display = [
         'user', 'id_display', 'location_display', 'car', 'start_time', 'end_time',
         'created', 'modified',
     ]
+    prefetch_plan = {
+        'location_display': ['start_location', 'end_location'],
+    }
     list_filter = [
         'user', 'start_time', 'car', 'start_location',
     ]
@@ -86,10 +99,13 @@ class BookingAdmin(admin.ModelAdmin):
 
 
 @register(Car)
-class CarAdmin(admin.ModelAdmin):
+class CarAdmin(PrefetchPlanMixin, admin.ModelAdmin):
     list_display = [
         'registration_number', 'model', 'address', 'created', 'modified'
     ]
+    prefetch_plan = {
+        'address': ['location'],
+    }
     list_filter = [
         'model__make', 'model__name', 'location',
     ]
@@ -122,15 +138,21 @@ class CarModelAdmin(admin.ModelAdmin):
 
 
 @register(Key)
-class KeyAdmin(admin.ModelAdmin):
+class KeyAdmin(KeysetPaginationMixin, PrefetchPlanMixin, admin.ModelAdmin):
     inlines = [
         KeyHistoryInlineAdmin,
     ]
+    keyset_ordering = ['-created', '-keycore_id']
     list_display = [
         'keycore_id', 'user', 'get_booking', 'get_booking_start', 'get_booking_end',
         'latest_operation', 'latest_status', 'is_put_back',
         'is_deleted', 'created', 'modified'
     ]
+    prefetch_plan = {
+        'get_booking': ['booking'],
+        'get_booking_start': ['booking'],
+        'get_booking_end': ['booking'],
+    }
     list_filter = [
         'user', 'latest_operation', 'latest_status', 'is_put_back', 'is_deleted',
     ]
@@ -170,3 +192,33 @@ class LocationAdmin(admin.ModelAdmin):
     list_display = [
         'name', 'address', 'city', 'county', 'postcode', 'created', 'modified'
     ]
+    readonly_fields = [
+        'calendar_display',
+    ]
+
+    class Media:
+        css = {
+            'all': ('css/admin.css',),
+        }
+
+    def calendar_display(self, obj):
+        if not obj.pk:
+            return ""
+        cars = list(obj.cars.all())
+        calendar = CarDaySlots.objects.calendar([car.pk for car in cars], timezone.localdate())
+        hours = format_html_join(
+            "", '<td class="datetime" colspan="2">{}</td>', (("{:02d}:00".format(hour),) for hour in range(24))
+        )
+        rows = []
+        for car in cars:
+            rows.append(format_html('<tr><th colspan="49">{}</th></tr><tr><td></td>{}</tr>', car, hours))
+            for day, slots in calendar[car.pk]:
+                cells = format_html_join(
+                    "", '<td class="{}"></td>', (("free" if free else "booked",) for free in slots_free(slots))
+                )
+                rows.append(format_html(
+                    '<tr><td class="datetime">{}</td>{}</tr>', day.strftime("%a %d %b"), cells
+                ))
+        return format_html('<table class="optimise-cars">{}</table>', mark_safe("".join(rows)))
+
+    calendar_display.short_description = "free slots (next 7 days)"
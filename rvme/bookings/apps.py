@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BookingsConfig(AppConfig):
     name = 'rvme.bookings'
+
+    def ready(self):
+        from . import signals  # noqa: F401
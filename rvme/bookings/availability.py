@@ -0,0 +1,101 @@
+import threading
+
+from django.utils import timezone
+
+from rvme.core.cache import bump_data_version, get_data_version
+from .intervals import BookingIntervalIndex, BOOKING_INTERVAL_FIELDS
+from .models import Booking, Car, CarDaySlots
+
+
+class BookingIntervalCache(object):
+    """
+    Process-wide BookingIntervalIndex of every Booking that hadn't ended when it was loaded, so
+    availability searches don't query the Bookings at all.
+
+    Bookings saved in this process are applied to the index in place. Changes made by other
+    processes are noticed from the Booking data version, and the index is then reloaded.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._version = None
+        self._since = None
+        self._lock = threading.Lock()
+
+    def get_index(self, since):
+        """
+        Returns an index holding every Booking that ends after since.
+        """
+        version = get_data_version(Booking)
+        with self._lock:
+            if self._index is None or version != self._version or since < self._since:
+                self._since = min(since, timezone.now())
+                self._index = BookingIntervalIndex.for_cars(start=self._since)
+                self._version = version
+            return self._index
+
+    def bookings_changed(self, bookings, deleted=False):
+        bump_data_version(Booking)
+        version = get_data_version(Booking)
+        with self._lock:
+            if self._index is None or version != self._version + 1 or not all(booking.pk for booking in bookings):
+                # Something else changed the Bookings too, or bulk inserted ones have no ids, so
+                # reload on the next search
+                self._index = None
+                return
+            for booking in bookings:
+                if deleted or booking.car_id is None:
+                    self._index.remove(booking.pk)
+                else:
+                    self._index.add(tuple(getattr(booking, field) for field in BOOKING_INTERVAL_FIELDS))
+            self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+
+
+booking_intervals = BookingIntervalCache()
+
+
+def free_cars_for_windows(windows, location=None, cars=None):
+    """
+    Returns a dict of each (start, end) window given to the ids of the Cars with no Booking
+    overlapping it, checking every window against the same index.
+
+    :param windows: iterable of (start, end) datetimes
+    :param location: only consider the Cars currently at this Location
+    :param cars: only consider the Cars in this queryset
+    """
+    windows = list(windows)
+    if not windows:
+        return {}
+    if cars is None:
+        cars = Car.objects.all()
+    if location is not None:
+        cars = cars.at_location(location)
+    car_ids = list(cars.values_list('pk', flat=True))
+    index = booking_intervals.get_index(min(start for start, end in windows))
+    return {
+        (start, end): [car_id for car_id in car_ids if index.is_free(car_id, start, end)]
+        for start, end in windows
+    }
+
+
+def free_cars(start, end, location=None):
+    """
+    Returns the Cars, at the Location if given, with no Booking overlapping start to end.
+    """
+    car_ids = free_cars_for_windows([(start, end)], location)[(start, end)]
+    return Car.objects.filter(pk__in=car_ids)
+
+
+def free_cars_in_slots(start, end, location=None):
+    """
+    Returns the ids of the Cars, at the Location if given, with no booked half-hour slot from
+    start to end, from the slot bitmaps rather than the Bookings.
+    """
+    cars = Car.objects.all()
+    if location is not None:
+        cars = cars.at_location(location)
+    return CarDaySlots.objects.free_car_ids(start, end, list(cars.values_list('pk', flat=True)))
@@ -0,0 +1,205 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from rvme.core.utils import round_to_next_30min
+from .models import Booking, Car, Location
+from .signals import bookings_bulk_created
+
+
+def parse_local_datetime(value):
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValueError("invalid date and time: {}".format(value))
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def parse_id(value):
+    """
+    Returns the integer id given, None if blank, or raises ValueError.
+    """
+    if value is None or str(value).strip() == '':
+        return None
+    return int(value)
+
+
+def find_overlaps(intervals):
+    """
+    Returns the pairs of (start, end, key) intervals that overlap each other, by sorting them by
+    start and sweeping along them holding the interval that ends last so far. Intervals that
+    meet end to start don't overlap.
+    """
+    overlaps = []
+    latest = None
+    for interval in sorted(intervals, key=lambda interval: interval[0]):
+        if latest and interval[0] < latest[1]:
+            overlaps.append((latest, interval))
+        if latest is None or interval[1] > latest[1]:
+            latest = interval
+    return overlaps
+
+
+class BookingImporter(object):
+    """
+    Validates a batch of Bookings as a whole and writes them with a single bulk insert, or none of
+    them if any is invalid.
+
+    Each record names its driver by id or email, and its Car, pick up and drop-off Locations by id.
+    Bookings without an end time are given one after duration (or default_duration), rounded up
+    to the next half hour. No Booking may overlap another for the same Car, whether in the batch
+    or already booked.
+    """
+
+    def __init__(self, default_duration=None):
+        self.default_duration = default_duration or settings.BOOKING_DEFAULT_DURATION
+
+    def run(self, records):
+        """
+        Returns the Bookings created, or raises ValidationError listing every problem found.
+        """
+        bookings, errors = self.build(list(records))
+        errors.extend(self.check_overlaps(bookings))
+        if errors:
+            raise ValidationError(sorted(errors, key=lambda error: error.params['row']))
+
+        with transaction.atomic():
+            Booking.objects.bulk_create(booking for row, booking in bookings)
+            bookings_bulk_created.send(sender=Booking, bookings=[booking for row, booking in bookings])
+        return [booking for row, booking in bookings]
+
+    def build(self, records):
+        """
+        Returns a list of (row number, unsaved Booking) and a list of ValidationErrors for the
+        records that couldn't be made into Bookings.
+        """
+        users = self.resolve_users(records)
+        ids = []
+        for record in records:
+            try:
+                ids.append(tuple(
+                    parse_id(record.get(field)) for field in ('car', 'start_location', 'end_location')
+                ))
+            except ValueError:
+                ids.append(None)
+        car_ids = set(Car.objects.filter(
+            pk__in={record_ids[0] for record_ids in ids if record_ids and record_ids[0]},
+        ).values_list('pk', flat=True))
+        location_ids = set(Location.objects.filter(
+            pk__in={
+                location_id for record_ids in ids if record_ids
+                for location_id in record_ids[1:] if location_id
+            },
+        ).values_list('pk', flat=True))
+
+        bookings, errors = [], []
+        for row, (record, record_ids) in enumerate(zip(records, ids), 1):
+            problems = []
+            user_id = users.get(str(record.get('user', '')).strip())
+            if user_id is None:
+                problems.append("unknown driver {}".format(record.get('user')))
+            if record_ids is None:
+                problems.append("car and locations must be given by id")
+                record_ids = (None, None, None)
+            car_id, start_location_id, end_location_id = record_ids
+            if car_id is not None and car_id not in car_ids:
+                problems.append("unknown car {}".format(car_id))
+            for location_id in (start_location_id, end_location_id):
+                if location_id is not None and location_id not in location_ids:
+                    problems.append("unknown location {}".format(location_id))
+            if start_location_id is None:
+                problems.append("no pick up location")
+
+            try:
+                start_time, end_time = self.parse_times(record)
+            except ValueError as error:
+                problems.append(str(error))
+            else:
+                if end_time <= start_time:
+                    problems.append("ends before it starts")
+
+            if problems:
+                errors.extend(
+                    ValidationError("Row %(row)s: %(problem)s", params={'row': row, 'problem': problem})
+                    for problem in problems
+                )
+                continue
+            bookings.append((row, Booking(
+                user_id=user_id,
+                car_id=car_id,
+                start_location_id=start_location_id,
+                end_location_id=end_location_id,
+                start_time=start_time,
+                end_time=end_time,
+            )))
+        return bookings, errors
+
+    def resolve_users(self, records):
+        """
+        Returns a dict of each driver given, as an id or an email address, to their user id.
+        """
+        User = get_user_model()
+        given = {str(record.get('user', '')).strip() for record in records} - {''}
+        emails = {value for value in given if '@' in value}
+        ids = {int(value) for value in given - emails if value.isdigit()}
+        users = {
+            str(user_id): user_id
+            for user_id in User.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        }
+        for user_id, email in User.objects.filter(email__in=emails).values_list('pk', 'email'):
+            users[email] = user_id
+        return users
+
+    def parse_times(self, record):
+        if not record.get('start_time'):
+            raise ValueError("no start time")
+        start_time = parse_local_datetime(record['start_time'])
+        if record.get('end_time'):
+            return start_time, parse_local_datetime(record['end_time'])
+        duration = self.default_duration
+        if record.get('duration'):
+            duration = parse_duration(record['duration'])
+            if duration is None:
+                raise ValueError("invalid duration: {}".format(record['duration']))
+        return start_time, round_to_next_30min(start_time + duration)
+
+    def check_overlaps(self, bookings):
+        """
+        Returns a ValidationError for each Booking in the batch that overlaps another for the same
+        Car, found with one sort and sweep per Car over the batch and its existing Bookings.
+        """
+        by_car = {}
+        for row, booking in bookings:
+            if booking.car_id:
+                by_car.setdefault(booking.car_id, []).append((booking.start_time, booking.end_time, row))
+        if not by_car:
+            return []
+
+        existing = Booking.objects.filter(
+            car_id__in=list(by_car),
+            start_time__lt=max(booking.end_time for row, booking in bookings),
+            end_time__gt=min(booking.start_time for row, booking in bookings),
+        ).values_list(
+            'car_id', 'start_time', 'end_time', 'pk',
+        ).order_by()
+        for car_id, start_time, end_time, booking_id in existing:
+            by_car[car_id].append((start_time, end_time, "booking {}".format(booking_id)))
+
+        errors = []
+        for car_id, intervals in by_car.items():
+            for earlier, later in find_overlaps(intervals):
+                # Batch rows are keyed by row number and existing Bookings by description
+                row, other = (later[2], earlier[2]) if isinstance(later[2], int) else (earlier[2], later[2])
+                if not isinstance(row, int):
+                    continue
+                if isinstance(other, int):
+                    other = "row {}".format(other)
+                errors.append(ValidationError(
+                    "Row %(row)s: overlaps %(other)s for car %(car)s",
+                    params={'row': row, 'other': other, 'car': car_id},
+                ))
+        return errors
@@ -0,0 +1,134 @@
+from bisect import bisect_left, bisect_right
+
+from .models import Booking
+
+# Fields held for each Booking, in the order of the tuples the index returns
+BOOKING_INTERVAL_FIELDS = ('pk', 'car_id', 'start_time', 'end_time', 'user_id')
+
+
+class BookingIntervalIndex(object):
+    """
+    In-memory index of Booking intervals for each Car, answering "which Booking held this Car at
+    this time" and "is this Car free between these times" with a binary search rather than a
+    query per lookup.
+
+    Each Car's Bookings are kept sorted by start time alongside a tree of the maximum end time of
+    each run of them, so a lookup bisects to the last Booking starting before the time and then
+    descends the tree to the latest starting one still holding the Car, skipping whole runs that
+    end before it. A single long Booking therefore can't make every lookup walk back over all the
+    Bookings that start after it.
+    """
+
+    def __init__(self, bookings=()):
+        """
+        :param bookings: iterable of (booking_id, car_id, start_time, end_time, user_id)
+        """
+        self._cars = {}
+        self._starts = {}
+        self._end_trees = {}
+        self._booking_cars = {}
+        for booking in sorted(bookings, key=lambda booking: (booking[1], booking[2])):
+            self._cars.setdefault(booking[1], []).append(booking)
+            self._booking_cars[booking[0]] = booking[1]
+        for car_id in self._cars:
+            self._index_car(car_id)
+
+    @classmethod
+    def for_cars(cls, car_ids=None, start=None, end=None):
+        """
+        Builds an index of the Bookings of the given Cars (or all Cars) overlapping start to end.
+        """
+        bookings = Booking.objects.filter(car__isnull=False)
+        if car_ids is not None:
+            bookings = bookings.filter(car_id__in=list(car_ids))
+        if start:
+            bookings = bookings.filter(end_time__gte=start)
+        if end:
+            bookings = bookings.filter(start_time__lte=end)
+        return cls(bookings.values_list(*BOOKING_INTERVAL_FIELDS).order_by())
+
+    def __len__(self):
+        return len(self._booking_cars)
+
+    def _index_car(self, car_id):
+        car_bookings = self._cars[car_id]
+        if not car_bookings:
+            del self._cars[car_id], self._starts[car_id], self._end_trees[car_id]
+            return
+        self._starts[car_id] = [booking[2] for booking in car_bookings]
+        # Implicit binary tree over the Bookings: the leaves hold their end times from index size,
+        # padded out with the earliest end, and each node holds the latest end under it
+        size = 1
+        while size < len(car_bookings):
+            size *= 2
+        ends = [booking[3] for booking in car_bookings]
+        tree = [None] * size + ends + [min(ends)] * (size - len(ends))
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._end_trees[car_id] = tree
+
+    def _last_ending_after(self, car_id, position, time, inclusive):
+        """
+        Returns the index of the latest starting of the Car's Bookings up to position that ends
+        after (or, if inclusive, at) the time given, or -1.
+        """
+        tree = self._end_trees[car_id]
+        size = len(tree) // 2
+
+        def descend(node, low, high):
+            if low > position or (tree[node] < time if inclusive else tree[node] <= time):
+                return -1
+            if node >= size:
+                return low
+            middle = (low + high) // 2
+            found = descend(2 * node + 1, middle, high)
+            return found if found >= 0 else descend(2 * node, low, middle)
+
+        return descend(1, 0, size) if position >= 0 else -1
+
+    def add(self, booking):
+        """
+        Adds or replaces a (booking_id, car_id, start_time, end_time, user_id) tuple.
+        """
+        self.remove(booking[0])
+        car_bookings = self._cars.setdefault(booking[1], [])
+        starts = self._starts.get(booking[1], [])
+        car_bookings.insert(bisect_right(starts, booking[2]), booking)
+        self._booking_cars[booking[0]] = booking[1]
+        self._index_car(booking[1])
+
+    def remove(self, booking_id):
+        car_id = self._booking_cars.pop(booking_id, None)
+        if car_id is None:
+            return
+        self._cars[car_id] = [booking for booking in self._cars[car_id] if booking[0] != booking_id]
+        self._index_car(car_id)
+
+    def lookup(self, car_id, timestamp):
+        """
+        Returns the (booking_id, car_id, start_time, end_time, user_id) of the Booking holding the
+        Car at the time given, or None. Where Bookings overlap, the latest to start wins.
+        """
+        starts = self._starts.get(car_id)
+        if not starts:
+            return None
+        position = self._last_ending_after(car_id, bisect_right(starts, timestamp) - 1, timestamp, inclusive=True)
+        return self._cars[car_id][position] if position >= 0 else None
+
+    def overlapping(self, car_id, start, end):
+        """
+        Returns the Bookings of the Car overlapping start to end, latest starting first. Bookings
+        that end exactly as the window starts, or start exactly as it ends, don't overlap it.
+        """
+        starts = self._starts.get(car_id)
+        if not starts:
+            return []
+        overlapping = []
+        position = self._last_ending_after(car_id, bisect_left(starts, end) - 1, start, inclusive=False)
+        while position >= 0:
+            overlapping.append(self._cars[car_id][position])
+            position = self._last_ending_after(car_id, position - 1, start, inclusive=False)
+        return overlapping
+
+    def is_free(self, car_id, start, end):
+        return not self.overlapping(car_id, start, end)
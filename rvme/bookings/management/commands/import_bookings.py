@@ -0,0 +1,35 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_duration
+
+from rvme.bookings.importers import BookingImporter
+from rvme.core.utils import read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a batch of Bookings from a CSV or JSON Lines file with the columns user (id or "
+        "email), car, start_location, end_location, start_time and end_time or duration, writing "
+        "none of them unless all are valid"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'], dest='file_format',
+            help="Defaults to csv for .csv files and jsonl otherwise",
+        )
+        parser.add_argument(
+            '--default-duration', type=parse_duration,
+            help="Duration of Bookings without an end time, e.g. \"7 00:00:00\" for a week",
+        )
+
+    def handle(self, *args, **options):
+        importer = BookingImporter(default_duration=options['default_duration'])
+        try:
+            bookings = importer.run(read_records(options['path'], options['file_format']))
+        except ValidationError as error:
+            for message in error.messages:
+                self.stderr.write(message)
+            raise CommandError("No bookings were imported")
+        self.stdout.write(self.style.SUCCESS("Imported {} bookings".format(len(bookings))))
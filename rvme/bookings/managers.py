@@ -1,8 +1,129 @@
-from django.db import models
+from collections import OrderedDict
+from datetime import timedelta
 
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
 
-class CarManager(models.Manager):
+from .slots import local_day_start, slot_masks
+
+
+class CarQuerySet(models.QuerySet):
+    def at_location(self, location):
+        return self.filter(location=location)
+
+    def available(self, start, end):
+        """
+        Returns the Cars with no Booking overlapping start to end. Bookings that end exactly as the
+        window starts, or start exactly as it ends, don't overlap it.
+        """
+        Booking = apps.get_model('bookings', 'Booking')
+        return self.annotate(
+            is_booked=Exists(Booking.objects.filter(
+                car=OuterRef('pk'),
+                start_time__lt=end,
+                end_time__gt=start,
+            )),
+        ).filter(
+            is_booked=False,
+        )
+
+
+class CarManager(models.Manager.from_queryset(CarQuerySet)):
     def activebookable(self):
-        return self.get_queryset().filter(
-            status="active",
+        """
+        Returns the Cars not out on a Booking at the moment.
+        """
+        now = timezone.now()
+        return self.get_queryset().available(now, now)
+
+
+class CarDaySlotsManager(models.Manager):
+    def refresh(self, car_ids, start_day, end_day):
+        """
+        Recomputes the slot bitmaps of the given Cars for the local days from start_day to end_day
+        inclusive from their Bookings.
+        """
+        Booking = apps.get_model('bookings', 'Booking')
+        car_ids = set(car_ids)
+        bookings = Booking.objects.filter(
+            car_id__in=car_ids,
+            start_time__lt=local_day_start(end_day + timedelta(days=1)),
+            end_time__gt=local_day_start(start_day),
+        ).values_list(
+            'car_id', 'start_time', 'end_time',
+        ).order_by()
+
+        day_slots = {}
+        for car_id, start_time, end_time in bookings:
+            for day, mask in slot_masks(start_time, end_time).items():
+                if start_day <= day <= end_day:
+                    day_slots[(car_id, day)] = day_slots.get((car_id, day), 0) | mask
+
+        with transaction.atomic():
+            self.filter(car_id__in=car_ids, day__gte=start_day, day__lte=end_day).delete()
+            self.bulk_create(
+                self.model(car_id=car_id, day=day, slots=slots)
+                for (car_id, day), slots in day_slots.items()
+            )
+
+    def refresh_booking(self, car_id, start_time, end_time):
+        """
+        Recomputes the slot bitmaps of the days a Booking covers, or covered before it changed.
+        """
+        if car_id and start_time and end_time:
+            days = list(slot_masks(start_time, end_time)) or [timezone.localtime(start_time).date()]
+            self.refresh([car_id], days[0], days[-1])
+
+    def rebuild(self, start_day=None, end_day=None):
+        """
+        Recomputes the slot bitmaps of every Car for the local days from start_day to end_day
+        inclusive, or for every day with a Booking.
+        """
+        Booking = apps.get_model('bookings', 'Booking')
+        bookings = Booking.objects.filter(car__isnull=False)
+        if start_day is None:
+            first_start = bookings.aggregate(Min('start_time'))['start_time__min'] or timezone.now()
+            start_day = timezone.localtime(first_start).date()
+        if end_day is None:
+            last_end = bookings.aggregate(Max('end_time'))['end_time__max'] or timezone.now()
+            end_day = timezone.localtime(last_end).date()
+        self.refresh(apps.get_model('bookings', 'Car').objects.values_list('pk', flat=True), start_day, end_day)
+
+    def free_car_ids(self, start, end, car_ids):
+        """
+        Returns those of the given Car ids with no booked slot from start to end, rounded out to
+        whole half hours.
+        """
+        masks = slot_masks(start, end)
+        busy = set()
+        for car_id, day, slots in self.filter(
+            car_id__in=car_ids,
+            day__in=list(masks),
+        ).values_list(
+            'car_id', 'day', 'slots',
+        ):
+            if slots & masks[day]:
+                busy.add(car_id)
+        return [car_id for car_id in car_ids if car_id not in busy]
+
+    def calendar(self, car_ids, start_day, days=7):
+        """
+        Returns an OrderedDict of each Car id given to a list of (day, slot bitmap) for the days
+        from start_day, from a single query.
+        """
+        days = [start_day + timedelta(days=offset) for offset in range(days)]
+        day_slots = dict(
+            ((car_id, day), slots) for car_id, day, slots in self.filter(
+                car_id__in=car_ids,
+                day__gte=days[0],
+                day__lte=days[-1],
+            ).values_list(
+                'car_id', 'day', 'slots',
+            )
+        )
+        return OrderedDict(
+            (car_id, [(day, day_slots.get((car_id, day), 0)) for day in days])
+            for car_id in car_ids
         )
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 19:46
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from rvme.bookings.slots import slot_masks
+
+
+def populate_car_day_slots(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    CarDaySlots = apps.get_model('bookings', 'CarDaySlots')
+
+    day_slots = {}
+    bookings = Booking.objects.filter(car__isnull=False).values_list('car_id', 'start_time', 'end_time')
+    for car_id, start_time, end_time in bookings.iterator():
+        for day, mask in slot_masks(start_time, end_time).items():
+            day_slots[(car_id, day)] = day_slots.get((car_id, day), 0) | mask
+
+    CarDaySlots.objects.bulk_create(
+        (CarDaySlots(car_id=car_id, day=day, slots=slots) for (car_id, day), slots in day_slots.items()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_car_interval_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarDaySlots',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('slots', models.BigIntegerField(help_text='Bit n is set when the car is booked in the nth half hour of the day')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_slots', to='bookings.Car')),
+            ],
+            options={
+                'verbose_name_plural': 'car day slots',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='cardayslots',
+            unique_together=set([('car', 'day')]),
+        ),
+        migrations.RunPython(populate_car_day_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 20:45
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_cardayslots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['start_time', 'id'], name='bookings_bo_start_t_f84892_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='key',
+            index=models.Index(fields=['created', 'keycore_id'], name='bookings_ke_created_c936ee_idx'),
+        ),
+    ]
@@ -8,7 +8,7 @@ from model_utils.fields import AutoCreatedField
 from rvme.core.models import TimeStampedFieldsModel
 from .constants import VEHICLE_MANUFACTURERS, ENGINE_TYPES, KEY_STATUSES, \
     KEY_OPERATIONS, CURRENT_TYPES
-from .managers import CarManager
+from .managers import CarManager, CarDaySlotsManager
 
 
 class Booking(TimeStampedFieldsModel):
@@ -46,6 +46,14 @@ class Booking(TimeStampedFieldsModel):
 
     class Meta:
         ordering = ["-start_time"]
+        indexes = [
+            # Overlap checks for a Car: start_time < end of window AND end_time > start of window
+            models.Index(fields=['car', 'start_time', 'end_time']),
+            # Keyset pagination of the changelist
+            models.Index(fields=['start_time', 'id']),
+        ]
+
+    tracker = FieldTracker(fields=['car_id', 'start_time', 'end_time'])
 
     def __str__(self):
         return "{}, {}, {} to {}, {} -> {}".format(
@@ -81,6 +89,31 @@ class Car(TimeStampedFieldsModel):
         return self.registration_number
 
 
+class CarDaySlots(models.Model):
+    """
+    Bitmap of the half-hour slots of a local day in which a Car is booked, so that free Cars can
+    be found with bitwise operations rather than by comparing Bookings. Days without any Booking
+    have no row.
+    """
+    car = models.ForeignKey(
+        "Car",
+        related_name="day_slots",
+    )
+    day = models.DateField()
+    slots = models.BigIntegerField(
+        help_text="Bit n is set when the car is booked in the nth half hour of the day",
+    )
+
+    objects = CarDaySlotsManager()
+
+    class Meta:
+        unique_together = ['car', 'day']
+        verbose_name_plural = 'car day slots'
+
+    def __str__(self):
+        return "{}, {}".format(self.car_id, self.day)
+
+
 class CarClass(TimeStampedFieldsModel):
     label = models.CharField(
         max_length=255,
@@ -163,6 +196,10 @@ class Key(TimeStampedFieldsModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # Keyset pagination of the changelist
+            models.Index(fields=['created', 'keycore_id']),
+        ]
 
     def __str__(self):
         return str(self.pk)
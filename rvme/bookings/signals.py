@@ -0,0 +1,49 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .availability import booking_intervals
+from .models import Booking, CarDaySlots
+from .slots import slot_masks
+
+# Sent after Bookings are written in bulk, which bypasses post_save
+bookings_bulk_created = Signal(providing_args=['bookings'])
+
+
+@receiver(post_save, sender=Booking)
+def update_booking_intervals(sender, instance, **kwargs):
+    booking_intervals.bookings_changed([instance])
+
+
+@receiver(post_delete, sender=Booking)
+def remove_booking_interval(sender, instance, **kwargs):
+    booking_intervals.bookings_changed([instance], deleted=True)
+
+
+@receiver(post_save, sender=Booking)
+def update_car_day_slots(sender, instance, created, **kwargs):
+    changed = {} if created else instance.tracker.changed()
+    if created or changed:
+        CarDaySlots.objects.refresh_booking(instance.car_id, instance.start_time, instance.end_time)
+    if changed:
+        CarDaySlots.objects.refresh_booking(
+            changed.get('car_id', instance.car_id),
+            changed.get('start_time', instance.start_time),
+            changed.get('end_time', instance.end_time),
+        )
+
+
+@receiver(post_delete, sender=Booking)
+def remove_booking_from_car_day_slots(sender, instance, **kwargs):
+    CarDaySlots.objects.refresh_booking(instance.car_id, instance.start_time, instance.end_time)
+
+
+@receiver(bookings_bulk_created, sender=Booking)
+def add_bulk_bookings_to_indexes(sender, bookings, **kwargs):
+    booking_intervals.bookings_changed(bookings)
+    car_ids, days = set(), set()
+    for booking in bookings:
+        if booking.car_id:
+            car_ids.add(booking.car_id)
+            days.update(slot_masks(booking.start_time, booking.end_time))
+    if days:
+        CarDaySlots.objects.refresh(car_ids, min(days), max(days))
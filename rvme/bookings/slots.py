@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+
+def local_day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _wall_clock_runs(start, end):
+    """
+    Splits start to end wherever the local UTC offset changes, returning the naive local
+    wall-clock start and end of each run, so within a run the wall clock only goes forwards.
+    """
+    runs = []
+    while start < end:
+        offset = timezone.localtime(start).utcoffset()
+        # Finds the first local midnight (or the end) with another offset, then bisects the day
+        # before it for the change
+        low, high, day = start, end, timezone.localtime(start).date()
+        while low < end:
+            day += timedelta(days=1)
+            high = min(end, local_day_start(day))
+            if timezone.localtime(high).utcoffset() != offset:
+                break
+            low = high
+        while high - low > timedelta(microseconds=1):
+            middle = low + (high - low) / 2
+            if timezone.localtime(middle).utcoffset() == offset:
+                low = middle
+            else:
+                high = middle
+        runs.append(tuple(
+            timezone.make_naive(moment, timezone.utc) + offset for moment in (start, high)
+        ))
+        start = high
+    return runs
+
+
+def slot_masks(start, end):
+    """
+    Returns an OrderedDict of each local day from start to end to a bitmap of the half-hour slots
+    they cover that day, bit n standing for the nth half hour of local wall-clock time. A slot is
+    covered if any part of it is.
+
+    Slots follow the wall clock, so on the days the clocks change one hour's slots either never
+    occur or stand for two hours, covered by either time through them.
+
+    slot_masks(10:00, 11:15 on 1 March)
+    {date(2019, 3, 1): 0b111 << 20}
+    """
+    slot = timedelta(minutes=SLOT_MINUTES)
+    masks = OrderedDict()
+    for start, end in _wall_clock_runs(start, end):
+        day = start.date()
+        day_start = datetime.combine(day, time.min)
+        while day_start < end:
+            first_slot = max(start - day_start, timedelta(0)) // slot
+            last_slot = -(-(min(end, day_start + timedelta(days=1)) - day_start) // slot)
+            if last_slot > first_slot:
+                masks[day] = masks.get(day, 0) | ((1 << last_slot) - (1 << first_slot))
+            day += timedelta(days=1)
+            day_start = datetime.combine(day, time.min)
+    return masks
+
+
+def slots_free(mask):
+    """
+    Returns a list of SLOTS_PER_DAY booleans, True where the slot is free in the given bitmap.
+    """
+    return [not mask & (1 << slot) for slot in range(SLOTS_PER_DAY)]
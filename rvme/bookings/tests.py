@@ -1,3 +1,173 @@
-from django.test import TestCase
+import datetime
+import random
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from rvme.core.testing import create_small_fleet
+from .importers import BookingImporter, find_overlaps
+from .intervals import BookingIntervalIndex
+from .models import Booking, Car
+from .slots import FULL_DAY, local_day_start, slot_masks
+
+
+def at(hour, minute=0):
+    return timezone.make_aware(datetime.datetime(2030, 1, 1, hour, minute))
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=timezone.utc)
+
+
+class FindOverlapsTest(SimpleTestCase):
+
+    def test_touching_intervals(self):
+        self.assertEqual(find_overlaps([(at(10), at(11), 'a'), (at(11), at(12), 'b'), (at(9), at(10), 'c')]), [])
+
+    def test_overlapping_intervals(self):
+        first, second = (at(10), at(12), 'a'), (at(11, 30), at(13), 'b')
+        self.assertEqual(find_overlaps([second, first]), [(first, second)])
+
+    def test_interval_inside_a_long_one(self):
+        # Each later interval is checked against the one that ends last so far, not the last one
+        long, short, later = (at(8), at(18), 'long'), (at(9), at(10), 'short'), (at(12), at(13), 'later')
+        self.assertEqual(find_overlaps([later, short, long]), [(long, short), (long, later)])
+
+
+class CheckOverlapsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+        cls.car, cls.other_car = Car.objects.order_by('pk')[:2]
+        cls.existing = Booking.objects.filter(car=cls.car).order_by('pk').first()
+
+    def check(self, *intervals):
+        bookings = [
+            (row, Booking(car=car, start_time=start_time, end_time=end_time))
+            for row, (car, start_time, end_time) in enumerate(intervals, 1)
+        ]
+        return [error.message % error.params for error in BookingImporter().check_overlaps(bookings)]
+
+    def test_touching_bookings_in_batch(self):
+        self.assertEqual(self.check((self.car, at(10), at(11)), (self.car, at(11), at(12))), [])
+
+    def test_overlapping_bookings_in_batch(self):
+        self.assertEqual(
+            self.check((self.car, at(10), at(12)), (self.car, at(11), at(13))),
+            ["Row 2: overlaps row 1 for car {}".format(self.car.pk)],
+        )
+
+    def test_different_cars(self):
+        self.assertEqual(self.check((self.car, at(10), at(12)), (self.other_car, at(11), at(13))), [])
+
+    def test_overlapping_existing_booking(self):
+        self.assertEqual(
+            self.check((self.car, self.existing.end_time - datetime.timedelta(minutes=30), self.existing.end_time)),
+            ["Row 1: overlaps booking {} for car {}".format(self.existing.pk, self.car.pk)],
+        )
+
+    def test_touching_existing_booking(self):
+        self.assertEqual(self.check(
+            (self.car, self.existing.end_time, self.existing.end_time + datetime.timedelta(hours=1)),
+            (self.car, self.existing.start_time - datetime.timedelta(hours=1), self.existing.start_time),
+        ), [])
+
+
+class BookingIntervalIndexTest(SimpleTestCase):
+
+    def test_empty(self):
+        index = BookingIntervalIndex()
+        self.assertIsNone(index.lookup(1, at(10)))
+        self.assertEqual(index.overlapping(1, at(10), at(11)), [])
+        index.add((1, 1, at(10), at(11), None))
+        index.remove(1)
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.lookup(1, at(10)))
+
+    def test_boundaries(self):
+        first, second = (1, 1, at(10), at(11), None), (2, 1, at(11), at(12), None)
+        index = BookingIntervalIndex([second, first])
+        self.assertIsNone(index.lookup(1, at(9, 59)))
+        self.assertEqual(index.lookup(1, at(10)), first)
+        # Held by both at the changeover, where the later to start wins
+        self.assertEqual(index.lookup(1, at(11)), second)
+        self.assertEqual(index.lookup(1, at(12)), second)
+        self.assertIsNone(index.lookup(1, at(12, 1)))
+        self.assertIsNone(index.lookup(2, at(10)))
+        self.assertEqual(index.overlapping(1, at(9), at(10)), [])
+        self.assertEqual(index.overlapping(1, at(12), at(13)), [])
+        self.assertEqual(index.overlapping(1, at(10, 30), at(11, 30)), [second, first])
+
+    def test_long_booking(self):
+        # A 30 day Booking followed by many short ones: lookups between the short ones fall back
+        # to the long one, and must agree with checking every Booking
+        start = at(0)
+        bookings = [(0, 1, start, start + datetime.timedelta(days=30), None)]
+        rng = random.Random(1)
+        for pk in range(1, 500):
+            booking_start = start + datetime.timedelta(minutes=rng.randrange(60 * 24 * 40))
+            booking_end = booking_start + datetime.timedelta(minutes=rng.randrange(1, 120))
+            bookings.append((pk, 1, booking_start, booking_end, None))
+        index = BookingIntervalIndex(bookings)
+        ordered = sorted(bookings, key=lambda booking: booking[2])
+        for minutes in range(-60, 60 * 24 * 41, 97):
+            time = start + datetime.timedelta(minutes=minutes)
+            with self.subTest(time=time):
+                holding = [booking for booking in ordered if booking[2] <= time <= booking[3]]
+                self.assertEqual(index.lookup(1, time), holding[-1] if holding else None)
+                window_end = time + datetime.timedelta(hours=1)
+                self.assertEqual(
+                    index.overlapping(1, time, window_end),
+                    [booking for booking in reversed(ordered) if booking[2] < window_end and booking[3] > time],
+                )
+
+
+class SlotMasksTest(SimpleTestCase):
+    # The clocks go forward an hour at 01:00 UTC on 31 March 2019 and back an hour at 01:00 UTC on
+    # 27 October 2019, in the Europe/London time zone of the settings
+    short_day = datetime.date(2019, 3, 31)
+    long_day = datetime.date(2019, 10, 27)
+
+    def test_local_day_start(self):
+        for day, hours in [(datetime.date(2019, 3, 1), 24), (self.short_day, 23), (self.long_day, 25)]:
+            with self.subTest(day=day):
+                self.assertEqual(
+                    local_day_start(day + datetime.timedelta(days=1)) - local_day_start(day),
+                    datetime.timedelta(hours=hours),
+                )
+
+    def test_whole_days(self):
+        for day in [datetime.date(2019, 3, 1), self.short_day, self.long_day]:
+            with self.subTest(day=day):
+                masks = slot_masks(local_day_start(day), local_day_start(day + datetime.timedelta(days=1)))
+                # The hour the clocks skip has no slots covered
+                self.assertEqual(masks, {day: FULL_DAY & ~(0b1100 if day == self.short_day else 0)})
+
+    def test_crossing_midnight(self):
+        self.assertEqual(slot_masks(utc(2019, 1, 1, 23), utc(2019, 1, 2, 1)), {
+            datetime.date(2019, 1, 1): 0b11 << 46,
+            datetime.date(2019, 1, 2): 0b11,
+        })
+        # 23:30 to 00:30 British Summer Time
+        self.assertEqual(slot_masks(utc(2019, 6, 1, 22, 30), utc(2019, 6, 1, 23, 30)), {
+            datetime.date(2019, 6, 1): 1 << 47,
+            datetime.date(2019, 6, 2): 1,
+        })
+        self.assertEqual(list(slot_masks(utc(2019, 1, 1, 23), utc(2019, 1, 2))), [datetime.date(2019, 1, 1)])
+
+    def test_clocks_going_forward(self):
+        # 00:30 to 01:00 GMT, then 02:00 to 02:30 BST
+        self.assertEqual(slot_masks(utc(2019, 3, 31, 0, 30), utc(2019, 3, 31, 1, 30)), {self.short_day: 0b10010})
+
+    def test_clocks_going_back(self):
+        # 01:30 to 02:00 BST, then 01:00 to 01:15 GMT, which is earlier on the wall clock
+        self.assertEqual(slot_masks(utc(2019, 10, 27, 0, 30), utc(2019, 10, 27, 1, 15)), {self.long_day: 0b1100})
+        # Bookings in either 01:00 to 01:30 share its slot
+        self.assertEqual(slot_masks(utc(2019, 10, 27, 0), utc(2019, 10, 27, 0, 30)), {self.long_day: 0b100})
+        self.assertEqual(slot_masks(utc(2019, 10, 27, 1), utc(2019, 10, 27, 1, 30)), {self.long_day: 0b100})
+        # 23:30 BST to 02:00 GMT
+        self.assertEqual(slot_masks(utc(2019, 10, 26, 22, 30), utc(2019, 10, 27, 2)), {
+            datetime.date(2019, 10, 26): 1 << 47,
+            self.long_day: 0b1111,
+        })
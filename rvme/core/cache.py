@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+
+class LRUCache(object):
+    """
+    Thread-safe, in-process cache holding at most max_entries values, evicting the least
+    recently used first.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return default
+            self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _data_version_key(model):
+    return 'data_version:{}'.format(model._meta.label_lower)
+
+
+def get_data_version(model):
+    """
+    Returns a number that changes whenever rows of the given model are saved or deleted, for use
+    in the keys of results computed from that model's table.
+    """
+    # Seeded from the clock so a version lost from the cache never repeats an earlier one
+    return cache.get_or_set(_data_version_key(model), lambda: int(time.time() * 1000), None)
+
+
+def bump_data_version(model):
+    try:
+        cache.incr(_data_version_key(model))
+    except ValueError:
+        cache.set(_data_version_key(model), int(time.time() * 1000), None)
@@ -0,0 +1,113 @@
+import copy
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import QueryDict
+
+from .cache import LRUCache, get_data_version
+
+
+class PresentRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """
+    Related field filter listing only the values present in the changelist as filtered by its
+    other filters, rather than every row of the related model.
+
+    The values are read in one query when the sidebar is rendered and cached against the filters
+    and the data version of the changelist's model. They're read from the rows the model admin's
+    get_presence_queryset() returns where it has one, e.g. a rollup keyed by the field, rather
+    than from the changelist's own table. Above LIST_FILTER_SEARCH_THRESHOLD values the
+    list is replaced by a search box, and only the values matching the search are listed.
+    """
+    template = 'admin/present_values_filter.html'
+
+    # Present values of each filter, shared by all changelists in this process
+    values_cache = LRUCache(max_entries=settings.LIST_FILTER_CACHE_MAX_ENTRIES)
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.request = request
+        self.model_admin = model_admin
+        self.search_kwarg = '%s__search' % field_path
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.search_term = self.used_parameters.pop(self.search_kwarg, '').strip()
+        self.has_empty = False
+        self.searching = False
+        self.hidden_params = []
+
+    @property
+    def include_empty_choice(self):
+        return self.has_empty
+
+    def has_output(self):
+        # The values aren't known until the changelist has been filtered
+        return True
+
+    def expected_parameters(self):
+        return super().expected_parameters() + [self.search_kwarg]
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def get_present_queryset(self, changelist):
+        """
+        Returns the changelist's queryset filtered by every filter but this one.
+        """
+        own_parameters = set(self.expected_parameters())
+        if not own_parameters & set(changelist.params):
+            return changelist.queryset
+        unfiltered = copy.copy(changelist)
+        unfiltered.params = {
+            param: value for param, value in changelist.params.items() if param not in own_parameters
+        }
+        return unfiltered.get_queryset(self.request)
+
+    def get_present_values(self, changelist):
+        """
+        Returns a list of the (value, label) present in the changelist, and whether any rows have
+        no value.
+        """
+        own_parameters = set(self.expected_parameters())
+        model = changelist.model._meta.concrete_model
+        cache_key = (
+            model._meta.label_lower,
+            self.field_path,
+            tuple(sorted(
+                (param, value) for param, value in changelist.get_filters_params().items()
+                if param not in own_parameters
+            )),
+            changelist.query,
+            get_data_version(model),
+        )
+        present = self.values_cache.get(cache_key)
+        if present is None:
+            queryset = None
+            if hasattr(self.model_admin, 'get_presence_queryset'):
+                queryset = self.model_admin.get_presence_queryset(changelist, own_parameters)
+            if queryset is None:
+                queryset = self.get_present_queryset(changelist)
+            queryset = queryset.order_by()
+            target_field = self.field.target_field
+            related_objects = self.field.related_model._default_manager.filter(**{
+                '%s__in' % target_field.name: queryset.values(self.field_path),
+            })
+            present = (
+                [(getattr(obj, target_field.attname), str(obj)) for obj in related_objects],
+                self.field.null and queryset.filter(**{self.lookup_kwarg_isnull: True}).exists(),
+            )
+            self.values_cache.set(cache_key, present)
+        return present
+
+    def choices(self, changelist):
+        values, self.has_empty = self.get_present_values(changelist)
+        self.searching = len(values) > settings.LIST_FILTER_SEARCH_THRESHOLD
+        if self.searching:
+            term = self.search_term.casefold()
+            values = [
+                (value, label) for value, label in values
+                if (term and term in label.casefold()) or str(value) == self.lookup_val
+            ][:settings.LIST_FILTER_SEARCH_THRESHOLD]
+            # The search form resubmits the changelist's other parameters
+            self.hidden_params = QueryDict(
+                changelist.get_query_string({}, [self.search_kwarg])[1:],
+            ).items()
+        self.lookup_choices = values
+        yield from super().choices(changelist)
@@ -0,0 +1,226 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+from django.utils import timezone
+
+# Request parameters that page through results rather than filter them
+PAGE_PARAMETERS = {'p', 'after', 'before', 'o', '_changelist_filters'}
+
+# Percentiles of each timing summarised, by name
+PERCENTILES = [('p50', 0.5), ('p95', 0.95), ('p99', 0.99)]
+
+RequestTiming = namedtuple('RequestTiming', [
+    'view', 'path', 'started', 'total', 'sql_time', 'queries', 'slowest_sql', 'slowest_sql_time',
+    'template_time', 'python_time',
+])
+
+_PLACEHOLDER = re.compile(r'%(?:\(\w+\))?s')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_VALUE_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    Replaces the literal values in a query with ?, and lists of them with (...), so that the
+    same query with different parameters reads the same.
+    """
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _VALUE_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of a sorted list, e.g. fraction=0.95 for the 95th.
+    """
+    if not values:
+        return None
+    return values[max(int(round(fraction * len(values))) - 1, 0)]
+
+
+class RequestTimingBuffer(object):
+    """
+    Thread-safe ring buffer of the latest max_entries RequestTimings recorded in this process.
+    """
+
+    def __init__(self, max_entries):
+        self._timings = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._timings)
+
+    def add(self, timing):
+        with self._lock:
+            self._timings.append(timing)
+
+    def timings(self):
+        with self._lock:
+            return list(self._timings)
+
+    def clear(self):
+        with self._lock:
+            self._timings.clear()
+
+    def summarise(self):
+        """
+        Returns an OrderedDict of each view to its number of requests, the 50th, 95th and 99th
+        percentiles of each timing, and its slowest query, slowest views first by 95th percentile.
+        """
+        by_view = {}
+        for timing in self.timings():
+            by_view.setdefault(timing.view, []).append(timing)
+
+        summaries = []
+        for view, timings in by_view.items():
+            summary = OrderedDict(requests=len(timings))
+            for field in ('total', 'sql_time', 'queries', 'template_time', 'python_time'):
+                values = sorted(getattr(timing, field) for timing in timings)
+                summary[field] = OrderedDict((name, percentile(values, fraction)) for name, fraction in PERCENTILES)
+            slowest = max(timings, key=lambda timing: timing.slowest_sql_time)
+            summary['slowest_sql'] = slowest.slowest_sql
+            summary['slowest_sql_time'] = slowest.slowest_sql_time
+            summaries.append((view, summary))
+        summaries.sort(key=lambda item: item[1]['total']['p95'], reverse=True)
+        return OrderedDict(summaries)
+
+
+class QueryTimer(object):
+    """
+    Database execute wrapper counting and timing the queries run through it, and keeping the
+    slowest.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest_sql = ''
+        self.slowest_sql_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.sql_time += elapsed
+            if elapsed > self.slowest_sql_time:
+                self.slowest_sql, self.slowest_sql_time = sql, elapsed
+
+
+class ExecuteWrapperCursor(CursorWrapper):
+    """
+    Cursor passing its queries through an execute wrapper, for Django versions before 2.0's
+    connection.execute_wrapper().
+    """
+
+    def __init__(self, cursor, db, wrapper):
+        super().__init__(cursor, db)
+        self.wrapper = wrapper
+
+    def execute(self, sql, params=None):
+        return self.wrapper(self._execute, sql, params, False, {'connection': self.db, 'cursor': self})
+
+    def executemany(self, sql, param_list):
+        return self.wrapper(self._execute, sql, param_list, True, {'connection': self.db, 'cursor': self})
+
+    def _execute(self, sql, params, many, context):
+        if many:
+            return super().executemany(sql, params)
+        return super().execute(sql, params)
+
+
+@contextmanager
+def execute_wrapper(connection, wrapper):
+    """
+    Passes the queries of the connection through the wrapper within the block, with
+    connection.execute_wrapper() where Django has it.
+    """
+    if hasattr(connection, 'execute_wrapper'):
+        with connection.execute_wrapper(wrapper):
+            yield
+        return
+
+    # Connections are per thread, so wrapping this one's cursors only sees this request's queries
+    prepare_cursor = connection._prepare_cursor
+    connection._prepare_cursor = lambda cursor: ExecuteWrapperCursor(prepare_cursor(cursor), connection, wrapper)
+    try:
+        yield
+    finally:
+        del connection._prepare_cursor
+
+
+request_timings = RequestTimingBuffer(settings.REQUEST_TIMINGS_MAX_ENTRIES)
+
+
+class RequestTimingMiddleware(object):
+    """
+    Records the total, SQL, template rendering and remaining Python time of every request, its
+    number of queries and its slowest query, to the request_timings buffer of this process.
+
+    Requests are grouped by the name of their view and the names of the filters they were made
+    with, so e.g. summaries filtered by car are told apart from those filtered by month.
+    Queries are timed by a QueryTimer wrapped around each database connection for the request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = timezone.now()
+        start = time.perf_counter()
+        timer = QueryTimer()
+        request._query_timer = timer
+        request._template_time = 0.0
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(execute_wrapper(connection, timer))
+            try:
+                response = self.get_response(request)
+            finally:
+                total = time.perf_counter() - start
+
+        request_timings.add(RequestTiming(
+            view=self.get_view_key(request),
+            path=request.get_full_path(),
+            started=started,
+            total=total,
+            sql_time=timer.sql_time,
+            queries=timer.queries,
+            slowest_sql=normalize_sql(timer.slowest_sql),
+            slowest_sql_time=timer.slowest_sql_time,
+            template_time=request._template_time,
+            python_time=max(total - timer.sql_time - request._template_time, 0.0),
+        ))
+        return response
+
+    def process_template_response(self, request, response):
+        # Rendering follows straight after, so the time until the post render callback is the
+        # template's, less any queries it runs
+        render_start = time.perf_counter()
+        initial_sql_time = request._query_timer.sql_time
+
+        def record_template_time(response):
+            rendered = time.perf_counter() - render_start
+            sql_time = request._query_timer.sql_time - initial_sql_time
+            request._template_time += max(rendered - sql_time, 0.0)
+
+        response.add_post_render_callback(record_template_time)
+        return response
+
+    def get_view_key(self, request):
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        filters = sorted(set(request.GET) - PAGE_PARAMETERS)
+        return '{}?{}'.format(view, '&'.join(filters)) if filters else view
@@ -1,3 +1,10 @@
+from django.contrib.admin.options import InlineModelAdmin
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
+
+from .pagination import KeysetChangeList
+
+
 class ReadOnlyAdminMixin(object):
     """Disables all editing capabilities."""
 
@@ -25,3 +32,82 @@ class ReadOnlyAdminMixin(object):
 
     def save_related(self, request, form, formsets, change):
         pass
+
+
+class KeysetPaginationMixin(object):
+    """
+    Pages the changelist by the values of keyset_ordering instead of by offset, showing an
+    estimated count rather than counting every row.
+    """
+    change_list_template = 'admin/keyset_change_list.html'
+    # Unique ordering to page by, e.g. ['-timestamp', '-id']
+    keyset_ordering = None
+    # Rows counted exactly before the count is shown as an estimate
+    keyset_count_limit = 10000
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class PrefetchPlanMixin(object):
+    """
+    Loads the related objects an admin's rows display with the rows, rather than with a query
+    for each row. The relations among the list_display, or an inline's fields, are followed
+    automatically, and prefetch_plan names the relations each display method or field reads.
+
+    Relations reached through foreign keys only are joined with select_related, and the rest,
+    e.g. a reverse foreign key, are fetched with prefetch_related.
+    """
+    # Related paths each of the displayed names reads, e.g. {'location_display': ['start_location', 'end_location']}
+    prefetch_plan = {}
+
+    def get_prefetch_field_names(self, request):
+        if isinstance(self, InlineModelAdmin):
+            return self.get_fields(request)
+        return self.get_list_display(request)
+
+    def get_prefetch_paths(self, request):
+        """
+        Returns the lists of paths to select_related and to prefetch_related.
+        """
+        select_related, prefetch_related = [], []
+        for name in self.get_prefetch_field_names(request):
+            if not isinstance(name, str):
+                continue
+            for path in self.prefetch_plan.get(name, [name]):
+                single_valued = self.is_single_valued_path(path)
+                if single_valued is None:
+                    continue
+                paths = select_related if single_valued else prefetch_related
+                if path not in paths:
+                    paths.append(path)
+        return select_related, prefetch_related
+
+    def is_single_valued_path(self, path):
+        """
+        Returns whether the path follows only foreign keys, or None if it isn't a relation.
+        """
+        model, single_valued = self.model, True
+        for part in path.split(LOOKUP_SEP):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            if not field.is_relation:
+                return None
+            single_valued = single_valued and (field.many_to_one or field.one_to_one) and field.concrete
+            model = field.related_model
+        return single_valued
+
+    def get_list_select_related(self, request):
+        # The changelist would otherwise only select the relations that can't be null
+        return self.get_prefetch_paths(request)[0]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        select_related, prefetch_related = self.get_prefetch_paths(request)
+        if select_related:
+            # Without any paths, select_related follows every foreign key that can't be null
+            queryset = queryset.select_related(*select_related)
+        return queryset.prefetch_related(*prefetch_related)
@@ -0,0 +1,213 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Changelist parameters holding the key of the row a page starts after, or ends before
+CURSOR_AFTER_VAR = 'after'
+CURSOR_BEFORE_VAR = 'before'
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError("Expected {} values".format(len(fields)))
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except (TypeError, ValueError, UnicodeDecodeError, ValidationError) as error:
+        raise ValueError("Invalid cursor: {}".format(cursor)) from error
+
+
+def reverse_ordering(ordering):
+    return [field_name[1:] if field_name.startswith('-') else '-' + field_name for field_name in ordering]
+
+
+class KeysetPage(object):
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator(object):
+    """
+    Pages through a queryset by the values of its ordering fields rather than by offset, so every
+    page costs the same however deep it is, and only estimates the total count.
+
+    The ordering must identify rows uniquely, e.g. ['-timestamp', '-id'], and be backed by
+    an index for seeks to be cheap. Pages are fetched with page(after=cursor) or
+    page(before=cursor), using the cursors of the neighbouring pages.
+    """
+
+    def __init__(self, queryset, ordering, per_page, count_limit=10000):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.count_limit = count_limit
+        self.field_names = [field_name.lstrip('-') for field_name in self.ordering]
+        self.fields = [queryset.model._meta.get_field(field_name) for field_name in self.field_names]
+
+    @cached_property
+    def estimated_count(self):
+        """
+        Returns (count, is_exact). Counting stops after count_limit rows, beyond which an
+        unfiltered table's size comes from the database statistics where they're available, and
+        the count is otherwise given as count_limit.
+        """
+        count = self.queryset.order_by()[:self.count_limit + 1].count()
+        if count <= self.count_limit:
+            return count, True
+        estimate = self.table_estimate() if not self.queryset.query.where else None
+        return max(estimate or 0, self.count_limit), False
+
+    @property
+    def count(self):
+        return self.estimated_count[0]
+
+    def table_estimate(self):
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [self.queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def seek(self, values, forwards):
+        """
+        Returns a Q selecting the rows after the given key in the ordering, or before it.
+        """
+        q = Q()
+        for position, field_name in enumerate(self.field_names):
+            descending = self.ordering[position].startswith('-')
+            lookup = 'lt' if descending == forwards else 'gt'
+            condition = Q(**{'{}__{}'.format(field_name, lookup): values[position]})
+            for earlier_field_name, value in zip(self.field_names[:position], values):
+                condition &= Q(**{earlier_field_name: value})
+            q |= condition
+        return q
+
+    def cursor(self, obj):
+        return encode_cursor([getattr(obj, field.attname) for field in self.fields])
+
+    def page(self, after=None, before=None):
+        if before:
+            rows = list(self.queryset.filter(
+                self.seek(decode_cursor(before, self.fields), forwards=False),
+            ).order_by(*reverse_ordering(self.ordering))[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if after:
+                queryset = queryset.filter(self.seek(decode_cursor(after, self.fields), forwards=True))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after)
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.cursor(rows[-1]) if rows and has_next else None,
+            previous_cursor=self.cursor(rows[0]) if rows and has_previous else None,
+        )
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList paging with a KeysetPaginator in the model admin's keyset_ordering, which also
+    fixes the order of the rows. The columns of its first field can reverse it, as its index
+    serves both directions, and the other columns can't be sorted by.
+    """
+    cursor_vars = (CURSOR_AFTER_VAR, CURSOR_BEFORE_VAR)
+
+    @cached_property
+    def sortable_columns(self):
+        """
+        Returns the positions in list_display of the columns showing the first keyset field.
+        """
+        field_name = self.model_admin.keyset_ordering[0].lstrip('-')
+        return [
+            position for position, name in enumerate(self.list_display)
+            if self.get_ordering_field(name) == field_name
+        ]
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for cursor_var in self.cursor_vars:
+            lookup_params.pop(cursor_var, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing the filters or search starts again from the first page
+        remove = list(remove or []) + list(self.cursor_vars)
+        return super().get_query_string(new_params, remove)
+
+    def get_ordering(self, request, queryset):
+        ordering = list(self.model_admin.keyset_ordering)
+        if ORDER_VAR in self.params:
+            _, order_type, position = self.params[ORDER_VAR].partition('.')[0].rpartition('-')
+            if not position.isdigit() or int(position) not in self.sortable_columns:
+                raise IncorrectLookupParameters("Can only be sorted by {}".format(ordering[0].lstrip('-')))
+            if (order_type == '-') != ordering[0].startswith('-'):
+                ordering = reverse_ordering(ordering)
+        self.keyset_ordering = ordering
+        return ordering
+
+    def get_ordering_field_columns(self):
+        order_type = 'desc' if self.keyset_ordering[0].startswith('-') else 'asc'
+        return OrderedDict((position, order_type) for position in self.sortable_columns[:1])
+
+    def get_results(self, request):
+        paginator = KeysetPaginator(
+            self.queryset,
+            self.keyset_ordering,
+            self.list_per_page,
+            count_limit=self.model_admin.keyset_count_limit,
+        )
+        try:
+            page = paginator.page(
+                after=self.params.get(CURSOR_AFTER_VAR),
+                before=self.params.get(CURSOR_BEFORE_VAR),
+            )
+        except ValueError:
+            raise IncorrectLookupParameters
+
+        self.result_count, self.result_count_exact = paginator.estimated_count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_next or page.has_previous
+        self.paginator = paginator
+        self.page = page
+
+        self.first_page_url = self.get_query_string() if page.has_previous else None
+        self.previous_page_url = (
+            self.get_query_string({CURSOR_BEFORE_VAR: page.previous_cursor}) if page.has_previous else None
+        )
+        self.next_page_url = self.get_query_string({CURSOR_AFTER_VAR: page.next_cursor}) if page.has_next else None
@@ -0,0 +1,96 @@
+import cProfile
+import os
+import random
+import re
+
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.utils import timezone
+
+# Query parameter with which staff profile a changelist, e.g. ?car__id__exact=44&_profile=1
+PROFILE_PARAMETER = '_profile'
+
+_UNSAFE_CHARACTERS = re.compile(r'[^\w.=-]+')
+
+
+def get_profile_path(model_admin, request):
+    """
+    Returns the path to save the profile of a changelist request to, in a directory for its page
+    named after its filters and the time, e.g. services.tripsummary/car__id__exact=44/<time>.pstats
+    """
+    filters = '&'.join('{}={}'.format(key, value) for key, value in sorted(request.GET.items()))
+    return os.path.join(
+        settings.CHANGELIST_PROFILE_DIR,
+        model_admin.model._meta.label_lower,
+        _UNSAFE_CHARACTERS.sub('_', filters)[:200] or 'unfiltered',
+        '{:%Y%m%dT%H%M%S.%f}.pstats'.format(timezone.now()),
+    )
+
+
+class ChangeListProfile(object):
+    """
+    cProfile profile of a changelist request from its view until its response is rendered, or
+    fails to be, when the stats are saved to the path given.
+    """
+
+    def __init__(self, request, path):
+        self.request = request
+        self.path = path
+        self.profiler = cProfile.Profile()
+        self.running = False
+
+    def start(self):
+        got_request_exception.connect(self.request_failed, weak=False)
+        self.running = True
+        self.profiler.enable()
+
+    def stop(self, response=None):
+        if not self.running:
+            return
+        self.profiler.disable()
+        self.running = False
+        got_request_exception.disconnect(self.request_failed)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.profiler.dump_stats(self.path)
+
+    def request_failed(self, sender, request=None, **kwargs):
+        if request is self.request:
+            self.stop()
+
+
+class ChangeListProfilingMixin(object):
+    """
+    Profiles the changelist with cProfile, rendering included, when a staff user adds _profile
+    to its query string, or for a CHANGELIST_PROFILE_SAMPLE_RATE fraction of requests. The stats
+    are saved under CHANGELIST_PROFILE_DIR for e.g. python -m pstats or snakeviz.
+
+    The response is left to be rendered after the template response middleware as usual, so
+    RequestTimingMiddleware times its rendering as it would any other request's.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        requested = PROFILE_PARAMETER in request.GET
+        if requested:
+            # The changelist would otherwise reject it as an unknown filter
+            request.GET = request.GET.copy()
+            del request.GET[PROFILE_PARAMETER]
+        if not self.should_profile(request, requested):
+            return super().changelist_view(request, extra_context=extra_context)
+
+        profile = ChangeListProfile(request, get_profile_path(self, request))
+        profile.start()
+        try:
+            response = super().changelist_view(request, extra_context=extra_context)
+        except Exception:
+            profile.stop()
+            raise
+        if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            response.add_post_render_callback(profile.stop)
+        else:
+            profile.stop()
+        return response
+
+    def should_profile(self, request, requested):
+        if requested:
+            return request.user.is_active and request.user.is_staff
+        return random.random() < settings.CHANGELIST_PROFILE_SAMPLE_RATE
@@ -8,3 +8,10 @@ register = template.Library()
 @register.filter
 def metres_to_miles(val):
     return (Decimal(val) / 1000) * Decimal(0.621371)
+
+
+@register.filter
+def milliseconds(seconds):
+    if seconds is None:
+        return ''
+    return '{:.0f}'.format(seconds * 1000)
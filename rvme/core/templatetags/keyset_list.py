@@ -0,0 +1,24 @@
+from django import template
+from django.contrib.admin.templatetags.admin_list import result_list
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/change_list_results.html')
+def keyset_result_list(cl):
+    """
+    Displays the headers and data list like result_list, with sorting links only on the
+    columns a KeysetChangeList can be sorted by.
+    """
+    context = result_list(cl)
+    headers = context['result_headers']
+    for position, header in enumerate(headers):
+        if header['sortable'] and position not in cl.sortable_columns:
+            headers[position] = {
+                'text': header['text'],
+                'class_attrib': mark_safe(header['class_attrib'].replace('sortable ', '')),
+                'sortable': False,
+            }
+    context['num_sorted_fields'] = sum(1 for header in headers if header['sortable'] and header['sorted'])
+    return context
@@ -0,0 +1,80 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rvme.core.filters import PresentRelatedFieldListFilter
+from rvme.services.admin import BaseSummaryAdmin
+from rvme.services.benchmarks import LARGE_TABLES, sequential_scans
+from rvme.services.synthetic import SyntheticFleet
+
+
+def create_test_fleet():
+    """
+    Generates the fixed dataset the admin query budgets are measured against: 10 Cars and 40
+    drivers with two months of Bookings, Keys, trips and about 2,000 events.
+    """
+    return SyntheticFleet(
+        seed=0, cars=10, drivers=40, events=2000, days=60, until=datetime.date(2019, 2, 15),
+    ).generate()
+
+
+def create_small_fleet(seed):
+    """
+    Generates 2 Cars and 4 drivers with a few days of Bookings, Keys, trips and about 20 events,
+    for seeing whether pages make more queries as rows are added.
+    """
+    return SyntheticFleet(
+        seed=seed, cars=2, drivers=4, events=20, days=3, until=datetime.date(2019, 2, 15),
+    ).generate()
+
+
+class QueryBudgetTestMixin(object):
+    """
+    TestCase assertions that an admin page renders uncached within a budget of queries, and
+    without reading any of the LARGE_TABLES with a sequential scan, and that its number of queries
+    doesn't grow with its rows. The plans are only checked on SQLite, as other databases'
+    planners scan small test tables whatever their indexes.
+    """
+
+    def get_queries(self, url):
+        """
+        Returns the response for the url, uncached, and the queries it made.
+        """
+        BaseSummaryAdmin.summary_cache.clear()
+        PresentRelatedFieldListFilter.values_cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def assertWithinBudget(self, url, max_queries):
+        response, queries = self.get_queries(url)
+        self.assertLessEqual(
+            len(queries), max_queries,
+            "{} made {} queries, over its budget of {}:\n{}".format(url, len(queries), max_queries, '\n'.join(queries)),
+        )
+        if connection.vendor == 'sqlite':
+            for sql in queries:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                scanned = set(sequential_scans(sql)) & set(LARGE_TABLES)
+                self.assertFalse(scanned, "{} scans {}:\n{}".format(url, ', '.join(sorted(scanned)), sql))
+        return response
+
+    def assertQueriesConstant(self, urls, add_rows):
+        """
+        Asserts that each page makes as many queries once add_rows() has added rows to it as
+        before, so that none are made for each row it shows.
+        """
+        before = {url: len(self.get_queries(url)[1]) for url in urls}
+        add_rows()
+        for url in urls:
+            with self.subTest(url=url):
+                response, queries = self.get_queries(url)
+                self.assertEqual(
+                    len(queries), before[url],
+                    "{} made {} queries with more rows, from {}:\n{}".format(
+                        url, len(queries), before[url], '\n'.join(queries),
+                    ),
+                )
@@ -0,0 +1,226 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.admin.views.main import ORDER_VAR
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rvme.bookings.models import Booking, Car, CarClass, CarModel, Key, Location
+from rvme.services.admin import BaseSummaryAdmin
+from rvme.services.benchmarks import sample_filter_sets
+from rvme.services.models import EventSummary, TripSummary, UtilisationSummary
+from rvme.services.surecam.models import Device, Event, Trip
+from .instrumentation import normalize_sql, request_timings
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .testing import QueryBudgetTestMixin, create_small_fleet, create_test_fleet
+
+
+def get_admin_url(model, view, *args):
+    return reverse('admin:{}_{}_{}'.format(model._meta.app_label, model._meta.model_name, view), args=args)
+
+
+class AdminQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    # Most queries each admin's changelist and change form may make. Summaries have no change
+    # form, and their changelist is checked under each of their sample filters.
+    budgets = {
+        Group: (5, 8),
+        get_user_model(): (6, 10),
+        Booking: (8, 12),
+        Car: (7, 7),
+        CarClass: (5, 6),
+        CarModel: (5, 7),
+        Key: (6, 11),
+        Location: (5, 8),
+        EventSummary: (8, None),
+        TripSummary: (10, None),
+        UtilisationSummary: (8, None),
+        Device: (5, 7),
+        Event: (8, 11),
+        Trip: (8, 13),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        create_test_fleet()
+        Group.objects.create(name='Operations')
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_every_admin_has_a_budget(self):
+        self.assertEqual(set(self.budgets), set(admin.site._registry))
+
+    def test_changelists(self):
+        for model, model_admin in admin.site._registry.items():
+            if isinstance(model_admin, BaseSummaryAdmin):
+                query_strings = sample_filter_sets(model_admin)
+            else:
+                query_strings = ['']
+            for query_string in query_strings:
+                with self.subTest(model=model._meta.label, filters=query_string):
+                    self.assertWithinBudget(
+                        '{}?{}'.format(get_admin_url(model, 'changelist'), query_string), self.budgets[model][0],
+                    )
+
+    def test_change_forms(self):
+        for model, (changelist_budget, change_form_budget) in self.budgets.items():
+            if change_form_budget is None:
+                continue
+            with self.subTest(model=model._meta.label):
+                obj = model.objects.order_by('pk').first()
+                self.assertWithinBudget(get_admin_url(model, 'change', obj.pk), change_form_budget)
+
+
+class AdminQueryScalingTest(QueryBudgetTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_queries_constant_as_rows_grow(self):
+        booking = Booking.objects.order_by('pk').first()
+        device = Device.objects.order_by('pk').first()
+
+        def add_rows():
+            create_small_fleet(seed=2)
+            # Moves every Key and Event onto one Booking and Device, for their change forms to
+            # show more of them
+            Key.objects.update(booking=booking)
+            Event.objects.update(device=device)
+
+        self.assertQueriesConstant([
+            get_admin_url(Booking, 'changelist'),
+            get_admin_url(Booking, 'change', booking.pk),
+            get_admin_url(Car, 'changelist'),
+            get_admin_url(Key, 'changelist'),
+            get_admin_url(Device, 'changelist'),
+            get_admin_url(Device, 'change', device.pk),
+            get_admin_url(Event, 'changelist'),
+            get_admin_url(Trip, 'changelist'),
+        ], add_rows)
+
+
+class RequestTimingMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+        request_timings.clear()
+        self.addCleanup(request_timings.clear)
+
+    def test_queries_timed(self):
+        car = Car.objects.order_by('pk').first()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(get_admin_url(Car, 'change', car.pk))
+        self.assertEqual(response.status_code, 200)
+        timing, = request_timings.timings()
+        self.assertEqual(timing.view, 'admin:bookings_car_change')
+        self.assertEqual(timing.queries, len(context.captured_queries))
+        self.assertGreater(timing.sql_time, 0)
+        self.assertGreater(timing.template_time, 0)
+        self.assertLessEqual(timing.slowest_sql_time, timing.sql_time)
+        self.assertNotIn('%s', timing.slowest_sql)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT "id" FROM "car" WHERE "id" IN (%s, %s,\n %s) AND "name" = %s LIMIT 21'),
+            'SELECT "id" FROM "car" WHERE "id" IN (...) AND "name" = ? LIMIT ?',
+        )
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def get_paginator(self, ordering=('-timestamp', '-id')):
+        return KeysetPaginator(Event.objects.all(), ordering, per_page=3)
+
+    def walk(self, paginator, forwards):
+        page = paginator.page()
+        if not forwards:
+            while page.has_next:
+                page = paginator.page(after=page.next_cursor)
+        pages = [page.object_list]
+        while page.has_next if forwards else page.has_previous:
+            if forwards:
+                page = paginator.page(after=page.next_cursor)
+            else:
+                page = paginator.page(before=page.previous_cursor)
+            pages.append(page.object_list)
+        if not forwards:
+            pages.reverse()
+        return [event.pk for object_list in pages for event in object_list]
+
+    def test_cursor_round_trip(self):
+        event = Event.objects.order_by('pk').first()
+        fields = [Event._meta.get_field('timestamp'), Event._meta.get_field('id')]
+        self.assertEqual(decode_cursor(encode_cursor([event.timestamp, event.pk]), fields), [event.timestamp, event.pk])
+
+    def test_invalid_cursors(self):
+        paginator = self.get_paginator()
+        event = Event.objects.order_by('pk').first()
+        for cursor in [
+            'not a cursor!',
+            encode_cursor([event.timestamp.isoformat()])[:-2],
+            encode_cursor([event.timestamp]),
+            encode_cursor([event.timestamp, event.pk, 1]),
+            encode_cursor(['yesterday', event.pk]),
+            encode_cursor([event.timestamp, 'first']),
+            encode_cursor({'timestamp': event.timestamp.isoformat(), 'id': event.pk}),
+        ]:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    paginator.page(after=cursor)
+                with self.assertRaises(ValueError):
+                    paginator.page(before=cursor)
+                url = get_admin_url(Event, 'changelist')
+                response = self.client.get(url, {'after': cursor})
+                self.assertRedirects(response, '{}?e=1'.format(url), fetch_redirect_response=False)
+
+    def test_walk_forwards_and_backwards(self):
+        for ordering in [('-timestamp', '-id'), ('timestamp', 'id')]:
+            expected = list(Event.objects.order_by(*ordering).values_list('pk', flat=True))
+            with self.subTest(ordering=ordering):
+                paginator = self.get_paginator(ordering)
+                self.assertEqual(self.walk(paginator, forwards=True), expected)
+                self.assertEqual(self.walk(paginator, forwards=False), expected)
+
+    def test_sorted_by_first_keyset_field(self):
+        url = get_admin_url(Event, 'changelist')
+        response = self.client.get(url)
+        position, = response.context['cl'].sortable_columns
+        self.assertEqual(response.context['cl'].list_display[position], 'timestamp')
+        self.assertContains(response, 'class="sortable column-timestamp')
+        self.assertNotContains(response, 'class="sortable column-event_id')
+
+        for order, ordering in [('-{}', '-timestamp'), ('{}', 'timestamp')]:
+            with self.subTest(order=order):
+                response = self.client.get(url, {ORDER_VAR: order.format(position)})
+                self.assertEqual(
+                    [event.pk for event in response.context['cl'].result_list],
+                    list(Event.objects.order_by(ordering, ordering.replace('timestamp', 'id'))[:100].values_list(
+                        'pk', flat=True,
+                    )),
+                )
+
+        for order in ['-{}'.format(position + 1), 'x', '{}.{}'.format(position + 1, position)]:
+            with self.subTest(order=order):
+                response = self.client.get(url, {ORDER_VAR: order})
+                self.assertRedirects(response, '{}?e=1'.format(url), fetch_redirect_response=False)
@@ -1,5 +1,16 @@
+import csv
+import json
+
 from django.utils import timezone
 
+# Every bucket of the fixed-size time periods, in display order
+TIME_PERIOD_BUCKETS = {
+    'hour': range(0, 24),
+    'week_day': range(1, 8),
+    'day': range(1, 32),
+    'month': range(1, 13),
+}
+
 
 def datespan(start_date, end_date, delta=timezone.timedelta(days=1)):
     current_date = start_date
@@ -8,7 +19,59 @@ def datespan(start_date, end_date, delta=timezone.timedelta(days=1)):
         current_date += delta
 
 
+def densify(sparse, period, start_date=None, end_date=None):
+    """
+    Turns a sparse {bucket: value} result into a complete, ordered list of (bucket, value)
+    pairs for the time period given, with 0 for every bucket that has no value.
+
+    :param sparse: dict of bucket to value, e.g. {1: 21, 5: 31}
+    :param period: hour, week_day, day (of the month), month or date
+    :param start_date: for period 'date', the first date of the series; for period 'day', the
+        first date of the month, so the series stops at the end of that month
+    :param end_date: the date after the last date of the series
+    :return:
+
+    When period='week_day':
+
+    densify({2: 96, 5: 199}, 'week_day')
+    [(1, 0), (2, 96), (3, 0), (4, 0), (5, 199), (6, 0), (7, 0)]
+    """
+    if period == 'date':
+        buckets = list(datespan(start_date, end_date))
+    elif period == 'day' and start_date:
+        buckets = [date.day for date in datespan(start_date, end_date)]
+    else:
+        buckets = list(TIME_PERIOD_BUCKETS[period])
+
+    # Scatter the values into a zero-filled array rather than walking the gaps
+    positions = {bucket: position for position, bucket in enumerate(buckets)}
+    values = [0] * len(buckets)
+    for bucket, value in sparse.items():
+        position = positions.get(bucket)
+        if position is not None:
+            values[position] += value or 0
+
+    return list(zip(buckets, values))
+
+
 def round_to_next_30min(time):
     return time + (
             (timezone.datetime.min - time.replace(tzinfo=None)) % timezone.timedelta(minutes=30)
     )
+
+
+def read_records(path, file_format=None):
+    """
+    Streams the records of an export one at a time, as dicts. The format is taken from the file
+    extension unless given: "csv", or "jsonl" for one JSON object per line.
+    """
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    with open(path, newline='') as export:
+        if file_format == 'csv':
+            yield from csv.DictReader(export)
+        else:
+            for line in export:
+                if line.strip():
+                    yield json.loads(line)
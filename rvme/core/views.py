@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+
+from .instrumentation import request_timings
+
+
+def request_timings_view(request):
+    """
+    Admin page summarising the request timings recorded by this process, by view and filters.
+    """
+    timings = request_timings.timings()
+    context = dict(
+        admin.site.each_context(request),
+        title="Request timings",
+        summaries=request_timings.summarise(),
+        slowest=sorted(timings, key=lambda timing: timing.total, reverse=True)[:20],
+        recorded=len(timings),
+    )
+    return TemplateResponse(request, 'admin/request_timings.html', context)
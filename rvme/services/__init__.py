@@ -0,0 +1 @@
+default_app_config = 'rvme.services.apps.ServicesConfig'
@@ -1,38 +1,101 @@
+import datetime
 import json
+from collections import OrderedDict
 
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Case, When, IntegerField, F, Sum, Count, Value
-from django.db.models.functions import ExtractWeekDay, ExtractHour
-
+from django.db.models import BooleanField, Sum, Count, Value, F, Min, Max
+from django.db.models.functions import ExtractWeekDay, ExtractHour, ExtractDay, ExtractMonth
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import ugettext as _
+
+from rvme.core.cache import LRUCache, get_data_version
+from rvme.core.filters import PresentRelatedFieldListFilter
 from rvme.core.mixins import ReadOnlyAdminMixin
-from .models import TripSummary, EventSummary
-from .surecam.constants import EVENT_TYPES
+from rvme.core.profiling import ChangeListProfilingMixin
+from rvme.core.utils import densify
+from .aggregates import GroupingSet, event_type_pivot, grouping_sets
+from .constants import EVENT_SUMMARY_COLUMNS, TELEMATICS_SOURCES
+from rvme.bookings.models import Booking, Car, Location
+from .filters import ReportPeriodFilter
+from .models import (
+    TripSummary, EventSummary, UtilisationSummary, EventDailyCount, EventHourlyCount, TripHourlyMileage,
+    DailyPresence, ArchivedTripTotal,
+)
+from .surecam.models import Event, Trip
+from .utilisation import FleetUtilisation
 
 MILES_PER_METRE = 0.000621371
 
-
-class BaseSummaryAdmin(admin.ModelAdmin):
+# Expressions giving the time period a Trip, or a row of its hourly rollup, is charted under
+TRIP_TIME_PERIODS = {
+    'hour': ExtractHour('stop'),
+    'week_day': ExtractWeekDay('stop'),
+    'day': ExtractDay('stop'),
+    'month': ExtractMonth('stop'),
+}
+
+HOURLY_MILEAGE_TIME_PERIODS = {
+    'hour': F('hour'),
+    'week_day': F('week_day'),
+    'day': ExtractDay('day'),
+    'month': ExtractMonth('day'),
+}
+
+
+class SummaryChangeList(ChangeList):
+    def get_queryset(self, request):
+        # The date drill-down turns its parameters into a date, so they must make a real one.
+        # Raised here, where the admin redirects with ?e=1, rather than once the page renders.
+        if self.date_hierarchy:
+            year, month, day = (
+                self.params.get('{}__{}'.format(self.date_hierarchy, lookup)) for lookup in ('year', 'month', 'day')
+            )
+            if year or month or day:
+                try:
+                    datetime.date(int(year or 1), int(month or 1), int(day or 1))
+                except (TypeError, ValueError) as e:
+                    raise IncorrectLookupParameters(e)
+        return super().get_queryset(request)
+
+    def get_results(self, request):
+        # The summary templates replace the result list, so don't count or fetch the rows
+        self.result_count = 0
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = False
+        self.result_list = self.queryset.none()
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = self.model_admin.get_paginator(request, self.result_list, self.list_per_page)
+
+
+class BaseSummaryAdmin(ChangeListProfilingMixin, admin.ModelAdmin):
     list_filter = [
-        'car', 'user',
+        ('car', PresentRelatedFieldListFilter), ('user', PresentRelatedFieldListFilter),
     ]
 
-    class Media:
-        css = {
-            'all': ('css/admin.css',),
-        }
+    # Computed summary contexts, shared by all summary pages in this process
+    summary_cache = LRUCache(max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES)
 
+    # Models whose data the summary is computed from
+    summary_models = []
 
-@admin.register(EventSummary)
-class EventSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
-    change_list_template = 'admin/event_summary_change_list.html'
-    date_hierarchy = 'timestamp'
+    # DailyPresence source listing the days with data for the date_hierarchy drill-down
+    presence_source = None
 
     class Media:
         css = {
             'all': ('css/admin.css',),
         }
 
+    def get_changelist(self, request, **kwargs):
+        return SummaryChangeList
+
     def changelist_view(self, request, extra_context=None):
         response = super().changelist_view(
             request,
@@ -40,95 +103,258 @@ class EventSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
         )
 
         try:
-            qs = response.context_data['cl'].queryset
+            cl = response.context_data['cl']
         except (AttributeError, KeyError):
             return response
 
+        cache_key = self.get_summary_cache_key(cl)
+        summary_context = self.summary_cache.get(cache_key)
+        if summary_context is None:
+            summary_context = self.get_summary_context(cl)
+            summary_context['date_hierarchy_context'] = self.get_date_hierarchy_context(cl)
+            self.summary_cache.set(cache_key, summary_context)
+
+        response.context_data.update(summary_context)
+        return response
+
+    def get_summary_cache_key(self, cl):
+        # Summaries only change when their data does, so they're cached against the filters
+        # and a version number that's bumped whenever the underlying tables are written to
+        return (
+            self.model._meta.label_lower,
+            tuple(sorted(cl.get_filters_params().items())),
+            tuple(get_data_version(model) for model in self.summary_models),
+        )
+
+    def get_summary_context(self, cl):
+        """
+        Returns the context variables the summary template needs for the changelist given.
+        """
+        raise NotImplementedError
+
+    def get_date_hierarchy_context(self, cl):
+        """
+        Returns the context of the admin/date_hierarchy.html template for the changelist, finding
+        the years, months and days with data in the DailyPresence index rather than the raw rows.
+        Returns None where the filters can't be answered from whole days, leaving the drill-down
+        to Django.
+        """
+        rollup_filters = self.get_rollup_filters(cl, day_field='day')
+        if not (self.date_hierarchy and self.presence_source) or rollup_filters is None:
+            return None
+
+        presence = DailyPresence.objects.filter(source=self.presence_source, **{
+            param: value for param, value in rollup_filters.items() if not param.startswith('day__')
+        })
+        year_field, month_field, day_field = (
+            '{}__{}'.format(self.date_hierarchy, lookup) for lookup in ('year', 'month', 'day')
+        )
+        year_lookup = cl.params.get(year_field)
+        month_lookup = cl.params.get(month_field)
+        day_lookup = cl.params.get(day_field)
+
+        def link(filters):
+            return cl.get_query_string(filters, [self.date_hierarchy + '__'])
+
+        if not (year_lookup or month_lookup or day_lookup):
+            # Start at the year or month if all the data falls within one
+            date_range = presence.aggregate(first=Min('day'), last=Max('day'))
+            if date_range['first'] and date_range['first'].year == date_range['last'].year:
+                year_lookup = date_range['first'].year
+                if date_range['first'].month == date_range['last'].month:
+                    month_lookup = date_range['first'].month
+
+        if year_lookup and month_lookup and day_lookup:
+            day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+            return {
+                'show': True,
+                'back': {
+                    'link': link({year_field: year_lookup, month_field: month_lookup}),
+                    'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+                },
+                'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}],
+            }
+        elif year_lookup and month_lookup:
+            days = presence.filter(day__year=year_lookup, day__month=month_lookup).dates('day', 'day')
+            return {
+                'show': True,
+                'back': {
+                    'link': link({year_field: year_lookup}),
+                    'title': str(year_lookup),
+                },
+                'choices': [{
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                    'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                } for day in days],
+            }
+        elif year_lookup:
+            months = presence.filter(day__year=year_lookup).dates('day', 'month')
+            return {
+                'show': True,
+                'back': {
+                    'link': link({}),
+                    'title': _('All dates'),
+                },
+                'choices': [{
+                    'link': link({year_field: year_lookup, month_field: month.month}),
+                    'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+                } for month in months],
+            }
+        return {
+            'show': True,
+            'choices': [{
+                'link': link({year_field: str(year.year)}),
+                'title': str(year.year),
+            } for year in presence.dates('day', 'year')],
+        }
+
+    def get_rollup_filters(self, cl, day_field):
+        """
+        Translates the changelist filters into filters on a rollup table keyed by local day, car
+        and user. Returns None if any filter can't be answered from whole days.
+
+        For example, ?timestamp__year=2019&timestamp__month=1&car__id__exact=44 becomes:
+
+        {'day__year': '2019', 'day__month': '1', 'car__id__exact': '44'}
+        """
+        rollup_filters = {}
+        search_params = self.get_search_params(cl)
+        for param, value in cl.get_filters_params().items():
+            field, _, lookup = param.partition('__')
+            if param in search_params:
+                continue
+            elif field == self.date_hierarchy and lookup in ('year', 'month', 'day'):
+                rollup_filters['{}__{}'.format(day_field, lookup)] = value
+            elif param in ('car__id__exact', 'car__isnull', 'user__id__exact', 'user__isnull'):
+                rollup_filters[param] = value
+            else:
+                return None
+        return rollup_filters
+
+    def get_presence_queryset(self, cl, exclude_params):
+        """
+        Returns the DailyPresence rows of the changelist filtered by all but the given parameters,
+        for its car and user filters to list the values present from the index rather than the
+        raw rows. Returns None where the filters can't be answered from whole days.
+        """
+        rollup_filters = self.get_rollup_filters(cl, day_field='day')
+        if not self.presence_source or rollup_filters is None:
+            return None
+        return DailyPresence.objects.filter(source=self.presence_source, **{
+            param: value for param, value in rollup_filters.items() if param not in exclude_params
+        })
+
+    def get_search_params(self, cl):
+        """
+        Returns the parameters of the list filters' search boxes, which don't filter the rows.
+        """
+        return {
+            spec.search_kwarg for spec in cl.filter_specs if isinstance(spec, PresentRelatedFieldListFilter)
+        }
+
+
+@admin.register(EventSummary)
+class EventSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
+    change_list_template = 'admin/event_summary_change_list.html'
+    date_hierarchy = 'timestamp'
+    summary_models = [Event]
+    presence_source = TELEMATICS_SOURCES.event
+
+    class Media:
+        css = {
+            'all': ('css/admin.css',),
+        }
+
+    def get_summary_context(self, cl):
+        context = {}
+
         """
         Generate summary tables
         """
 
-        driver_summary_qs = qs.exclude(user=None)
-
-        # TODO #1a: Annotate driver_summary_qs to produce the per-driver event summaries
-        # TODO #1a: Output: <QuerySet [
-        #  {'user__id': 52, 'user__email': 'testdrive@evezy.co.uk', 'low_total': 451, 'medium_total': 92, 'high_total': 11, 'overspeed_total': 0, 'total_alerts': 554}
-        #  ]>
-        low_count = Sum(Case(
-            When(type=EVENT_TYPES.low, then=1),
-            default=0,
-            output_field=IntegerField(),
-        ))
-
-        medium_count = Sum(Case(
-            When(type=EVENT_TYPES.medium, then=1),
-            default=0,
-            output_field=IntegerField(),
-        ))
-        high_count = Sum(Case(
-            When(type=EVENT_TYPES.high, then=1),
-            default=0,
-            output_field=IntegerField(),
-        ))
-
-        overspeed_count = Sum(Case(
-            When(type=EVENT_TYPES.input1, then=1),
-            default=0,
-            output_field=IntegerField(),
-        ))
-
-        driver_event_summary = driver_summary_qs.values(
-            'user__id', 'user__email'
-        ).annotate(
-            low_total=low_count
-        ).annotate(
-            medium_total=medium_count
-        ).annotate(
-            high_total=high_count
-        ).annotate(
-            overspeed_total=overspeed_count
-        ).annotate(
-            total_alerts=F('high_total') + F('medium_total') + F('low_total') + F('overspeed_total')
-        ).order_by()
-        response.context_data['driver_event_summary'] = driver_event_summary
-
-        # TODO #1b: Re-using the filters you wrote above, produce a dictionary containing the totals for all drivers
-        # TODO #1b: Output: {'high_total': 11,
-        #  'low_total': 451,
-        #  'medium_total': 92,
-        #  'overspeed_total': 0,
-        #  'total_alerts': 554}
-        driver_event_summary_total = list(driver_event_summary)[0]
-        driver_event_summary_total.pop('user__id')
-        response.context_data['driver_event_summary_total'] = driver_event_summary_total
+        # Read the pre-aggregated daily counts unless the filters cut across days, and then the
+        # raw Events plus the hourly counts of those compacted, if the filters allow
+        group_by = ('user__id', 'user__email')
+        rollup_filters = self.get_rollup_filters(cl, day_field='day')
+        if rollup_filters is not None:
+            qs = EventDailyCount.objects.filter(**rollup_filters)
+            weight = F('count')
+            compacted_rows = []
+        else:
+            qs = cl.queryset
+            weight = Value(1)
+            compacted_filters = self.get_compacted_filters(cl)
+            compacted_rows = [] if compacted_filters is None else event_type_pivot(
+                EventHourlyCount.objects.filter(**compacted_filters).exclude(user=None),
+                group_by=group_by,
+                columns=EVENT_SUMMARY_COLUMNS,
+                weight=F('count'),
+            )[0]
+
+        driver_event_summary, driver_event_summary_total = event_type_pivot(
+            qs.exclude(user=None),
+            group_by=group_by,
+            columns=EVENT_SUMMARY_COLUMNS,
+            weight=weight,
+            extra_rows=compacted_rows,
+        )
+        context['driver_event_summary'] = driver_event_summary
+        context['driver_event_summary_total'] = driver_event_summary_total
+
+        return context
+
+    def get_compacted_filters(self, cl):
+        """
+        Translates the changelist filters into filters on the hourly counts of compacted Events.
+        Returns None if any filter can't be answered from whole local hours.
+
+        For example, ?timestamp__hour=8&type__exact=low becomes:
 
-        return response
+        {'hour__hour': '8', 'type__exact': 'low'}
+        """
+        compacted_filters = {}
+        search_params = self.get_search_params(cl)
+        for param, value in cl.get_filters_params().items():
+            field, _, lookup = param.partition('__')
+            if param in search_params:
+                continue
+            elif field == self.date_hierarchy and lookup in ('year', 'month', 'day', 'week_day', 'hour'):
+                compacted_filters['hour__' + lookup] = value
+            elif field in ('car', 'user', 'type'):
+                compacted_filters[param] = value
+            else:
+                return None
+        return compacted_filters
 
 
 @admin.register(TripSummary)
 class TripSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
     change_list_template = 'admin/trip_summary_change_list.html'
     date_hierarchy = 'stop'
+    summary_models = [Trip]
+    presence_source = TELEMATICS_SOURCES.trip
 
     class Media:
         css = {
             'all': ('css/admin.css',),
         }
 
-    def changelist_view(self, request, extra_context=None):
+    def get_summary_context(self, cl):
+        context = {}
+        qs = cl.queryset
 
-        def generate_by_time_period(qs, period, starting_index):
+        def generate_by_time_period(period, start_date=None, end_date=None):
             """
-            Generates an aggregated time-based summary of the Trip queryset passed in. For example, if
-            you pass in a period of "week", it will sum up the total_mileage over each day of the week
-            for the queryset given.
+            Generates an aggregated time-based summary of the Trips grouped by the period given.
+            For example, for the "week_day" period it gives the total_mileage over each day of the
+            week, with 0 for the days without any.
 
-            :param qs: Queryset of Trip objects
-            :param period: hour, week_day or day
-            :param starting_index:
+            :param period: hour, week_day, day (of the month) or month
+            :param start_date: for period 'day', the first date of the month being summarised
+            :param end_date: for period 'day', the first date of the following month
             :return:
 
-            When period='week':
+            When period='week_day':
 
             [{'time_period': 1, 'total_mileage': 34},
              {'time_period': 2, 'total_mileage': 96},
@@ -138,163 +364,113 @@ class TripSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
              {'time_period': 6, 'total_mileage': 216},
              {'time_period': 7, 'total_mileage': 41}]
             """
-            if period == 'week_day' or period == 'week':
-                summary_over_time_period = list(
-                    qs.filter(
-                        # Graph is time-based so we want to ignore parent Trips
-                        child_trips__isnull=True
-                    ).annotate(
-                        time_period=ExtractWeekDay('stop')
-                    ).values(
-                        'time_period',
-                    ).annotate(
-                         total_mileage=Sum('mileage') * Value(MILES_PER_METRE)
-                    ).order_by('time_period')
-                    # TODO #3: Complete the rest of this filter to produce the output
-                    #  above where param period="week"
-                )
+            summary_over_time_period = {
+                row[period + '_period']: int(row['total_mileage'] * MILES_PER_METRE)
+                for row in trip_groupings[period]
+            }
 
             """
-            This next block will take the data above and normalise it so that for the time period
-            given, every possible slot has a value - filling in zeros where necessary - so it
-            can be used in the graph on the Trip Summaries page.
+            Normalise the data above so that for the time period given, every possible slot has a
+            value - filling in zeros where necessary - so it can be used in the graphs on the Trip
+            Summaries page.
             """
-
-            # TODO #4: Remove the line below and modify the array from above so
-            #  that the output where param period="hour" looks correct
-
-            if period == 'hour':
-                summary_over_time_period = list(
-                    qs.filter(
-                        # Graph is time-based so we want to ignore parent Trips
-                        child_trips__isnull=True
-                    ).annotate(
-                        time_period=ExtractHour('stop')
-                    ).values(
-                        'time_period',
-                    ).annotate(
-                        total_mileage=Sum('mileage') * Value(MILES_PER_METRE)
-                    ).order_by('time_period')
+            return [
+                {'time_period': time_period, 'total_mileage': total_mileage}
+                for time_period, total_mileage in densify(
+                    summary_over_time_period, period, start_date=start_date, end_date=end_date,
                 )
-                normalised_summary = []
-                for index, period_mileage in enumerate(summary_over_time_period[1:], start=1):
-                    previous_period_mileage = summary_over_time_period[index - 1]
-                    expected_time_period = previous_period_mileage['time_period'] + 1
-                    actual_time_period = period_mileage['time_period']
-
-                    if actual_time_period != expected_time_period:
-                        missing_hours = []
-                        for time_period in range(expected_time_period, actual_time_period):
-                            missing_hours.append({'time_period': time_period, 'total_mileage': 0})
-                        normalised_summary += missing_hours
-
-                    normalised_summary.append(period_mileage)
-
-                summary_over_time_period = summary_over_time_period[:1] + normalised_summary
-
-                first_time_period = summary_over_time_period[0]['time_period']
-                if first_time_period != 0:
-                    missing_hours = []
-                    for time_period in range(first_time_period):
-                        missing_hours.append({'time_period': time_period, 'total_mileage': 0})
-                    summary_over_time_period = missing_hours + summary_over_time_period
-
-                last_time_period = summary_over_time_period[-1]['time_period']
-                if last_time_period != 23:
-                    missing_hours = []
-                    for time_period in range(last_time_period+1, 24):
-                        missing_hours.append({'time_period': time_period, 'total_mileage': 0})
-                    summary_over_time_period = summary_over_time_period + missing_hours
-
-            summary_over_time_period_output = summary_over_time_period
-            return summary_over_time_period_output
-
-        response = super().changelist_view(
-            request,
-            extra_context=extra_context,
-        )
+            ]
 
+        # The date chart follows the date_hierarchy drill-down: by month within a year, or by day
+        # within a month
+        date_period = start_date = end_date = None
         try:
-            qs = response.context_data['cl'].queryset
-        except (AttributeError, KeyError):
-            return response
+            year = int(cl.params.get('stop__year', 0))
+            month = int(cl.params.get('stop__month', 0))
+            if year and month and 'stop__day' not in cl.params:
+                date_period = 'day'
+                start_date = datetime.date(year, month, 1)
+                end_date = (start_date + datetime.timedelta(days=31)).replace(day=1)
+            elif year and not month:
+                date_period = 'month'
+        except ValueError:
+            pass
+        chart_periods = ['hour', 'week_day'] + ([date_period] if date_period else [])
+
+        # The charts read the pre-aggregated hourly mileage unless the filters cut across days.
+        # The archived root Trips' totals can only be filtered by day, car and driver.
+        rollup_filters = self.get_rollup_filters(cl, day_field='day')
+        if rollup_filters is not None:
+            hourly_mileage = TripHourlyMileage.objects.filter(**rollup_filters)
+            archived_rows = ArchivedTripTotal.objects.filter(**rollup_filters).values(
+                'car__pk', 'car__registration_number', 'user__id', 'user__email',
+            ).annotate(
+                total=Sum('trips'),
+                total_mileage=Sum('mileage'),
+                is_root=Value(True, output_field=BooleanField()),
+            ).order_by()
+        else:
+            hourly_mileage = None
+            archived_rows = []
 
         """
-        Generate summary tables
+        Generate summary tables, and the charts of the leaf Trips unless they come from the
+        hourly rollup, from one query of the Trips
         """
-        # TODO #2a: Group the trips by car and count the total number of trips and total mileage.
-        #  Output: [{'car__pk': 44,
-        #   'car__registration_number': 'PK68 RHW',
-        #   'total': 76,
-        #   'total_mileage': 635},
-        #  {'car__pk': 36,
-        #   'car__registration_number': 'BJ68 NDS',
-        #   'total': 32,
-        #   'total_mileage': 155},
-        #  {'car__pk': 55,
-        #   'car__registration_number': 'LL68 MTI',
-        #   'total': 4,
-        #   'total_mileage': 55}]
-
-        car_summary_output = list(
-            qs.filter(
-                parent_trip__isnull=True
-            ).values(
-                'car__registration_number', 'car__pk'
-            ).annotate(
-                total=Count('mileage')
-            ).annotate(
-                total_mileage=Sum('mileage') * Value(MILES_PER_METRE)
-            ).order_by()
-        )
-        response.context_data['car_summary'] = car_summary_output
-        response.context_data['car_summary_json'] = json.dumps(car_summary_output)
-
-        # TODO #2b: Re-using the filters you wrote above, do the same but driver-focused instead of car-focused
-        #  Output: [{'total': 112,
-        #   'total_mileage': 847,
-        #   'user__email': 'testdrive@evezy.co.uk',
-        #   'user__id': 52,
-        #   'user__pk': 52}]
-
-        driver_summary_output = list(
-            qs.filter(
-                parent_trip__isnull=True
-            ).values(
-                'user__id', 'user__pk', 'user__email'
-            ).annotate(
-                total=Count('mileage')
-            ).annotate(
-                total_mileage=Sum('mileage') * Value(MILES_PER_METRE)
-            ).order_by()
+
+        trip_grouping_sets = OrderedDict([
+            ('car_summary', GroupingSet(('car__pk', 'car__registration_number'), {'is_root': True})),
+            ('driver_summary', GroupingSet(('user__id', 'user__email'), {'is_root': True})),
+            ('trip_summary_total', GroupingSet((), {'is_root': True})),
+        ])
+        if hourly_mileage is None:
+            for period in chart_periods:
+                # Graph is time-based so we want to ignore parent Trips
+                trip_grouping_sets[period] = GroupingSet((period + '_period',), {'is_leaf': True})
+        trip_groupings = grouping_sets(
+            qs.annotate(**{
+                period + '_period': TRIP_TIME_PERIODS[period] for period in chart_periods
+            }),
+            trip_grouping_sets,
+            extra_rows=archived_rows,
+            total=Count('pk'),
+            total_mileage=Sum('mileage'),
         )
-        response.context_data['driver_summary'] = driver_summary_output
-        response.context_data['driver_summary_json'] = json.dumps(driver_summary_output)
-
-        # TODO #2c: Re-using the filters you wrote above, create a dict for the total trips and mileage
-        #  Output: {'total': 112, 'total_mileage': 847}
-        trip_summary_total = list(
-            qs.filter(
-                parent_trip__isnull=True
-            ).values(
-                'user__id', 'user__pk', 'user__email'
-            ).annotate(
-                total=Count('mileage')
-            ).annotate(
-                total_mileage=Sum('mileage') * Value(MILES_PER_METRE)
-            ).order_by().values(
-                'total', 'total_mileage')
-        )[0]
-        response.context_data['car_summary_total'] = response.context_data['driver_summary_total'] = trip_summary_total
+        if hourly_mileage is not None:
+            # The rollup already holds the local day, hour and weekday of every leaf Trip
+            trip_groupings.update(grouping_sets(
+                hourly_mileage.annotate(**{
+                    period + '_period': HOURLY_MILEAGE_TIME_PERIODS[period] for period in chart_periods
+                }),
+                OrderedDict((period, GroupingSet((period + '_period',), {})) for period in chart_periods),
+                total_mileage=Sum('mileage'),
+            ))
+
+        for name in ('car_summary', 'driver_summary', 'trip_summary_total'):
+            for row in trip_groupings[name]:
+                row['total_mileage'] = int(row['total_mileage'] * MILES_PER_METRE)
+
+        car_summary_output = trip_groupings['car_summary']
+        context['car_summary'] = car_summary_output
+        context['car_summary_json'] = json.dumps(car_summary_output)
+
+        driver_summary_output = trip_groupings['driver_summary']
+        for row in driver_summary_output:
+            row['user__pk'] = row['user__id']
+        context['driver_summary'] = driver_summary_output
+        context['driver_summary_json'] = json.dumps(driver_summary_output)
+
+        trip_summary_total = trip_groupings['trip_summary_total'][0]
+        context['car_summary_total'] = context['driver_summary_total'] = trip_summary_total
 
         """
         Generate statistics by hour
         """
 
-        summary_by_hour = generate_by_time_period(qs, 'hour', starting_index=0)
+        summary_by_hour = generate_by_time_period('hour')
 
-        response.context_data['summary_by_hour'] = summary_by_hour
-        response.context_data['summary_by_hour_json'] = json.dumps(
+        context['summary_by_hour'] = summary_by_hour
+        context['summary_by_hour_json'] = json.dumps(
             summary_by_hour,
             sort_keys=False,
             indent=1,
@@ -305,14 +481,78 @@ class TripSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
         Generate statistics by weekday
         """
 
-        summary_by_weekday = generate_by_time_period(qs, 'week_day', starting_index=1)
+        summary_by_weekday = generate_by_time_period('week_day')
 
-        response.context_data['summary_by_weekday'] = summary_by_weekday
-        response.context_data['summary_by_weekday_json'] = json.dumps(
+        context['summary_by_weekday'] = summary_by_weekday
+        context['summary_by_weekday_json'] = json.dumps(
             summary_by_weekday,
             sort_keys=False,
             indent=1,
             cls=DjangoJSONEncoder
         )
 
-        return response
+        """
+        Generate statistics for the date_hierarchy drill-down level
+        """
+
+        if date_period:
+            summary_by_date = generate_by_time_period(date_period, start_date=start_date, end_date=end_date)
+            context['summary_by_date_period'] = date_period
+            context['summary_by_date'] = summary_by_date
+            context['summary_by_date_json'] = json.dumps(
+                summary_by_date,
+                sort_keys=False,
+                indent=1,
+                cls=DjangoJSONEncoder
+            )
+
+        return context
+
+
+@admin.register(UtilisationSummary)
+class UtilisationSummaryAdmin(ReadOnlyAdminMixin, BaseSummaryAdmin):
+    change_list_template = 'admin/utilisation_summary_change_list.html'
+    list_filter = [
+        ReportPeriodFilter, ('car', PresentRelatedFieldListFilter), 'start_location',
+    ]
+    summary_models = [Booking]
+
+    class Media:
+        css = {
+            'all': ('css/admin.css',),
+        }
+
+    def get_period_filter(self, cl):
+        return next(spec for spec in cl.filter_specs if isinstance(spec, ReportPeriodFilter))
+
+    def get_summary_cache_key(self, cl):
+        # The default period moves with the date, so key on the period itself
+        period = self.get_period_filter(cl)
+        return super().get_summary_cache_key(cl) + (period.start_date, period.end_date)
+
+    def get_summary_context(self, cl):
+        context = {}
+        period = self.get_period_filter(cl)
+
+        cars = Car.objects.select_related('model__car_class')
+        if 'car__id__exact' in cl.get_filters_params():
+            cars = cars.filter(pk=cl.get_filters_params()['car__id__exact'])
+        cars = list(cars)
+
+        utilisation = FleetUtilisation(period.start, period.end).sweep(
+            cl.queryset.order_by(
+                'start_time',
+            ).values_list(
+                'car_id', 'start_location_id', 'start_time', 'end_time',
+            ).iterator()
+        )
+
+        context['period_start'] = period.start_date
+        context['period_end'] = period.end_date
+        context['car_utilisation'] = utilisation.car_rows(cars)
+        context['car_utilisation_total'] = utilisation.total_row(cars)
+        context['class_utilisation'] = utilisation.class_rows(cars)
+        context['location_peaks'] = utilisation.location_rows(
+            Location.objects.filter(pk__in=list(utilisation.peaks)).order_by('name')
+        )
+        return context
@@ -0,0 +1,243 @@
+from collections import OrderedDict, namedtuple
+from itertools import chain
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Case, When, IntegerField, Sum, Value
+
+# One grouping of a grouping_sets() call: the fields to group on, and the values the other
+# dimensions must have for a row to be included, e.g. GroupingSet(('car__pk',), {'is_root': True})
+GroupingSet = namedtuple('GroupingSet', ['fields', 'where'])
+
+
+def event_type_pivot(qs, group_by, columns, weight=Value(1), extra_rows=()):
+    """
+    Pivots a queryset of Events into one row per ``group_by`` value, with a count column for
+    each of the event types given in ``columns`` and a ``total_alerts`` column summing them.
+
+    The grand total is rolled up from the grouped rows as they are read rather than by a second
+    query, so the whole summary costs a single scan of ``qs``.
+
+    :param qs: Queryset of objects with a ``type`` field
+    :param group_by: fields to group on, e.g. ('user__id', 'user__email')
+    :param columns: OrderedDict of output column name to event type
+    :param weight: expression each matching row adds to its column, e.g. F('count') for
+        pre-aggregated rows
+    :param extra_rows: rows pivoted from elsewhere, e.g. the hourly counts of compacted Events,
+        added to the rows with the same ``group_by`` values
+    :return: (rows, total)
+
+    With columns=EVENT_SUMMARY_COLUMNS and group_by=('user__id', 'user__email'):
+
+    ([{'user__id': 52, 'user__email': 'testdrive@evezy.co.uk', 'low_total': 451,
+       'medium_total': 92, 'high_total': 11, 'overspeed_total': 0, 'total_alerts': 554}],
+     {'low_total': 451, 'medium_total': 92, 'high_total': 11, 'overspeed_total': 0,
+      'total_alerts': 554})
+    """
+    annotations = OrderedDict(
+        (column, Sum(Case(
+            When(type=event_type, then=weight),
+            default=0,
+            output_field=IntegerField(),
+        )))
+        for column, event_type in columns.items()
+    )
+
+    rows = OrderedDict()
+    for row in chain(qs.values(*group_by).annotate(**annotations).order_by(), extra_rows):
+        key = tuple(row[field] for field in group_by)
+        if key not in rows:
+            rows[key] = OrderedDict((field, row[field]) for field in group_by)
+            rows[key].update((column, 0) for column in columns)
+        for column in columns:
+            rows[key][column] += row[column] or 0
+
+    total = OrderedDict((column, 0) for column in columns)
+    total['total_alerts'] = 0
+    for row in rows.values():
+        row['total_alerts'] = sum(row[column] for column in columns)
+        for column in total:
+            total[column] += row[column]
+
+    return list(rows.values()), total
+
+
+def grouping_sets(qs, sets, extra_rows=(), **aggregates):
+    """
+    Computes several groupings of a queryset, each with the same additive aggregates, in a
+    single query: one scan with GROUPING SETS on PostgreSQL, and a UNION ALL of each set's
+    grouped subquery on other databases.
+
+    Each set only includes the rows with the values of its where, so e.g. the root and the leaf
+    Trips can be summarised together. GROUPING SETS has no filter per set, so there each set is
+    grouped on the dimensions of its where too and the other groups are dropped.
+    Only aggregates of a single expression that can be added together, such as Count and Sum,
+    give correct results.
+
+    :param qs: Queryset, annotated with any computed dimensions the sets refer to
+    :param sets: OrderedDict of name to GroupingSet
+    :param extra_rows: rows from elsewhere, e.g. the archived Trips' totals, added to every set
+        whose fields and where dimensions they hold values for
+    :param aggregates: aggregate expressions, e.g. total=Count('pk')
+    :return: OrderedDict of name to a list of rows, one per distinct value of the set's fields,
+        and always one for a set with no fields
+
+    With sets {'by_car': GroupingSet(('car__pk',), {}), 'total': GroupingSet((), {})}
+    and total=Count('pk'):
+
+    {'by_car': [{'car__pk': 44, 'total': 76}, {'car__pk': 36, 'total': 32}],
+     'total': [{'total': 108}]}
+    """
+    connection = connections[qs.db]
+    if connection.vendor == 'postgresql':
+        rows = _grouping_sets_rows(qs, sets, aggregates, connection)
+    else:
+        rows = _union_all_rows(qs, sets, aggregates, connection)
+
+    def matching_extra_rows():
+        for row in extra_rows:
+            for name, grouping_set in sets.items():
+                if all(field in row for field in chain(grouping_set.fields, grouping_set.where)):
+                    yield name, row
+
+    groups = OrderedDict((name, OrderedDict()) for name in sets)
+    for name, grouping_set in sets.items():
+        if not grouping_set.fields:
+            # The grand total of no rows is still a row
+            groups[name][()] = OrderedDict((aggregate, 0) for aggregate in aggregates)
+    for name, row in chain(rows, matching_extra_rows()):
+        grouping_set = sets[name]
+        if any(row[field] != value for field, value in grouping_set.where.items()):
+            continue
+        key = tuple(row[field] for field in grouping_set.fields)
+        group = groups[name].get(key)
+        if group is None:
+            group = groups[name][key] = OrderedDict(zip(grouping_set.fields, key))
+            group.update((aggregate, 0) for aggregate in aggregates)
+        for aggregate in aggregates:
+            group[aggregate] += row[aggregate] or 0
+
+    return OrderedDict((name, list(rows.values())) for name, rows in groups.items())
+
+
+def _compile_values(qs, connection):
+    """
+    Returns the SQL and params of a values() queryset, the names of its columns and the
+    converters Django would apply to each, by name.
+    """
+    compiler = qs.query.get_compiler(connection=connection)
+    sql, params = compiler.as_sql()
+    names = list(qs.query.extra_select) + list(qs.query.values_select) + list(qs.query.annotation_select)
+    converters = compiler.get_converters([column[0] for column in compiler.select[:compiler.col_count]])
+    converters = {names[position]: converter for position, converter in converters.items()}
+
+    def convert(name, value):
+        if name in converters:
+            name_converters, expression = converters[name]
+            for converter in name_converters:
+                value = converter(value, expression, connection, qs.query.context)
+        return value
+
+    return sql, params, names, convert
+
+
+def _grouping_sets_rows(qs, sets, aggregates, connection):
+    """
+    Yields the (set name, row) of every group, from one GROUPING SETS query of the ungrouped rows.
+    """
+    dimensions = []
+    for grouping_set in sets.values():
+        for field in chain(grouping_set.fields, grouping_set.where):
+            if field not in dimensions:
+                dimensions.append(field)
+    values = OrderedDict(
+        ('{}_value'.format(name), aggregate.get_source_expressions()[0])
+        for name, aggregate in aggregates.items()
+    )
+    try:
+        sql, params, names, convert = _compile_values(
+            qs.annotate(**values).values(*chain(dimensions, values)).order_by(), connection,
+        )
+    except EmptyResultSet:
+        return
+
+    quote = connection.ops.quote_name
+    columns = {name: quote('column_{}'.format(position)) for position, name in enumerate(names)}
+    dimension_columns = [columns[dimension] for dimension in dimensions]
+
+    # GROUPING() has a bit set for each of its arguments a group isn't grouped on, the first
+    # argument's bit highest, which tells which set each group belongs to
+    groupings = OrderedDict()
+    for name, grouping_set in sets.items():
+        grouped = [
+            dimension for dimension in dimensions
+            if dimension in grouping_set.fields or dimension in grouping_set.where
+        ]
+        mask = sum(
+            1 << (len(dimensions) - 1 - position)
+            for position, dimension in enumerate(dimensions) if dimension not in grouped
+        )
+        groupings.setdefault(mask, (grouped, []))[1].append(name)
+
+    grouped_sql = 'SELECT {dimensions}, GROUPING({dimensions}), {aggregates} FROM ({sql}) AS {alias} ({columns}) ' \
+        'GROUP BY GROUPING SETS ({sets})'.format(
+            dimensions=', '.join(dimension_columns),
+            aggregates=', '.join(
+                '{}({})'.format(aggregate.function, columns['{}_value'.format(name)])
+                for name, aggregate in aggregates.items()
+            ),
+            sql=sql,
+            alias=quote('grouped'),
+            columns=', '.join(columns[name] for name in names),
+            sets=', '.join(
+                '({})'.format(', '.join(columns[dimension] for dimension in grouped))
+                for grouped, names_of_sets in groupings.values()
+            ),
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(grouped_sql, params)
+        for result in cursor:
+            row = {dimension: convert(dimension, value) for dimension, value in zip(dimensions, result)}
+            row.update(zip(aggregates, result[len(dimensions) + 1:]))
+            grouped, names_of_sets = groupings[result[len(dimensions)]]
+            for name in names_of_sets:
+                yield name, row
+
+
+def _union_all_rows(qs, sets, aggregates, connection):
+    """
+    Yields the (set name, row) of every group, from one UNION ALL of each set's grouped query,
+    filtered by its where values so that it can use their indexes.
+    """
+    subqueries = []
+    for name, grouping_set in sets.items():
+        try:
+            subqueries.append((name,) + _compile_values(
+                qs.filter(**grouping_set.where).values(*grouping_set.fields).annotate(**aggregates).order_by(),
+                connection,
+            ))
+        except EmptyResultSet:
+            continue
+    if not subqueries:
+        return
+
+    # The subqueries are padded with nulls to the same number of columns, after the position
+    # of their set
+    width = max(len(names) for name, sql, params, names, convert in subqueries)
+    selects = [
+        'SELECT {}, *{} FROM ({})'.format(position, ', NULL' * (width - len(names)), sql)
+        for position, (name, sql, params, names, convert) in enumerate(subqueries)
+    ]
+    if connection.vendor == 'sqlite':
+        # Python's sqlite3 converts each column by the type it's declared with in the first
+        # select, which would apply one set's types to the others', so that is an empty select
+        # of nulls and each set's own converters are applied instead
+        selects.insert(0, 'SELECT {} WHERE 1 = 0'.format(', '.join(['NULL'] * (width + 1))))
+    union_sql = ' UNION ALL '.join(selects)
+    with connection.cursor() as cursor:
+        cursor.execute(union_sql, [param for name, sql, params, names, convert in subqueries for param in params])
+        for result in cursor:
+            name, sql, params, names, convert = subqueries[result[0]]
+            row = dict(sets[name].where)
+            row.update((column, convert(column, value)) for column, value in zip(names, result[1:]))
+            yield name, row
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ServicesConfig(AppConfig):
+    name = 'rvme.services'
+
+    def ready(self):
+        from . import signals  # noqa: F401
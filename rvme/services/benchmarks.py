@@ -0,0 +1,140 @@
+import re
+import statistics
+import time
+import tracemalloc
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max, Sum
+from django.http import QueryDict
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from rvme.core.filters import PresentRelatedFieldListFilter
+from .admin import BaseSummaryAdmin
+from .constants import TELEMATICS_SOURCES
+from .models import DailyPresence
+
+# Lines of a query plan that read a whole table, for each database vendor. SQLite's SCAN reads
+# every row even when it goes through an index, so only a SEARCH of the table is a seek
+SEQUENTIAL_SCANS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(?P<table>\w+)(?!\w)'),
+    'postgresql': re.compile(r'\bSeq Scan on (?P<table>\w+)'),
+}
+
+# Lines of a query plan that sort rows rather than read them in index order
+SORTS = {
+    'sqlite': re.compile(r'\bUSE TEMP B-TREE\b'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+# An unfiltered query reading up to a LIMIT, e.g. the first page of a changelist
+_UNFILTERED_LIMIT = re.compile(r'^(?!.*\bWHERE\b).*\bLIMIT\b', re.DOTALL)
+
+EXPLAIN = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+
+# Tables too big for the admin to read whole
+LARGE_TABLES = [
+    'bookings_booking', 'bookings_key', 'bookings_keyhistory', 'surecam_event', 'surecam_trip',
+    'surecam_tripclosure',
+]
+
+
+def summary_admins(models=None):
+    """
+    Returns the registered admin summary pages, or those of the models given.
+    """
+    return [
+        model_admin for model, model_admin in admin.site._registry.items()
+        if isinstance(model_admin, BaseSummaryAdmin) and (models is None or model in models)
+    ]
+
+
+def sample_filter_sets(model_admin):
+    """
+    Returns query strings for no filters, the car and the driver with the most data, and the
+    latest year, month and day with data, each as the summary would be filtered by them.
+    """
+    presence = DailyPresence.objects.filter(source=model_admin.presence_source or TELEMATICS_SOURCES.event)
+    filter_sets = ['']
+    busiest_car = presence.values('car').annotate(total=Sum('count')).order_by('-total').first()
+    if busiest_car:
+        filter_sets.append('car__id__exact={}'.format(busiest_car['car']))
+    busiest_user = presence.exclude(user=None).values('user').annotate(total=Sum('count')).order_by('-total').first()
+    if busiest_user:
+        filter_sets.append('user__id__exact={}'.format(busiest_user['user']))
+
+    latest = presence.aggregate(last=Max('day'))['last']
+    if latest and model_admin.date_hierarchy:
+        year = '{}__year={}'.format(model_admin.date_hierarchy, latest.year)
+        month = '{}&{}__month={}'.format(year, model_admin.date_hierarchy, latest.month)
+        day = '{}&{}__day={}'.format(month, model_admin.date_hierarchy, latest.day)
+        filter_sets.extend([year, month, day])
+        if busiest_car:
+            filter_sets.append('car__id__exact={}&{}'.format(busiest_car['car'], month))
+    return filter_sets
+
+
+def render_summary(model_admin, query_string):
+    """
+    Renders the summary page for the query string with its caches cleared, as a superuser.
+    """
+    BaseSummaryAdmin.summary_cache.clear()
+    PresentRelatedFieldListFilter.values_cache.clear()
+    request = RequestFactory().get('/', QueryDict(query_string))
+    request.user = get_user_model()(is_active=True, is_staff=True, is_superuser=True)
+    response = model_admin.changelist_view(request)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def benchmark_summary(model_admin, query_string, repeat=3):
+    """
+    Renders the summary page uncached ``repeat`` times and returns the number of queries it
+    makes, its wall times in seconds, and the peak memory in bytes Python allocated rendering it
+    once more under tracemalloc, which would slow the timed renders.
+    """
+    times = []
+    for run in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            render_summary(model_admin, query_string)
+            times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        render_summary(model_admin, query_string)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'page': model_admin.model._meta.label_lower,
+        'filters': query_string,
+        'queries': len(context.captured_queries),
+        'wall_time': {
+            'min': min(times),
+            'median': statistics.median(times),
+            'max': max(times),
+        },
+        'peak_memory': peak,
+    }
+
+
+def sequential_scans(sql):
+    """
+    Returns the tables the query reads with a sequential scan, from its plan. An unfiltered query
+    that reads its rows in index order stops at its LIMIT, so it isn't counted as reading the
+    whole table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(EXPLAIN[connection.vendor] + sql)
+        plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    if _UNFILTERED_LIMIT.search(sql) and not SORTS[connection.vendor].search(plan):
+        return []
+    return [match.group('table') for match in SEQUENTIAL_SCANS[connection.vendor].finditer(plan)]
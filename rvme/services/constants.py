@@ -1,5 +1,9 @@
+from collections import OrderedDict
+
 from model_utils import Choices
 
+from .surecam.constants import EVENT_TYPES
+
 STATS_TIME_PERIODS = Choices(
     ('001_day', 'Last Day'),
     ('007_week', 'Last Week'),
@@ -8,3 +12,17 @@ STATS_TIME_PERIODS = Choices(
     ('183_sixmonths', 'Last 6 Months'),
     ('365_year', 'Last Year'),
 )
+
+# Telematics recorded in the DailyPresence index
+TELEMATICS_SOURCES = Choices(
+    ('event', 'Events'),
+    ('trip', 'Trips'),
+)
+
+# Columns of the Event Summary table, mapped to the event type each one counts
+EVENT_SUMMARY_COLUMNS = OrderedDict([
+    ('low_total', EVENT_TYPES.low),
+    ('medium_total', EVENT_TYPES.medium),
+    ('high_total', EVENT_TYPES.high),
+    ('overspeed_total', EVENT_TYPES.input1),
+])
@@ -0,0 +1,95 @@
+import datetime
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rvme.bookings.slots import local_day_start
+
+
+class ReportPeriodFilter(admin.ListFilter):
+    """
+    Restricts a report to the local days from period_start to period_end inclusive, both given as
+    YYYY-MM-DD, offering the usual periods as choices. Rows are kept if the span from their
+    start_field to their end_field overlaps the period.
+    """
+    title = 'period'
+    template = 'admin/filter.html'
+    parameter_start = 'period_start'
+    parameter_end = 'period_end'
+    start_field = 'start_time'
+    end_field = 'end_time'
+    default_days = 30
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.used_parameters = {
+            parameter: params.pop(parameter)
+            for parameter in self.expected_parameters() if parameter in params
+        }
+        self.today = timezone.localdate()
+        self.start_date, self.end_date = self.default_period()
+        if self.used_parameters:
+            try:
+                self.start_date = parse_date(self.used_parameters.get(self.parameter_start, '')) or self.start_date
+                self.end_date = parse_date(self.used_parameters.get(self.parameter_end, '')) or self.end_date
+            except ValueError as e:
+                # Well formatted but impossible dates, e.g. 2019-02-30
+                raise IncorrectLookupParameters(e)
+        if self.end_date < self.start_date:
+            raise IncorrectLookupParameters("The period ends before it starts")
+
+    def default_period(self):
+        return self.today - datetime.timedelta(days=self.default_days - 1), self.today
+
+    @property
+    def start(self):
+        return local_day_start(self.start_date)
+
+    @property
+    def end(self):
+        return local_day_start(self.end_date + datetime.timedelta(days=1))
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_start, self.parameter_end]
+
+    def queryset(self, request, queryset):
+        return queryset.filter(**{
+            self.start_field + '__lt': self.end,
+            self.end_field + '__gt': self.start,
+        })
+
+    def periods(self):
+        first_of_month = self.today.replace(day=1)
+        last_month_end = first_of_month - datetime.timedelta(days=1)
+        return [
+            ("Last 7 days", self.today - datetime.timedelta(days=6), self.today),
+            ("Last {} days".format(self.default_days),) + self.default_period(),
+            ("This month", first_of_month, self.today),
+            ("Last month", last_month_end.replace(day=1), last_month_end),
+            ("This year", self.today.replace(month=1, day=1), self.today),
+        ]
+
+    def choices(self, changelist):
+        matched = False
+        for title, start_date, end_date in self.periods():
+            selected = (start_date, end_date) == (self.start_date, self.end_date) and not matched
+            matched = matched or selected
+            yield {
+                'selected': selected,
+                'query_string': changelist.get_query_string({
+                    self.parameter_start: start_date.isoformat(),
+                    self.parameter_end: end_date.isoformat(),
+                }),
+                'display': title,
+            }
+        if not matched:
+            yield {
+                'selected': True,
+                'query_string': changelist.get_query_string(),
+                'display': "{:%d %b %Y} to {:%d %b %Y}".format(self.start_date, self.end_date),
+            }
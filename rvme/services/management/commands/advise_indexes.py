@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rvme.services.benchmarks import (
+    SEQUENTIAL_SCANS, render_summary, sample_filter_sets, sequential_scans, summary_admins,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders every admin summary page for a sample of filters, runs EXPLAIN on each query "
+        "they make, and reports the tables read with a sequential scan"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filters', action='append', dest='filter_sets',
+            help="Changelist query string to sample, e.g. car__id__exact=44, may be repeated. "
+                 "Defaults to no filters, the busiest car and driver, and the latest year, month and day",
+        )
+        parser.add_argument(
+            '--ignore-table', action='append', dest='ignored_tables', default=[],
+            help="Table small enough to scan, may be repeated",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQUENTIAL_SCANS:
+            raise CommandError("Query plans can't be read from {} databases".format(connection.vendor))
+
+        scans = OrderedDict()
+        explained = 0
+        for model_admin in summary_admins():
+            for query_string in options['filter_sets'] or sample_filter_sets(model_admin):
+                for sql in self.capture_queries(model_admin, query_string):
+                    explained += 1
+                    for table in sequential_scans(sql):
+                        if table not in options['ignored_tables']:
+                            page = '{}?{}'.format(model_admin.model._meta.label_lower, query_string)
+                            scans.setdefault(table, OrderedDict()).setdefault(page, sql)
+
+        self.stdout.write("Explained {} queries".format(explained))
+        if not scans:
+            self.stdout.write(self.style.SUCCESS("No sequential scans"))
+        for table, pages in scans.items():
+            self.stdout.write(self.style.WARNING("Sequential scan of {}".format(table)))
+            for page, sql in pages.items():
+                self.stdout.write("  {}\n    {}".format(page, sql))
+
+    def capture_queries(self, model_admin, query_string):
+        """
+        Renders the summary page uncached and returns the SELECT queries it made.
+        """
+        with CaptureQueriesContext(connection) as context:
+            render_summary(model_admin, query_string)
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
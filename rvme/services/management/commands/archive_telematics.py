@@ -0,0 +1,56 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rvme.services.constants import TELEMATICS_SOURCES
+from rvme.services.models import DailyPresence, TelematicsArchive
+
+
+def parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError("Invalid month: {}, expected YYYY-MM".format(value))
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the months of SureCam events and trips older than --months into compressed archive "
+        "files, or moves an archived month back with --restore"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=settings.TELEMATICS_HOT_MONTHS,
+            help="Number of recent months to keep, including this one",
+        )
+        parser.add_argument(
+            '--source', action='append', dest='sources', choices=[source for source, label in TELEMATICS_SOURCES],
+            help="event or trip, may be repeated. Defaults to both",
+        )
+        parser.add_argument('--restore', type=parse_month, metavar='YYYY-MM')
+
+    def handle(self, *args, **options):
+        sources = options['sources'] or [source for source, label in TELEMATICS_SOURCES]
+        if options['restore']:
+            for archive in TelematicsArchive.objects.filter(source__in=sources, month=options['restore']):
+                TelematicsArchive.objects.restore(archive)
+                self.stdout.write("Restored {} rows of {}".format(archive.rows, archive))
+            return
+
+        if options['months'] < 1:
+            raise CommandError("At least this month must be kept")
+        cutoff = timezone.localdate().replace(day=1)
+        for i in range(options['months'] - 1):
+            cutoff = (cutoff - datetime.timedelta(days=1)).replace(day=1)
+        for source in sources:
+            archived = set(TelematicsArchive.objects.filter(source=source).values_list('month', flat=True))
+            months = DailyPresence.objects.filter(source=source, day__lt=cutoff).dates('day', 'month')
+            for month in months:
+                if month in archived:
+                    continue
+                archive = TelematicsArchive.objects.archive(source, month)
+                if archive:
+                    self.stdout.write("Archived {} rows of {} to {}".format(archive.rows, archive, archive.path))
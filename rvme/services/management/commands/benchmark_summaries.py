@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from rvme.services.benchmarks import benchmark_summary, sample_filter_sets, summary_admins
+from rvme.services.models import EventSummary, TripSummary
+from rvme.services.surecam.models import Event, Trip
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the Event and Trip Summary pages uncached for a sample of filters and date ranges, "
+        "and writes their query counts, wall times and peak memory to a JSON file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the JSON file to write")
+        parser.add_argument(
+            '--filters', action='append', dest='filter_sets',
+            help="Changelist query string to time, e.g. car__id__exact=44, may be repeated. "
+                 "Defaults to no filters, the busiest car and driver, and the latest year, month and day",
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Number of timed renders of each page")
+
+    def handle(self, *args, **options):
+        results = []
+        for model_admin in summary_admins([EventSummary, TripSummary]):
+            for query_string in options['filter_sets'] or sample_filter_sets(model_admin):
+                result = benchmark_summary(model_admin, query_string, repeat=max(options['repeat'], 1))
+                results.append(result)
+                self.stdout.write("{}?{}: {} queries, {:.3f}s, {:.1f} MB".format(
+                    result['page'], result['filters'], result['queries'], result['wall_time']['median'],
+                    result['peak_memory'] / 2 ** 20,
+                ))
+
+        with open(options['output'], 'w') as output:
+            json.dump({
+                'run': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'rows': {
+                    'events': Event.objects.count(),
+                    'trips': Trip.objects.count(),
+                },
+                'results': results,
+            }, output, indent=2)
+        self.stdout.write(self.style.SUCCESS("Wrote {} results to {}".format(len(results), options['output'])))
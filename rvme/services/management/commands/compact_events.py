@@ -0,0 +1,33 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rvme.bookings.slots import local_day_start
+from rvme.services.models import EventHourlyCount
+from rvme.services.surecam.constants import EVENT_TYPES
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacts the raw SureCam events older than --days into hourly counts per car, driver and "
+        "type, and deletes them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TELEMATICS_RAW_EVENT_DAYS,
+            help="Number of recent local days of raw events to keep, including today",
+        )
+        parser.add_argument(
+            '--type', action='append', dest='types', choices=[event_type for event_type, label in EVENT_TYPES],
+            help="Event type to compact, may be repeated. Defaults to all",
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("At least today must be kept")
+        cutoff = local_day_start(timezone.localdate() - datetime.timedelta(days=options['days'] - 1))
+        compacted = EventHourlyCount.objects.compact(cutoff, types=options['types'])
+        self.stdout.write("Compacted {} events from before {:%Y-%m-%d}".format(compacted, cutoff))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rvme.services.synthetic import SyntheticFleet
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a reproducible fleet of Cars, drivers and Bookings with SureCam trips and events "
+        "for load testing, e.g. --cars 500 --drivers 5000 --events 50000000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="The same seed and options give the same data")
+        parser.add_argument('--cars', type=int, default=50)
+        parser.add_argument('--drivers', type=int, default=500)
+        parser.add_argument('--events', type=int, default=100000, help="Approximate number of events")
+        parser.add_argument('--days', type=int, default=365, help="Number of local days of data")
+        parser.add_argument(
+            '--until', type=parse_date,
+            help="YYYY-MM-DD, the last local day of data. Defaults to today, so pass it to reproduce data",
+        )
+        parser.add_argument('--trips-per-day', type=int, default=3, help="Average journeys a day a Car is booked")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if min(options['cars'], options['drivers'], options['days']) < 1:
+            raise CommandError("At least one car, driver and day must be generated")
+        fleet = SyntheticFleet(
+            seed=options['seed'],
+            cars=options['cars'],
+            drivers=options['drivers'],
+            events=options['events'],
+            days=options['days'],
+            until=options['until'] or timezone.localdate(),
+            trips_per_day=options['trips_per_day'],
+            chunk_size=options['chunk_size'],
+            progress=self.report,
+        )
+        if fleet.exists():
+            raise CommandError("Data for seed {} has already been generated".format(options['seed']))
+
+        trip_importer, event_importer = fleet.generate()
+        self.stdout.write(self.style.SUCCESS(
+            "Generated {} cars, {} drivers, {} trips and {} events".format(
+                options['cars'], options['drivers'], trip_importer.created, event_importer.created,
+            )
+        ))
+
+    def report(self, importer):
+        self.stdout.write("{} {} created ({:.0f} rows/s)".format(
+            importer.created, importer.model._meta.verbose_name_plural, importer.rows_per_second,
+        ))
@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import datetime, time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rvme.bookings.intervals import BookingIntervalIndex
+from rvme.core.cache import bump_data_version
+from rvme.services.constants import TELEMATICS_SOURCES
+from rvme.services.models import DailyPresence, EventDailyCount, TripHourlyMileage
+from rvme.services.surecam.attribution import attribute
+from rvme.services.surecam.models import Event, Trip
+
+# (model, field attributed by, field the summary rollup is by day of, rollup, presence source)
+TELEMATICS = [
+    (Event, 'timestamp', 'timestamp', EventDailyCount, TELEMATICS_SOURCES.event),
+    (Trip, 'start', 'stop', TripHourlyMileage, TELEMATICS_SOURCES.trip),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-attributes SureCam events and trips to the Bookings that held their Cars at the time, "
+        "after Bookings have been created, moved or cancelled"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--car', type=int, action='append', dest='car_ids', help="Car id, may be repeated")
+        parser.add_argument('--since', type=parse_date, help="YYYY-MM-DD, local time")
+        parser.add_argument('--until', type=parse_date, help="YYYY-MM-DD inclusive, local time")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        since, until = options['since'], options['until']
+        index = BookingIntervalIndex.for_cars(
+            options['car_ids'],
+            start=since and timezone.make_aware(datetime.combine(since, time.min)),
+            end=until and timezone.make_aware(datetime.combine(until, time.max)),
+        )
+        for model, timestamp_field, day_field, rollup, source in TELEMATICS:
+            objs = model.objects.order_by(timestamp_field)
+            if options['car_ids']:
+                objs = objs.filter(car_id__in=options['car_ids'])
+            if since:
+                objs = objs.filter(**{timestamp_field + '__date__gte': since})
+            if until:
+                objs = objs.filter(**{timestamp_field + '__date__lte': until})
+            changed, days = self.reattribute(objs, timestamp_field, day_field, index)
+            if days:
+                rollup.objects.rebuild(min(days), max(days))
+                DailyPresence.objects.rebuild(source, min(days), max(days))
+                bump_data_version(model)
+            self.stdout.write("Re-attributed {} {}".format(changed, model._meta.verbose_name_plural))
+
+    def reattribute(self, objs, timestamp_field, day_field, index):
+        """
+        Re-attributes the instances in chunks, updating those that changed with one query per
+        distinct attribution. Returns the number changed and the local days they summarise into.
+        """
+        count, days = 0, set()
+        rows = objs.iterator()
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            changed = attribute(chunk, timestamp_field, index)
+            by_attribution = defaultdict(list)
+            for obj in changed:
+                by_attribution[(obj.booking_id, obj.key_id, obj.user_id)].append(obj.pk)
+                days.add(timezone.localtime(getattr(obj, day_field)).date())
+            with transaction.atomic():
+                for (booking_id, key_id, user_id), pks in by_attribution.items():
+                    objs.model.objects.filter(pk__in=pks).update(
+                        booking_id=booking_id, key_id=key_id, user_id=user_id, modified=timezone.now(),
+                    )
+            count += len(changed)
+        return count, days
@@ -0,0 +1,437 @@
+import datetime
+import gzip
+import json
+import tempfile
+from collections import Counter
+from itertools import chain, islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, ExtractHour
+from django.utils import timezone
+
+from rvme.bookings.slots import local_day_start
+from rvme.core.cache import bump_data_version
+from .constants import TELEMATICS_SOURCES
+from .surecam.models import Event, Trip, TripClosure
+
+
+class EventDailyCountManager(models.Manager):
+    def record(self, events, sign=1):
+        """
+        Adds the given Events to the daily counts, or removes them again when sign=-1.
+        """
+        counts = Counter(
+            (timezone.localtime(event.timestamp).date(), event.car_id, event.user_id, event.type)
+            for event in events
+        )
+        for (day, car_id, user_id, event_type), count in counts.items():
+            lookup = dict(day=day, car_id=car_id, user_id=user_id, type=event_type)
+            with transaction.atomic():
+                updated = self.filter(**lookup).update(count=F('count') + sign * count)
+                if sign < 0:
+                    self.filter(count__lte=0, **lookup).delete()
+                    continue
+                if updated:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(count=count, **lookup)
+                except IntegrityError:
+                    # Another process created the row between our update and insert
+                    self.filter(**lookup).update(count=F('count') + count)
+
+    def rebuild(self, start=None, end=None):
+        """
+        Recomputes the daily counts for the local days from start to end inclusive (or for all
+        days) from the raw Events, the hourly counts of compacted Events and the archived Events.
+        """
+        events = Event.objects.all()
+        compacted = apps.get_model('services', 'EventHourlyCount').objects.all()
+        daily_counts = self.all()
+        if start:
+            events = events.filter(timestamp__date__gte=start)
+            compacted = compacted.filter(hour__date__gte=start)
+            daily_counts = daily_counts.filter(day__gte=start)
+        if end:
+            events = events.filter(timestamp__date__lte=end)
+            compacted = compacted.filter(hour__date__lte=end)
+            daily_counts = daily_counts.filter(day__lte=end)
+
+        rows = chain(
+            events.annotate(
+                day=TruncDate('timestamp'),
+            ).values(
+                'day', 'car', 'user', 'type',
+            ).annotate(
+                count=Count('pk'),
+            ).order_by().iterator(),
+            compacted.annotate(
+                day=TruncDate('hour'),
+            ).values(
+                'day', 'car', 'user', 'type',
+            ).annotate(
+                count=Sum('count'),
+            ).order_by().iterator(),
+        )
+        counts = Counter()
+        for row in rows:
+            counts[(row['day'], row['car'], row['user'], row['type'])] += row['count']
+        archives = apps.get_model('services', 'TelematicsArchive').objects
+        for event in archives.read(TELEMATICS_SOURCES.event, start, end):
+            counts[(timezone.localtime(event.timestamp).date(), event.car_id, event.user_id, event.type)] += 1
+
+        with transaction.atomic():
+            daily_counts.delete()
+            self.bulk_create(
+                self.model(day=day, car_id=car_id, user_id=user_id, type=event_type, count=count)
+                for (day, car_id, user_id, event_type), count in counts.items()
+            )
+
+
+class EventHourlyCountManager(models.Manager):
+    # Raw Events compacted and deleted per transaction
+    BATCH_SIZE = 1000
+
+    def record(self, counts):
+        """
+        Adds counts of Events, keyed by (start of local hour, car id, user id, type).
+        """
+        for (hour, car_id, user_id, event_type), count in counts.items():
+            lookup = dict(hour=hour, car_id=car_id, user_id=user_id, type=event_type)
+            with transaction.atomic():
+                updated = self.filter(**lookup).update(count=F('count') + count)
+                if updated:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(count=count, **lookup)
+                except IntegrityError:
+                    # Another process created the row between our update and insert
+                    self.filter(**lookup).update(count=F('count') + count)
+
+    def compact(self, before, types=None):
+        """
+        Adds the raw Events stamped before the time given, optionally only those of the given
+        types, to the hourly counts and deletes them, a batch at a time. Returns the number of
+        Events compacted.
+
+        The Events are deleted without signals so the daily counts and DailyPresence keep
+        counting them, and the Event Summary doesn't change.
+        """
+        events = Event.objects.filter(timestamp__lt=before).order_by('timestamp', 'pk')
+        if types:
+            events = events.filter(type__in=types)
+        compacted = 0
+        while True:
+            with transaction.atomic():
+                batch = list(events.values_list('pk', 'timestamp', 'car_id', 'user_id', 'type')[:self.BATCH_SIZE])
+                if not batch:
+                    break
+                self.record(Counter(
+                    (
+                        timezone.localtime(timestamp).replace(minute=0, second=0, microsecond=0),
+                        car_id, user_id, event_type,
+                    )
+                    for pk, timestamp, car_id, user_id, event_type in batch
+                ))
+                Event.objects.filter(pk__in=[row[0] for row in batch])._raw_delete(self.db)
+            compacted += len(batch)
+        if compacted:
+            bump_data_version(Event)
+        return compacted
+
+
+class TripHourlyTotalsManager(models.Manager):
+    def record(self, trips, sign=1):
+        """
+        Adds the given Trips to the hourly totals, or removes them again when sign=-1.
+        """
+        totals = {}
+        for trip in trips:
+            stop = timezone.localtime(trip.stop)
+            key = (stop.date(), stop.hour, trip.car_id, trip.user_id)
+            count, mileage = totals.get(key, (0, 0))
+            totals[key] = (count + 1, mileage + (trip.mileage or 0))
+
+        for (day, hour, car_id, user_id), (count, mileage) in totals.items():
+            lookup = dict(day=day, hour=hour, car_id=car_id, user_id=user_id)
+            with transaction.atomic():
+                updated = self.filter(**lookup).update(
+                    trips=F('trips') + sign * count,
+                    mileage=F('mileage') + sign * mileage,
+                )
+                if sign < 0:
+                    self.filter(trips__lte=0, **lookup).delete()
+                    continue
+                if updated:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(
+                            week_day=day.isoweekday() % 7 + 1, trips=count, mileage=mileage,
+                            **lookup
+                        )
+                except IntegrityError:
+                    # Another process created the row between our update and insert
+                    self.filter(**lookup).update(
+                        trips=F('trips') + count,
+                        mileage=F('mileage') + mileage,
+                    )
+
+
+class TripHourlyMileageManager(TripHourlyTotalsManager):
+    def rebuild(self, start=None, end=None):
+        """
+        Recomputes the hourly mileage for the local days from start to end inclusive (or for all
+        days) from the raw and the archived leaf Trips.
+        """
+        trips = Trip.objects.leaves()
+        hourly_mileage = self.all()
+        if start:
+            trips = trips.filter(stop__date__gte=start)
+            hourly_mileage = hourly_mileage.filter(day__gte=start)
+        if end:
+            trips = trips.filter(stop__date__lte=end)
+            hourly_mileage = hourly_mileage.filter(day__lte=end)
+
+        rows = trips.annotate(
+            day=TruncDate('stop'),
+            hour=ExtractHour('stop'),
+        ).values(
+            'day', 'hour', 'car', 'user',
+        ).annotate(
+            trips=Count('pk'),
+            total_mileage=Sum('mileage'),
+        ).order_by()
+        totals = {
+            (row['day'], row['hour'], row['car'], row['user']): (row['trips'], row['total_mileage'] or 0)
+            for row in rows.iterator()
+        }
+        archives = apps.get_model('services', 'TelematicsArchive').objects
+        for trip in archives.read(TELEMATICS_SOURCES.trip, start, end):
+            if not trip.is_leaf:
+                continue
+            stop = timezone.localtime(trip.stop)
+            key = (stop.date(), stop.hour, trip.car_id, trip.user_id)
+            count, mileage = totals.get(key, (0, 0))
+            totals[key] = (count + 1, mileage + (trip.mileage or 0))
+
+        with transaction.atomic():
+            hourly_mileage.delete()
+            self.bulk_create(
+                self.model(
+                    day=day, hour=hour, week_day=day.isoweekday() % 7 + 1, car_id=car_id, user_id=user_id,
+                    trips=count, mileage=mileage,
+                )
+                for (day, hour, car_id, user_id), (count, mileage) in totals.items()
+            )
+
+
+class DailyPresenceManager(models.Manager):
+    # Model and field giving the local day of each source
+    SOURCES = {
+        TELEMATICS_SOURCES.event: (Event, 'timestamp'),
+        TELEMATICS_SOURCES.trip: (Trip, 'stop'),
+    }
+
+    def record(self, source, objs, sign=1):
+        """
+        Adds the given Events or Trips to the index, or removes them again when sign=-1.
+        """
+        model, day_field = self.SOURCES[source]
+        counts = Counter(
+            (timezone.localtime(getattr(obj, day_field)).date(), obj.car_id, obj.user_id)
+            for obj in objs
+        )
+        for (day, car_id, user_id), count in counts.items():
+            lookup = dict(source=source, day=day, car_id=car_id, user_id=user_id)
+            with transaction.atomic():
+                updated = self.filter(**lookup).update(count=F('count') + sign * count)
+                if sign < 0:
+                    self.filter(count__lte=0, **lookup).delete()
+                    continue
+                if updated:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(count=count, **lookup)
+                except IntegrityError:
+                    # Another process created the row between our update and insert
+                    self.filter(**lookup).update(count=F('count') + count)
+
+    def rebuild(self, source, start=None, end=None):
+        """
+        Recomputes the index of the source for the local days from start to end inclusive (or for
+        all days) from the raw and the archived Events or Trips, and the hourly counts of
+        compacted Events.
+        """
+        model, day_field = self.SOURCES[source]
+        objs = model.objects.all()
+        presence = self.filter(source=source)
+        if start:
+            objs = objs.filter(**{day_field + '__date__gte': start})
+            presence = presence.filter(day__gte=start)
+        if end:
+            objs = objs.filter(**{day_field + '__date__lte': end})
+            presence = presence.filter(day__lte=end)
+
+        rows = objs.annotate(
+            day=TruncDate(day_field),
+        ).values(
+            'day', 'car', 'user',
+        ).annotate(
+            count=Count('pk'),
+        ).order_by().iterator()
+        if source == TELEMATICS_SOURCES.event:
+            compacted = apps.get_model('services', 'EventHourlyCount').objects.all()
+            if start:
+                compacted = compacted.filter(hour__date__gte=start)
+            if end:
+                compacted = compacted.filter(hour__date__lte=end)
+            rows = chain(rows, compacted.annotate(
+                day=TruncDate('hour'),
+            ).values(
+                'day', 'car', 'user',
+            ).annotate(
+                count=Sum('count'),
+            ).order_by().iterator())
+        counts = Counter()
+        for row in rows:
+            counts[(row['day'], row['car'], row['user'])] += row['count']
+        archives = apps.get_model('services', 'TelematicsArchive').objects
+        for obj in archives.read(source, start, end):
+            counts[(timezone.localtime(getattr(obj, day_field)).date(), obj.car_id, obj.user_id)] += 1
+
+        with transaction.atomic():
+            presence.delete()
+            self.bulk_create(
+                self.model(source=source, day=day, car_id=car_id, user_id=user_id, count=count)
+                for (day, car_id, user_id), count in counts.items()
+            )
+
+
+def _next_month(month):
+    return (month.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+class TelematicsArchiveManager(models.Manager):
+    # Rows deleted or restored per query
+    BATCH_SIZE = 1000
+
+    def archive(self, source, month):
+        """
+        Moves the Events of the local month starting on the date given, or the Trip trees whose
+        roots stopped in it, out of the database into a gzipped file of JSON lines. Returns the
+        TelematicsArchive, or None if there was nothing to archive.
+
+        The rollups and DailyPresence still count the archived rows, so the summaries don't change.
+        """
+        if self.filter(source=source, month=month).exists():
+            raise ValueError("{} for {:%B %Y} are already archived".format(source, month))
+        model, day_field = DailyPresenceManager.SOURCES[source]
+        objs = model.objects.filter(**{
+            day_field + '__gte': local_day_start(month),
+            day_field + '__lt': local_day_start(_next_month(month)),
+        })
+        if source == TELEMATICS_SOURCES.trip:
+            # Whole trees are archived together, parents first
+            objs = objs.roots().subtrees().order_by('depth', 'pk')
+        else:
+            objs = objs.order_by('pk')
+
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        pks, roots = [], []
+        with tempfile.TemporaryFile() as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode='wb') as lines:
+                for row in objs.values_list(*attnames).iterator():
+                    values = dict(zip(attnames, row))
+                    lines.write(json.dumps(values, cls=DjangoJSONEncoder).encode() + b'\n')
+                    pks.append(values[model._meta.pk.attname])
+                    if source == TELEMATICS_SOURCES.trip and values['parent_trip_id'] is None:
+                        roots.append(model(**values))
+            if not pks:
+                return None
+            archive_file.seek(0)
+            path = default_storage.save(
+                '{}/{}/{:%Y-%m}.jsonl.gz'.format(settings.TELEMATICS_ARCHIVE_DIR, source, month),
+                File(archive_file),
+            )
+
+        with transaction.atomic():
+            archive = self.create(source=source, month=month, path=path, rows=len(pks))
+            # The Trip Summary tables read the archived root Trips' totals rather than the file
+            apps.get_model('services', 'ArchivedTripTotal').objects.record(roots)
+            # Deleted without signals so the rollups keep counting the rows, children first
+            pks.reverse()
+            for start in range(0, len(pks), self.BATCH_SIZE):
+                batch = pks[start:start + self.BATCH_SIZE]
+                if source == TELEMATICS_SOURCES.trip:
+                    TripClosure.objects.filter(descendant_id__in=batch)._raw_delete(self.db)
+                model.objects.filter(pk__in=batch)._raw_delete(self.db)
+        bump_data_version(model)
+        return archive
+
+    def restore(self, archive):
+        """
+        Moves an archive's rows back into the database and deletes the archive. Rows are restored
+        without signals, as the rollups still count them, and taken out of the archived Trip
+        totals. References to rows that have since been deleted are dropped, or the whole row
+        when the reference is required.
+        """
+        model = archive.model
+        objs = self.without_missing_references(model, archive.read())
+        with transaction.atomic():
+            for batch in iter(lambda: list(islice(objs, self.BATCH_SIZE)), []):
+                model.objects.bulk_create(batch)
+                if model is Trip:
+                    Trip.objects.add_to_hierarchy(batch)
+                    apps.get_model('services', 'ArchivedTripTotal').objects.record(
+                        [trip for trip in batch if trip.parent_trip_id is None], sign=-1,
+                    )
+            archive.delete()
+        default_storage.delete(archive.path)
+        bump_data_version(model)
+
+    def without_missing_references(self, model, objs):
+        objs = list(objs)
+        for field in model._meta.concrete_fields:
+            if not field.is_relation or field.related_model is model:
+                continue
+            existing = set(field.related_model._default_manager.filter(**{
+                field.target_field.name + '__in': {getattr(obj, field.attname) for obj in objs} - {None},
+            }).values_list(field.target_field.attname, flat=True))
+            if field.null:
+                for obj in objs:
+                    if getattr(obj, field.attname) not in existing:
+                        setattr(obj, field.attname, None)
+            else:
+                objs = [obj for obj in objs if getattr(obj, field.attname) in existing]
+        return iter(objs)
+
+    def read(self, source, start=None, end=None):
+        """
+        Yields the archived Events or Trips of the local days from start to end inclusive (or of
+        all days), opening only the archives of the months they can be in. References to rows
+        that have since been deleted are dropped as on restoring.
+        """
+        model, day_field = DailyPresenceManager.SOURCES[source]
+        archives = self.filter(source=source)
+        if start:
+            archives = archives.filter(month__gte=start.replace(day=1))
+        if end:
+            # A Trip tree is archived under the month its root stopped in, which can be the
+            # month after some of its Trips stopped
+            last = _next_month(end) if source == TELEMATICS_SOURCES.trip else end
+            archives = archives.filter(month__lte=last)
+
+        for archive in archives.order_by('month'):
+            for obj in self.without_missing_references(model, archive.read()):
+                day = timezone.localtime(getattr(obj, day_field)).date()
+                if (not start or day >= start) and (not end or day <= end):
+                    yield obj
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 19:33
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def populate_event_daily_counts(apps, schema_editor):
+    Event = apps.get_model('surecam', 'Event')
+    EventDailyCount = apps.get_model('services', 'EventDailyCount')
+
+    rows = Event.objects.annotate(
+        day=TruncDate('timestamp'),
+    ).values(
+        'day', 'car', 'user', 'type',
+    ).annotate(
+        count=Count('pk'),
+    ).order_by()
+
+    EventDailyCount.objects.bulk_create(
+        EventDailyCount(
+            day=row['day'], car_id=row['car'], user_id=row['user'], type=row['type'],
+            count=row['count'],
+        )
+        for row in rows.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0001_initial'),
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventDailyCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('type', models.CharField(choices=[('low', 'The accelerometer triggered a “low” event'), ('medium', 'The accelerometer triggered a “medium” event'), ('high', 'The accelerometer triggered a “high” event'), ('button', 'Button on the device was pressed'), ('input1', 'External cable input triggered an event'), ('start', 'Device started up'), ('stop', 'Device shutdown'), ('kl15_off', 'Ignition was turned off'), ('kl15_on', 'Ignition was turned on'), ('kl30_low', 'Power supply dropped below'), ('card_not_found', 'No SD card inserted'), ('flash_error', 'Internal flash overflow'), ('card_full', 'SD card full'), ('travel_start', 'The vehicle has been travelling for >10mph for at least 10 seconds'), ('travel_stop', 'The vehicle stopped travelling: speed dropped below 10mph for 10 seconds')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.Car')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventdailycount',
+            unique_together=set([('day', 'car', 'user', 'type')]),
+        ),
+        migrations.RunPython(populate_event_daily_counts, migrations.RunPython.noop),
+    ]
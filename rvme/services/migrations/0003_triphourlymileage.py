@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 19:34
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, ExtractHour
+import django.db.models.deletion
+
+
+def populate_trip_hourly_mileage(apps, schema_editor):
+    Trip = apps.get_model('surecam', 'Trip')
+    TripHourlyMileage = apps.get_model('services', 'TripHourlyMileage')
+
+    rows = Trip.objects.filter(
+        child_trips__isnull=True,
+    ).annotate(
+        day=TruncDate('stop'),
+        hour=ExtractHour('stop'),
+    ).values(
+        'day', 'hour', 'car', 'user',
+    ).annotate(
+        trips=Count('pk'),
+        total_mileage=Sum('mileage'),
+    ).order_by()
+
+    TripHourlyMileage.objects.bulk_create(
+        TripHourlyMileage(
+            day=row['day'], hour=row['hour'], week_day=row['day'].isoweekday() % 7 + 1,
+            car_id=row['car'], user_id=row['user'], trips=row['trips'],
+            mileage=row['total_mileage'] or 0,
+        )
+        for row in rows.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('services', '0002_eventdailycount'),
+        ('surecam', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripHourlyMileage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('week_day', models.PositiveSmallIntegerField(help_text='1 (Sunday) to 7 (Saturday), as returned by ExtractWeekDay')),
+                ('trips', models.PositiveIntegerField(default=0)),
+                ('mileage', models.IntegerField(default=0, help_text='Stored in METRES to match Trip.mileage')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.Car')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='triphourlymileage',
+            unique_together=set([('day', 'hour', 'car', 'user')]),
+        ),
+        migrations.RunPython(populate_trip_hourly_mileage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 19:50
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_cardayslots'),
+        ('services', '0003_triphourlymileage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UtilisationSummary',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'utilisation summary',
+                'verbose_name_plural': 'utilisation summaries',
+                'proxy': True,
+                'indexes': [],
+            },
+            bases=('bookings.booking',),
+        ),
+    ]
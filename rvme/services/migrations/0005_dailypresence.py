@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 19:56
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def populate_daily_presence(apps, schema_editor):
+    DailyPresence = apps.get_model('services', 'DailyPresence')
+
+    for source, model_name, day_field in [('event', 'Event', 'timestamp'), ('trip', 'Trip', 'stop')]:
+        rows = apps.get_model('surecam', model_name).objects.annotate(
+            day=TruncDate(day_field),
+        ).values(
+            'day', 'car', 'user',
+        ).annotate(
+            count=Count('pk'),
+        ).order_by()
+
+        DailyPresence.objects.bulk_create(
+            DailyPresence(
+                source=source, day=row['day'], car_id=row['car'], user_id=row['user'],
+                count=row['count'],
+            )
+            for row in rows.iterator()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_cardayslots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('services', '0004_utilisationsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPresence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('event', 'Events'), ('trip', 'Trips')], max_length=5)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.Car')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'daily presence',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailypresence',
+            unique_together=set([('source', 'day', 'car', 'user')]),
+        ),
+        migrations.RunPython(populate_daily_presence, migrations.RunPython.noop),
+    ]
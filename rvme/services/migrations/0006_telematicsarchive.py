@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 20:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_dailypresence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelematicsArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('source', models.CharField(choices=[('event', 'Events'), ('trip', 'Trips')], max_length=5)),
+                ('month', models.DateField(help_text='First day of the local month archived')),
+                ('path', models.CharField(help_text='Name of the file in the default storage', max_length=255)),
+                ('rows', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['source', 'month'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='telematicsarchive',
+            unique_together=set([('source', 'month')]),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 20:39
+from __future__ import unicode_literals
+
+import gzip
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import django.db.models.deletion
+
+
+def populate_archived_trip_totals(apps, schema_editor):
+    TelematicsArchive = apps.get_model('services', 'TelematicsArchive')
+    ArchivedTripTotal = apps.get_model('services', 'ArchivedTripTotal')
+
+    # The Trips of Cars deleted since are left out, and those of drivers deleted since kept without them
+    car_ids = set(apps.get_model('bookings', 'Car').objects.values_list('pk', flat=True))
+    user_ids = set(apps.get_model(settings.AUTH_USER_MODEL).objects.values_list('pk', flat=True))
+
+    totals = {}
+    for archive in TelematicsArchive.objects.filter(source='trip'):
+        with default_storage.open(archive.path, 'rb') as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode='rb') as lines:
+                for line in lines:
+                    trip = json.loads(line.decode())
+                    if trip['parent_trip_id'] is not None or trip['car_id'] not in car_ids:
+                        continue
+                    stop = timezone.localtime(parse_datetime(trip['stop']))
+                    user_id = trip['user_id'] if trip['user_id'] in user_ids else None
+                    key = (stop.date(), stop.hour, trip['car_id'], user_id)
+                    count, mileage = totals.get(key, (0, 0))
+                    totals[key] = (count + 1, mileage + (trip['mileage'] or 0))
+
+    ArchivedTripTotal.objects.bulk_create(
+        ArchivedTripTotal(
+            day=day, hour=hour, week_day=day.isoweekday() % 7 + 1, car_id=car_id, user_id=user_id,
+            trips=count, mileage=mileage,
+        )
+        for (day, hour, car_id, user_id), (count, mileage) in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_cardayslots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('services', '0007_eventhourlycount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTripTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('week_day', models.PositiveSmallIntegerField(help_text='1 (Sunday) to 7 (Saturday), as returned by ExtractWeekDay')),
+                ('trips', models.PositiveIntegerField(default=0)),
+                ('mileage', models.IntegerField(default=0, help_text='Stored in METRES to match Trip.mileage')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.Car')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedtriptotal',
+            unique_together=set([('day', 'hour', 'car', 'user')]),
+        ),
+        migrations.RunPython(populate_archived_trip_totals, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,19 @@
+import gzip
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+from django.utils import timezone
+
+from rvme.bookings.models import Booking
 from rvme.core.models import TimeStampedFieldsModel
+from .constants import TELEMATICS_SOURCES
+from .managers import (
+    DailyPresenceManager, EventDailyCountManager, EventHourlyCountManager, TelematicsArchiveManager,
+    TripHourlyMileageManager, TripHourlyTotalsManager,
+)
+from .surecam.constants import EVENT_TYPES
 from .surecam.models import Event, Trip
 
 
@@ -14,3 +29,240 @@ class TripSummary(Trip):
         proxy = True
         verbose_name = 'trip summary'
         verbose_name_plural = 'trip summaries'
+
+
+class UtilisationSummary(Booking):
+    class Meta:
+        proxy = True
+        verbose_name = 'utilisation summary'
+        verbose_name_plural = 'utilisation summaries'
+
+
+class EventDailyCount(models.Model):
+    """
+    Number of Events of each type per local day, car and driver. Kept up to date from the Event
+    save and delete signals so the Event Summary page can read it instead of the raw Events.
+    """
+    day = models.DateField()
+    car = models.ForeignKey(
+        "bookings.Car",
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    type = models.CharField(
+        max_length=20,
+        choices=EVENT_TYPES
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+    )
+
+    objects = EventDailyCountManager()
+
+    class Meta:
+        unique_together = ['day', 'car', 'user', 'type']
+
+    def __str__(self):
+        return "{}, {}, {}: {}".format(self.day, self.car_id, self.user_id, self.type)
+
+
+class EventHourlyCount(models.Model):
+    """
+    Number of Events of each type per local hour, car and driver, for the Events older than the
+    retention cutoff that compact_events has deleted. The daily counts and DailyPresence still
+    count them.
+    """
+    hour = models.DateTimeField(
+        help_text="Start of the local hour",
+    )
+    car = models.ForeignKey(
+        "bookings.Car",
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    type = models.CharField(
+        max_length=20,
+        choices=EVENT_TYPES
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+    )
+
+    objects = EventHourlyCountManager()
+
+    class Meta:
+        unique_together = ['hour', 'car', 'user', 'type']
+
+    def __str__(self):
+        return "{:%Y-%m-%d %H:00}, {}, {}: {}".format(
+            timezone.localtime(self.hour), self.car_id, self.user_id, self.type,
+        )
+
+
+class TripHourlyMileage(models.Model):
+    """
+    Number of leaf Trips and their total mileage per local day and hour of stopping, car and
+    driver. Kept up to date from the Trip save and delete signals so the Trip Summary charts can
+    read it instead of extracting the hour and weekday of every raw Trip.
+    """
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    week_day = models.PositiveSmallIntegerField(
+        help_text="1 (Sunday) to 7 (Saturday), as returned by ExtractWeekDay",
+    )
+    car = models.ForeignKey(
+        "bookings.Car",
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    trips = models.PositiveIntegerField(
+        default=0,
+    )
+    mileage = models.IntegerField(
+        default=0,
+        help_text="Stored in METRES to match Trip.mileage",
+    )
+
+    objects = TripHourlyMileageManager()
+
+    class Meta:
+        unique_together = ['day', 'hour', 'car', 'user']
+
+    def __str__(self):
+        return "{} {:02d}:00, {}, {}".format(self.day, self.hour, self.car_id, self.user_id)
+
+
+class ArchivedTripTotal(models.Model):
+    """
+    Number of archived root Trips and their total mileage per local day and hour of stopping,
+    car and driver. Written when a month of Trips is archived, so the Trip Summary tables can
+    count archived Trips without opening the archive files.
+    """
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    week_day = models.PositiveSmallIntegerField(
+        help_text="1 (Sunday) to 7 (Saturday), as returned by ExtractWeekDay",
+    )
+    car = models.ForeignKey(
+        "bookings.Car",
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    trips = models.PositiveIntegerField(
+        default=0,
+    )
+    mileage = models.IntegerField(
+        default=0,
+        help_text="Stored in METRES to match Trip.mileage",
+    )
+
+    objects = TripHourlyTotalsManager()
+
+    class Meta:
+        unique_together = ['day', 'hour', 'car', 'user']
+
+    def __str__(self):
+        return "{} {:02d}:00, {}, {}".format(self.day, self.hour, self.car_id, self.user_id)
+
+
+class DailyPresence(models.Model):
+    """
+    Number of Events (by timestamp) or Trips (by stop) per local day, car and driver. Kept up to
+    date from the save and delete signals so the summary pages can find the days with data for
+    their date drill-down without scanning the raw telematics. Rows are removed when their count
+    falls to zero.
+    """
+    source = models.CharField(
+        max_length=5,
+        choices=TELEMATICS_SOURCES,
+    )
+    day = models.DateField()
+    car = models.ForeignKey(
+        "bookings.Car",
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+    )
+
+    objects = DailyPresenceManager()
+
+    class Meta:
+        unique_together = ['source', 'day', 'car', 'user']
+        verbose_name_plural = 'daily presence'
+
+    def __str__(self):
+        return "{}, {}, {}, {}: {}".format(self.source, self.day, self.car_id, self.user_id, self.count)
+
+
+class TelematicsArchive(TimeStampedFieldsModel):
+    """
+    A month of Events, or of Trip trees, moved out of the database into a gzipped file of JSON
+    lines to keep the raw tables small. The rollups and DailyPresence still count the archived
+    rows, and ArchivedTripTotal holds the totals of archived root Trips, so the summaries never
+    read the files.
+    """
+    source = models.CharField(
+        max_length=5,
+        choices=TELEMATICS_SOURCES,
+    )
+    month = models.DateField(
+        help_text="First day of the local month archived",
+    )
+    path = models.CharField(
+        max_length=255,
+        help_text="Name of the file in the default storage",
+    )
+    rows = models.PositiveIntegerField()
+
+    objects = TelematicsArchiveManager()
+
+    class Meta:
+        ordering = ['source', 'month']
+        unique_together = ['source', 'month']
+
+    def __str__(self):
+        return "{} {:%Y-%m}".format(self.source, self.month)
+
+    @property
+    def model(self):
+        return {TELEMATICS_SOURCES.event: Event, TELEMATICS_SOURCES.trip: Trip}[self.source]
+
+    def read(self):
+        """
+        Yields the archived rows as unsaved model instances, parents before their children.
+        """
+        fields = {field.attname: field for field in self.model._meta.concrete_fields}
+        with default_storage.open(self.path, 'rb') as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode='rb') as lines:
+                for line in lines:
+                    yield self.model(**{
+                        attname: fields[attname].to_python(value)
+                        for attname, value in json.loads(line.decode()).items()
+                    })
@@ -0,0 +1,199 @@
+import copy
+from collections import Counter
+
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from rvme.core.cache import bump_data_version
+from .constants import TELEMATICS_SOURCES
+from .models import DailyPresence, EventDailyCount, TripHourlyMileage
+from .surecam.models import Event, Trip
+from .surecam.signals import events_bulk_created, trips_bulk_created
+
+# Event fields that place an Event in the daily counts
+EVENT_DAILY_COUNT_FIELDS = ('timestamp', 'type', 'car_id', 'user_id')
+
+# Event fields that place an Event in the daily presence index
+EVENT_PRESENCE_FIELDS = ('timestamp', 'car_id', 'user_id')
+
+# Trip fields that place a Trip in the hourly mileage
+TRIP_HOURLY_MILEAGE_FIELDS = ('stop', 'mileage', 'car_id', 'user_id')
+
+# Trip fields that place a Trip in the daily presence index
+TRIP_PRESENCE_FIELDS = ('stop', 'car_id', 'user_id')
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(events_bulk_created, sender=Event)
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+@receiver(trips_bulk_created, sender=Trip)
+def bump_telematics_data_version(sender, **kwargs):
+    bump_data_version(sender)
+
+
+def _previous_values(instance, fields):
+    """
+    Returns a copy of the saved instance with the tracked fields it was saved with before.
+    """
+    changed = instance.tracker.changed()
+    if not any(field in changed for field in fields):
+        return None
+    previous = copy.copy(instance)
+    for field in fields:
+        if field in changed:
+            setattr(previous, field, changed[field])
+    return previous
+
+
+@receiver(post_save, sender=Event)
+def update_event_daily_counts(sender, instance, created, **kwargs):
+    if created:
+        EventDailyCount.objects.record([instance])
+        return
+
+    previous = _previous_values(instance, EVENT_DAILY_COUNT_FIELDS)
+    if previous:
+        EventDailyCount.objects.record([previous], sign=-1)
+        EventDailyCount.objects.record([instance])
+
+
+@receiver(post_delete, sender=Event)
+def remove_event_from_daily_counts(sender, instance, **kwargs):
+    EventDailyCount.objects.record([instance], sign=-1)
+
+
+@receiver(events_bulk_created, sender=Event)
+def add_bulk_events_to_daily_counts(sender, events, **kwargs):
+    EventDailyCount.objects.record(events)
+
+
+@receiver(post_save, sender=Event)
+def update_event_daily_presence(sender, instance, created, **kwargs):
+    if created:
+        DailyPresence.objects.record(TELEMATICS_SOURCES.event, [instance])
+        return
+
+    previous = _previous_values(instance, EVENT_PRESENCE_FIELDS)
+    if previous:
+        DailyPresence.objects.record(TELEMATICS_SOURCES.event, [previous], sign=-1)
+        DailyPresence.objects.record(TELEMATICS_SOURCES.event, [instance])
+
+
+@receiver(post_delete, sender=Event)
+def remove_event_from_daily_presence(sender, instance, **kwargs):
+    DailyPresence.objects.record(TELEMATICS_SOURCES.event, [instance], sign=-1)
+
+
+@receiver(events_bulk_created, sender=Event)
+def add_bulk_events_to_daily_presence(sender, events, **kwargs):
+    DailyPresence.objects.record(TELEMATICS_SOURCES.event, events)
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_daily_presence(sender, instance, created, **kwargs):
+    if created:
+        DailyPresence.objects.record(TELEMATICS_SOURCES.trip, [instance])
+        return
+
+    previous = _previous_values(instance, TRIP_PRESENCE_FIELDS)
+    if previous:
+        DailyPresence.objects.record(TELEMATICS_SOURCES.trip, [previous], sign=-1)
+        DailyPresence.objects.record(TELEMATICS_SOURCES.trip, [instance])
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_from_daily_presence(sender, instance, **kwargs):
+    DailyPresence.objects.record(TELEMATICS_SOURCES.trip, [instance], sign=-1)
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def add_bulk_trips_to_daily_presence(sender, trips, **kwargs):
+    DailyPresence.objects.record(TELEMATICS_SOURCES.trip, trips)
+
+
+def _is_leaf_trip(trip_id):
+    return not Trip.objects.filter(parent_trip_id=trip_id).exists()
+
+
+def _on_child_added(parent_trip_id):
+    # A parent's mileage is only charted until its first child arrives
+    children = Trip.objects.filter(parent_trip_id=parent_trip_id)
+    if children.count() == 1:
+        parent_trip = Trip.objects.filter(pk=parent_trip_id).first()
+        if parent_trip:
+            TripHourlyMileage.objects.record([parent_trip], sign=-1)
+
+
+def _on_child_removed(parent_trip_id):
+    # Once its last child has gone the parent is charted again
+    if _is_leaf_trip(parent_trip_id):
+        parent_trip = Trip.objects.filter(pk=parent_trip_id).first()
+        if parent_trip:
+            TripHourlyMileage.objects.record([parent_trip])
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_hourly_mileage(sender, instance, created, **kwargs):
+    if created:
+        if _is_leaf_trip(instance.pk):
+            TripHourlyMileage.objects.record([instance])
+        if instance.parent_trip_id:
+            _on_child_added(instance.parent_trip_id)
+        return
+
+    previous = _previous_values(instance, TRIP_HOURLY_MILEAGE_FIELDS)
+    if previous and _is_leaf_trip(instance.pk):
+        TripHourlyMileage.objects.record([previous], sign=-1)
+        TripHourlyMileage.objects.record([instance])
+
+    changed = instance.tracker.changed()
+    if 'parent_trip_id' in changed:
+        if instance.parent_trip_id:
+            _on_child_added(instance.parent_trip_id)
+        if changed['parent_trip_id']:
+            _on_child_removed(changed['parent_trip_id'])
+
+
+@receiver(pre_delete, sender=Trip)
+def mark_deleted_leaf_trip(sender, instance, **kwargs):
+    # Children are deleted in the same query as their parent, so leaf status has to be read
+    # before anything is deleted.
+    instance._was_leaf = _is_leaf_trip(instance.pk)
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_from_hourly_mileage(sender, instance, **kwargs):
+    if getattr(instance, '_was_leaf', False):
+        TripHourlyMileage.objects.record([instance], sign=-1)
+    if instance.parent_trip_id:
+        _on_child_removed(instance.parent_trip_id)
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def add_bulk_trips_to_hourly_mileage(sender, trips, **kwargs):
+    trip_ids = {trip.pk for trip in trips}
+    parent_ids = set(
+        Trip.objects.filter(parent_trip_id__in=trip_ids).values_list('parent_trip_id', flat=True)
+    )
+    TripHourlyMileage.objects.record(trip for trip in trips if trip.pk not in parent_ids)
+
+    # Earlier Trips that have just received their first children are no longer charted
+    new_children = Counter(
+        trip.parent_trip_id for trip in trips
+        if trip.parent_trip_id and trip.parent_trip_id not in trip_ids
+    )
+    all_children = Trip.objects.filter(
+        parent_trip_id__in=new_children,
+    ).values_list(
+        'parent_trip_id',
+    ).annotate(
+        children=Count('pk'),
+    ).order_by()
+    former_leaf_ids = [
+        parent_trip_id for parent_trip_id, children in all_children
+        if children == new_children[parent_trip_id]
+    ]
+    TripHourlyMileage.objects.record(Trip.objects.filter(pk__in=former_leaf_ids), sign=-1)
@@ -2,6 +2,9 @@ from django.contrib import admin
 from django.contrib.admin import register
 from django.forms import BaseInlineFormSet
 
+from rvme.core.filters import PresentRelatedFieldListFilter
+from rvme.core.mixins import KeysetPaginationMixin, PrefetchPlanMixin
+from rvme.core.profiling import ChangeListProfilingMixin
 from rvme.core.templatetags.global_filters import metres_to_miles
 from .models import Device, Event, Trip
 
@@ -27,15 +30,20 @@ class MileageInMilesMixin(object):
 
 class EventInlineFormSet(BaseInlineFormSet):
     def get_queryset(self):
-        qs = super(EventInlineFormSet, self).get_queryset()
-        return qs[:20]
+        # Kept, as each form looks its instance up in it and a new slice would query again
+        if not hasattr(self, '_sliced_queryset'):
+            self._sliced_queryset = super(EventInlineFormSet, self).get_queryset()[:20]
+        return self._sliced_queryset
 
 
-class EventInlineAdmin(admin.TabularInline):
+class EventInlineAdmin(PrefetchPlanMixin, admin.TabularInline):
     extra = 0
     fields = readonly_fields = ['device', 'car', 'get_booking_display', 'key', 'user', 'type', 'timestamp']
     formset = EventInlineFormSet
     model = Event
+    prefetch_plan = {
+        'get_booking_display': ['booking'],
+    }
 
     def get_booking_display(self, event):
         if event.booking:
@@ -46,7 +54,7 @@ class EventInlineAdmin(admin.TabularInline):
 
 
 @register(Device)
-class DeviceAdmin(admin.ModelAdmin):
+class DeviceAdmin(PrefetchPlanMixin, admin.ModelAdmin):
     list_display = [
         'serial', 'license_plate', 'car', 'zone', 'created', 'modified'
     ]
@@ -62,12 +70,18 @@ class DeviceAdmin(admin.ModelAdmin):
 
 
 @register(Event)
-class EventAdmin(IdentityMixinAdminMixin, admin.ModelAdmin):
+class EventAdmin(
+    ChangeListProfilingMixin, KeysetPaginationMixin, IdentityMixinAdminMixin, PrefetchPlanMixin, admin.ModelAdmin,
+):
+    keyset_ordering = ['-timestamp', '-id']
     list_display = [
         'car', 'event_id', 'timestamp', 'type', 'get_booking_id', 'key', 'user'
     ]
+    prefetch_plan = {
+        'get_booking_id': ['booking'],
+    }
     list_filter = [
-        'type', 'device', 'car', 'user',
+        'type', 'device', ('car', PresentRelatedFieldListFilter), ('user', PresentRelatedFieldListFilter),
     ]
 
     def get_booking_id(self, event):
@@ -83,12 +97,16 @@ class EventAdmin(IdentityMixinAdminMixin, admin.ModelAdmin):
 
 
 @register(Trip)
-class TripAdmin(IdentityMixinAdminMixin, MileageInMilesMixin, admin.ModelAdmin):
+class TripAdmin(
+    ChangeListProfilingMixin, KeysetPaginationMixin, IdentityMixinAdminMixin, MileageInMilesMixin, PrefetchPlanMixin,
+    admin.ModelAdmin,
+):
+    keyset_ordering = ['-start', '-id']
     list_display = [
         'trip_id', 'car', 'user', 'start', 'stop', 'mileage_in_miles', 'state', 'modified', 'created'
     ]
     list_filter = [
-        'device', 'car', 'user',
+        'device', ('car', PresentRelatedFieldListFilter), ('user', PresentRelatedFieldListFilter),
     ]
 
     def get_readonly_fields(self, request, obj=None):
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SmartCamConfig(AppConfig):
     name = 'rvme.services.surecam'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,68 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from rvme.bookings.intervals import BookingIntervalIndex
+from rvme.bookings.models import Key
+
+
+class KeyIndex(object):
+    """
+    The Keys issued for each Booking in order of creation, to find the Key in use at a given time.
+    """
+
+    def __init__(self, booking_ids):
+        self._created = defaultdict(list)
+        self._key_ids = defaultdict(list)
+        keys = Key.objects.filter(
+            booking_id__in=list(booking_ids),
+        ).order_by(
+            'created',
+        ).values_list(
+            'booking_id', 'created', 'pk',
+        )
+        for booking_id, created, key_id in keys:
+            self._created[booking_id].append(created)
+            self._key_ids[booking_id].append(key_id)
+
+    def lookup(self, booking_id, timestamp):
+        """
+        Returns the id of the latest Key issued for the Booking at or before the time given, or of
+        its first Key if none had been issued yet.
+        """
+        key_ids = self._key_ids.get(booking_id)
+        if not key_ids:
+            return None
+        position = bisect_right(self._created[booking_id], timestamp)
+        return key_ids[max(position - 1, 0)]
+
+
+def attribute(objs, timestamp_field, index=None):
+    """
+    Sets the Booking, Key and driver of each Event or Trip from the Booking that held its Car at
+    the time, clearing them where no Booking did. Returns the instances whose attribution changed.
+
+    :param objs: list of Event or Trip instances
+    :param timestamp_field: the field giving each instance's time, e.g. 'timestamp' or 'start'
+    :param index: BookingIntervalIndex covering the instances, built if not given
+    """
+    if not objs:
+        return []
+    if index is None:
+        timestamps = [getattr(obj, timestamp_field) for obj in objs]
+        index = BookingIntervalIndex.for_cars(
+            {obj.car_id for obj in objs}, min(timestamps), max(timestamps),
+        )
+
+    bookings = [index.lookup(obj.car_id, getattr(obj, timestamp_field)) for obj in objs]
+    keys = KeyIndex({booking[0] for booking in bookings if booking})
+
+    changed = []
+    for obj, booking in zip(objs, bookings):
+        if booking:
+            attribution = (booking[0], keys.lookup(booking[0], getattr(obj, timestamp_field)), booking[4])
+        else:
+            attribution = (None, None, None)
+        if attribution != (obj.booking_id, obj.key_id, obj.user_id):
+            obj.booking_id, obj.key_id, obj.user_id = attribution
+            changed.append(obj)
+    return changed
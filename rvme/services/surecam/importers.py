@@ -0,0 +1,235 @@
+import time
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .attribution import attribute
+from .models import Device, Event, Trip
+from .signals import events_bulk_created, trips_bulk_created
+
+
+def parse_timestamp(value):
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValueError("Invalid timestamp: {}".format(value))
+    if timezone.is_naive(timestamp):
+        # The SureCam API reports times in UTC
+        timestamp = timezone.make_aware(timestamp, timezone.utc)
+    return timestamp
+
+
+def existing_ids(model, id_field, ids):
+    """
+    Returns a dict of each of the given SureCam ids already imported to its primary key.
+    """
+    return dict(model.objects.filter(**{id_field + '__in': list(ids)}).values_list(id_field, 'pk'))
+
+
+class SureCamImporter(object):
+    """
+    Writes a stream of SureCam records to the database in chunks of chunk_size, using a bounded
+    amount of memory however long the stream is.
+
+    Each record's device serial is resolved to its Car, and the Booking that held that Car at the
+    time of the record gives the Key and driver. Records whose SureCam id already exists are
+    skipped, so an export can safely be imported more than once, even by two imports at once.
+    Records missing a field, or with one that can't be parsed, are skipped too.
+    """
+    model = None
+    id_field = None
+    timestamp_field = None
+
+    def __init__(self, chunk_size=5000, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.devices = dict(Device.objects.values_list('serial', 'car_id'))
+        self.read = self.created = self.skipped = 0
+        self.started = None
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return self.read / elapsed if elapsed else 0
+
+    def run(self, records):
+        self.started = time.monotonic()
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            self.read += len(chunk)
+            with transaction.atomic():
+                self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self)
+        self.finish()
+        return self
+
+    def import_chunk(self, records):
+        objs = {}
+        for record in records:
+            obj = self.build(record)
+            if obj is None or getattr(obj, self.id_field) in objs:
+                self.skipped += 1
+                continue
+            objs[getattr(obj, self.id_field)] = obj
+
+        for external_id in existing_ids(self.model, self.id_field, objs):
+            del objs[external_id]
+            self.skipped += 1
+
+        objs = list(objs.values())
+        self.attribute(objs)
+        objs = self.create(objs)
+        self.created += len(objs)
+        self.bulk_created(objs)
+
+    def build(self, record):
+        """
+        Returns an unsaved model instance for the record, or None if it can't be imported.
+        """
+        car_id = self.devices.get(record.get('serial'))
+        if car_id is None:
+            return None
+        try:
+            fields = self.parse(record)
+        except (KeyError, TypeError, ValueError):
+            return None
+        return self.model(
+            device_id=record['serial'],
+            car_id=car_id,
+            **fields
+        )
+
+    def parse(self, record):
+        raise NotImplementedError
+
+    def attribute(self, objs):
+        attribute(objs, self.timestamp_field)
+
+    def create(self, objs):
+        """
+        Inserts the instances, returning those inserted.
+        """
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objs)
+        except IntegrityError:
+            # Another import has inserted some of the same ids since they were checked, so they're
+            # inserted one at a time, skipping those
+            inserted = []
+            for obj in objs:
+                try:
+                    with transaction.atomic():
+                        self.model.objects.bulk_create([obj])
+                except IntegrityError:
+                    self.skipped += 1
+                else:
+                    inserted.append(obj)
+            objs = inserted
+        if any(obj.pk is None for obj in objs):
+            # Only PostgreSQL returns the ids of bulk inserted rows
+            pks = existing_ids(self.model, self.id_field, (getattr(obj, self.id_field) for obj in objs))
+            for obj in objs:
+                obj.pk = pks[getattr(obj, self.id_field)]
+        return objs
+
+    def bulk_created(self, objs):
+        pass
+
+    def finish(self):
+        pass
+
+
+class EventImporter(SureCamImporter):
+    model = Event
+    id_field = 'event_id'
+    timestamp_field = 'timestamp'
+
+    def parse(self, record):
+        return dict(
+            event_id=record['event_id'],
+            timestamp=parse_timestamp(record['timestamp']),
+            type=record['type'],
+        )
+
+    def bulk_created(self, objs):
+        events_bulk_created.send(sender=Event, events=objs)
+
+
+class TripImporter(SureCamImporter):
+    model = Trip
+    id_field = 'trip_id'
+    timestamp_field = 'start'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # SureCam ids of child Trips that arrived before their parent, and of their parents,
+        # linked up once the import has finished
+        self.orphans = {}
+
+    def build(self, record):
+        trip = super().build(record)
+        if trip is not None:
+            # Resolved to the parent's primary key once it's known to be imported
+            trip.parent_external_id = record.get('parent_trip_id') or None
+        return trip
+
+    def parse(self, record):
+        return dict(
+            trip_id=record['trip_id'],
+            start=parse_timestamp(record['start']),
+            stop=parse_timestamp(record['stop']),
+            mileage=int(record['mileage']),
+            state=record.get('state', ''),
+        )
+
+    def attribute(self, objs):
+        in_chunk = {obj.trip_id for obj in objs}
+        found = existing_ids(Trip, 'trip_id', {
+            obj.parent_external_id for obj in objs if obj.parent_external_id
+        } - in_chunk)
+        for obj in objs:
+            if obj.parent_external_id in found:
+                obj.parent_trip_id = found[obj.parent_external_id]
+            elif obj.parent_external_id and obj.parent_external_id not in in_chunk:
+                self.orphans[obj.trip_id] = obj.parent_external_id
+        super().attribute(objs)
+
+    def create(self, objs):
+        # Trips whose parent is in the same chunk are inserted after it, once its id is known
+        inserted = []
+        pending = objs
+        while pending:
+            pending_ids = {obj.trip_id for obj in pending}
+            ready = [obj for obj in pending if obj.parent_external_id not in pending_ids]
+            if not ready:
+                # The remaining Trips are each other's ancestors, so they can't be linked
+                ready = pending
+            ready_ids = {obj.trip_id for obj in ready}
+            created = super().create(ready)
+            inserted.extend(created)
+            pks = {obj.trip_id: obj.pk for obj in created}
+            pending = [obj for obj in pending if obj.trip_id not in ready_ids]
+            for obj in pending:
+                if obj.parent_external_id in pks:
+                    obj.parent_trip_id = pks[obj.parent_external_id]
+                elif obj.parent_external_id in ready_ids:
+                    # The parent was inserted by another import, so is linked up at the end
+                    self.orphans[obj.trip_id] = obj.parent_external_id
+        return inserted
+
+    def bulk_created(self, objs):
+        trips_bulk_created.send(sender=Trip, trips=objs)
+
+    def finish(self):
+        found = existing_ids(Trip, 'trip_id', set(self.orphans.values()))
+        for trip in Trip.objects.filter(trip_id__in=[
+            trip_id for trip_id, parent_id in self.orphans.items() if parent_id in found
+        ]):
+            # Saved one at a time so the parent's summaries are updated
+            trip.parent_trip_id = found[self.orphans[trip.trip_id]]
+            trip.save(update_fields=['parent_trip', 'modified'])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from rvme.core.utils import read_records
+from rvme.services.surecam.importers import EventImporter, TripImporter
+
+IMPORTERS = {
+    'events': EventImporter,
+    'trips': TripImporter,
+}
+
+
+class Command(BaseCommand):
+    help = "Imports a SureCam export of events or trips from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'], dest='file_format',
+            help="Defaults to csv for .csv files and jsonl otherwise",
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](
+            chunk_size=options['chunk_size'],
+            progress=self.report,
+        )
+        importer.run(read_records(options['path'], options['file_format']))
+        self.stdout.write(self.style.SUCCESS(
+            "Imported {} of {} {} ({:.0f} rows/s)".format(
+                importer.created, importer.read, options['kind'], importer.rows_per_second,
+            )
+        ))
+
+    def report(self, importer):
+        self.stdout.write("{} read, {} created, {} skipped ({:.0f} rows/s)".format(
+            importer.read, importer.created, importer.skipped, importer.rows_per_second,
+        ))
@@ -0,0 +1,147 @@
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Sum
+
+
+def _trip_closure():
+    return apps.get_model('surecam', 'TripClosure')
+
+
+class TripQuerySet(models.QuerySet):
+    def roots(self):
+        return self.filter(is_root=True)
+
+    def leaves(self):
+        return self.filter(is_leaf=True)
+
+    def subtrees(self):
+        """
+        Returns every Trip descending from the Trips in this queryset, including themselves.
+        """
+        return self.model.objects.filter(ancestor_links__ancestor__in=self.values('pk'))
+
+    def subtree_totals(self, leaves_only=True):
+        """
+        Returns one row for each Trip in this queryset totalling its whole subtree in a single
+        query: the number of trips, their mileage in metres, and the first start and last stop.
+        Parent trips duplicate the mileage of their children, so only leaves are counted unless
+        leaves_only=False.
+        """
+        links = _trip_closure().objects.filter(ancestor__in=self.values('pk'))
+        if leaves_only:
+            links = links.filter(descendant__is_leaf=True)
+        return links.values(
+            'ancestor',
+        ).annotate(
+            trips=Count('descendant'),
+            total_mileage=Sum('descendant__mileage'),
+            start=Min('descendant__start'),
+            stop=Max('descendant__stop'),
+        ).order_by()
+
+
+class TripManager(models.Manager.from_queryset(TripQuerySet)):
+    def add_to_hierarchy(self, trips):
+        """
+        Adds newly created Trips to the closure table, and sets their depth and their parents'
+        leaf flags. Trips may be the parents of others in the same batch.
+        """
+        TripClosure = _trip_closure()
+        trips_by_pk = {trip.pk: trip for trip in trips}
+        ancestors = {}
+        for ancestor_id, descendant_id, distance in TripClosure.objects.filter(
+            descendant_id__in={
+                trip.parent_trip_id for trip in trips
+                if trip.parent_trip_id and trip.parent_trip_id not in trips_by_pk
+            },
+        ).values_list(
+            'ancestor_id', 'descendant_id', 'distance',
+        ):
+            ancestors.setdefault(descendant_id, []).append((ancestor_id, distance))
+
+        # Resolve parents before their children
+        pending = list(trips)
+        while pending:
+            unresolved = []
+            for trip in pending:
+                if trip.parent_trip_id in ancestors:
+                    ancestors[trip.pk] = [(trip.pk, 0)] + [
+                        (ancestor_id, distance + 1) for ancestor_id, distance in ancestors[trip.parent_trip_id]
+                    ]
+                elif trip.parent_trip_id in trips_by_pk:
+                    unresolved.append(trip)
+                else:
+                    ancestors[trip.pk] = [(trip.pk, 0)]
+            if len(unresolved) == len(pending):
+                raise ValueError("Trips {} form a cycle".format(', '.join(str(trip.pk) for trip in unresolved)))
+            pending = unresolved
+
+        by_depth = {}
+        for trip in trips:
+            depth = len(ancestors[trip.pk]) - 1
+            if (trip.depth, trip.is_root) != (depth, depth == 0):
+                by_depth.setdefault(depth, []).append(trip.pk)
+            trip.depth, trip.is_root = depth, depth == 0
+
+        with transaction.atomic():
+            TripClosure.objects.bulk_create(
+                TripClosure(ancestor_id=ancestor_id, descendant_id=trip.pk, distance=distance)
+                for trip in trips
+                for ancestor_id, distance in ancestors[trip.pk]
+            )
+            for depth, pks in by_depth.items():
+                self.filter(pk__in=pks).update(depth=depth, is_root=depth == 0)
+            parent_ids = {trip.parent_trip_id for trip in trips if trip.parent_trip_id}
+            self.filter(pk__in=parent_ids, is_leaf=True).update(is_leaf=False)
+        for trip in trips:
+            if trip.pk in parent_ids:
+                trip.is_leaf = False
+
+    def move_in_hierarchy(self, trip, previous_parent_id):
+        """
+        Re-links a saved Trip and its subtree after its parent has changed from the one given.
+        """
+        TripClosure = _trip_closure()
+        subtree = list(TripClosure.objects.filter(ancestor=trip).values_list('descendant_id', 'distance'))
+        subtree_ids = [descendant_id for descendant_id, distance in subtree]
+        if trip.parent_trip_id in subtree_ids:
+            raise ValueError("Trip {} cannot be a child of its own descendant".format(trip.pk))
+
+        with transaction.atomic():
+            TripClosure.objects.filter(
+                descendant_id__in=subtree_ids,
+            ).exclude(
+                ancestor_id__in=subtree_ids,
+            ).delete()
+            depth = 0
+            if trip.parent_trip_id:
+                new_ancestors = list(
+                    TripClosure.objects.filter(
+                        descendant_id=trip.parent_trip_id,
+                    ).values_list(
+                        'ancestor_id', 'distance',
+                    )
+                )
+                TripClosure.objects.bulk_create(
+                    TripClosure(
+                        ancestor_id=ancestor_id,
+                        descendant_id=descendant_id,
+                        distance=ancestor_distance + distance + 1,
+                    )
+                    for ancestor_id, ancestor_distance in new_ancestors
+                    for descendant_id, distance in subtree
+                )
+                depth = max(distance for ancestor_id, distance in new_ancestors) + 1
+            self.filter(pk__in=subtree_ids).update(depth=F('depth') + (depth - trip.depth))
+            self.filter(pk=trip.pk).update(is_root=depth == 0)
+            self.update_leaf_flags([previous_parent_id, trip.parent_trip_id])
+        trip.depth, trip.is_root = depth, depth == 0
+
+    def update_leaf_flags(self, trip_ids):
+        """
+        Recomputes is_leaf for the given Trips, e.g. after children have been added or removed.
+        """
+        trip_ids = {trip_id for trip_id in trip_ids if trip_id}
+        parent_ids = set(self.filter(parent_trip_id__in=trip_ids).values_list('parent_trip_id', flat=True))
+        self.filter(pk__in=parent_ids, is_leaf=True).update(is_leaf=False)
+        self.filter(pk__in=trip_ids - parent_ids, is_leaf=False).update(is_leaf=True)
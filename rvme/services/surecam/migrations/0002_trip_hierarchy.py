@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 19:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_trip_hierarchy(apps, schema_editor):
+    Trip = apps.get_model('surecam', 'Trip')
+    TripClosure = apps.get_model('surecam', 'TripClosure')
+
+    parents = dict(Trip.objects.values_list('pk', 'parent_trip_id'))
+    ancestors = {}
+
+    def get_ancestors(trip_id):
+        # Walk up to the nearest Trip already resolved, then fill in the path back down
+        path = []
+        while trip_id is not None and trip_id not in ancestors:
+            path.append(trip_id)
+            trip_id = parents.get(trip_id)
+        above = ancestors.get(trip_id, [])
+        for trip_id in reversed(path):
+            above = ancestors[trip_id] = [(trip_id, 0)] + [
+                (ancestor_id, distance + 1) for ancestor_id, distance in above
+            ]
+        return above
+
+    TripClosure.objects.bulk_create(
+        (
+            TripClosure(ancestor_id=ancestor_id, descendant_id=trip_id, distance=distance)
+            for trip_id in parents
+            for ancestor_id, distance in get_ancestors(trip_id)
+        ),
+        batch_size=5000,
+    )
+
+    by_depth = {}
+    for trip_id in parents:
+        by_depth.setdefault(len(ancestors[trip_id]) - 1, []).append(trip_id)
+    for depth, trip_ids in by_depth.items():
+        Trip.objects.filter(pk__in=trip_ids).update(depth=depth, is_root=depth == 0)
+    Trip.objects.filter(
+        pk__in=set(parent_id for parent_id in parents.values() if parent_id),
+    ).update(
+        is_leaf=False,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surecam', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Number of ancestors above this trip'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='is_leaf',
+            field=models.BooleanField(db_index=True, default=True, editable=False, help_text='Has no child trips'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='is_root',
+            field=models.BooleanField(db_index=True, default=True, editable=False, help_text='Has no parent trip'),
+        ),
+        migrations.AddField(
+            model_name='tripclosure',
+            name='ancestor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='surecam.Trip'),
+        ),
+        migrations.AddField(
+            model_name='tripclosure',
+            name='descendant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='surecam.Trip'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tripclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.RunPython(populate_trip_hierarchy, migrations.RunPython.noop),
+    ]
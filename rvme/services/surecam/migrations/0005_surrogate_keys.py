@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 20:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def number_rows(apps, schema_editor):
+    # Numbered in time order, so the new ids sort the way the rows were recorded
+    for model_name, external_id, ordering in [
+        ('Event', 'event_id', 'timestamp, event_id'),
+        ('Trip', 'trip_id', 'start, trip_id'),
+    ]:
+        table = schema_editor.quote_name(apps.get_model('surecam', model_name)._meta.db_table)
+        schema_editor.execute(
+            "UPDATE {table} SET id = numbered.row_number FROM ("
+            "SELECT {external_id} AS external_id, ROW_NUMBER() OVER (ORDER BY {ordering}) AS row_number "
+            "FROM {table}"
+            ") AS numbered WHERE {table}.{external_id} = numbered.external_id".format(
+                table=table, external_id=external_id, ordering=ordering,
+            )
+        )
+
+
+def link_trips_by_id(apps, schema_editor):
+    trip = schema_editor.quote_name(apps.get_model('surecam', 'Trip')._meta.db_table)
+    closure = schema_editor.quote_name(apps.get_model('surecam', 'TripClosure')._meta.db_table)
+    schema_editor.execute(
+        "UPDATE {trip} SET new_parent_trip = ("
+        "SELECT parent.id FROM {trip} AS parent WHERE parent.trip_id = {trip}.parent_trip_id"
+        ") WHERE parent_trip_id IS NOT NULL".format(trip=trip)
+    )
+    schema_editor.execute(
+        "UPDATE {closure} SET "
+        "new_ancestor = (SELECT id FROM {trip} WHERE {trip}.trip_id = {closure}.ancestor_id), "
+        "new_descendant = (SELECT id FROM {trip} WHERE {trip}.trip_id = {closure}.descendant_id)".format(
+            trip=trip, closure=closure,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surecam', '0004_summary_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='surecam_eve_timesta_5ca99d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trip',
+            name='surecam_tri_start_6e8b5f_idx',
+        ),
+
+        # Number the existing rows
+        migrations.AddField(
+            model_name='event',
+            name='id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunPython(number_rows),
+
+        # Copy the links between Trips over to the new ids
+        migrations.AddField(
+            model_name='trip',
+            name='new_parent_trip',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='tripclosure',
+            name='new_ancestor',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='tripclosure',
+            name='new_descendant',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunPython(link_trips_by_id),
+        migrations.AlterUniqueTogether(
+            name='tripclosure',
+            unique_together=set([]),
+        ),
+        migrations.RemoveField(
+            model_name='trip',
+            name='parent_trip',
+        ),
+        migrations.RemoveField(
+            model_name='tripclosure',
+            name='ancestor',
+        ),
+        migrations.RemoveField(
+            model_name='tripclosure',
+            name='descendant',
+        ),
+
+        # Swap the primary keys
+        migrations.AlterField(
+            model_name='event',
+            name='id',
+            field=models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='id',
+            field=models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='event_id',
+            field=models.CharField(editable=False, help_text="SureCam's id for the event", max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='trip_id',
+            field=models.CharField(editable=False, help_text="SureCam's id for the trip", max_length=100, unique=True),
+        ),
+
+        # Restore the links between Trips as foreign keys to the new ids
+        migrations.RenameField(
+            model_name='trip',
+            old_name='new_parent_trip',
+            new_name='parent_trip',
+        ),
+        migrations.RenameField(
+            model_name='tripclosure',
+            old_name='new_ancestor',
+            new_name='ancestor',
+        ),
+        migrations.RenameField(
+            model_name='tripclosure',
+            old_name='new_descendant',
+            new_name='descendant',
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='parent_trip',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='child_trips', to='surecam.Trip'),
+        ),
+        migrations.AlterField(
+            model_name='tripclosure',
+            name='ancestor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='surecam.Trip'),
+        ),
+        migrations.AlterField(
+            model_name='tripclosure',
+            name='descendant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='surecam.Trip'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tripclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['timestamp', 'id'], name='surecam_eve_timesta_d90c76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['start', 'id'], name='surecam_tri_start_abde5e_idx'),
+        ),
+    ]
@@ -1,9 +1,11 @@
 from django.conf import settings
 from django.db import models
+from model_utils import FieldTracker
 
 from rvme.bookings.models import Car, Booking, Key
 from rvme.core.models import TimeStampedFieldsModel
 from .constants import EVENT_TYPES
+from .managers import TripManager
 
 
 class IdentityMixin(models.Model):
@@ -68,9 +70,10 @@ class Device(TimeStampedFieldsModel):
 
 class Event(IdentityMixin, TimeStampedFieldsModel):
     event_id = models.CharField(
-        primary_key=True,
         max_length=100,
+        unique=True,
         editable=False,
+        help_text="SureCam's id for the event",
     )
     timestamp = models.DateTimeField()
     type = models.CharField(
@@ -78,18 +81,28 @@ class Event(IdentityMixin, TimeStampedFieldsModel):
         choices=EVENT_TYPES
     )
 
+    tracker = FieldTracker(fields=['timestamp', 'type', 'car_id', 'user_id'])
+
     def __str__(self):
         return self.event_id
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination of the changelist
+            models.Index(fields=['timestamp', 'id']),
+            # Event Summary filtered by driver or car and period, counted by type
+            models.Index(fields=['user', 'timestamp', 'type']),
+            models.Index(fields=['car', 'timestamp', 'type']),
+        ]
 
 
 class Trip(IdentityMixin, TimeStampedFieldsModel):
     trip_id = models.CharField(
-        primary_key=True,
         max_length=100,
+        unique=True,
         editable=False,
+        help_text="SureCam's id for the trip",
     )
     parent_trip = models.ForeignKey(
         "self",
@@ -104,9 +117,37 @@ class Trip(IdentityMixin, TimeStampedFieldsModel):
     state = models.CharField(
         max_length=100
     )
+    is_root = models.BooleanField(
+        default=True,
+        db_index=True,
+        editable=False,
+        help_text="Has no parent trip",
+    )
+    is_leaf = models.BooleanField(
+        default=True,
+        db_index=True,
+        editable=False,
+        help_text="Has no child trips",
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of ancestors above this trip",
+    )
+
+    objects = TripManager()
+    tracker = FieldTracker()
 
     class Meta:
         ordering = ['-start']
+        indexes = [
+            # Keyset pagination of the changelist
+            models.Index(fields=['start', 'id']),
+            # Trip Summary filtered by car or driver and period, and its charts of leaf Trips
+            models.Index(fields=['car', 'stop']),
+            models.Index(fields=['user', 'stop']),
+            models.Index(fields=['stop', 'is_leaf']),
+        ]
 
     def __str__(self):
         return self.trip_id
@@ -114,3 +155,25 @@ class Trip(IdentityMixin, TimeStampedFieldsModel):
     @property
     def timestamp(self):
         return self.start
+
+
+class TripClosure(models.Model):
+    """
+    One row for every Trip and each of its ancestors, including itself at distance 0, so that a
+    whole subtree can be selected with a single join.
+    """
+    ancestor = models.ForeignKey(
+        "Trip",
+        related_name='descendant_links',
+    )
+    descendant = models.ForeignKey(
+        "Trip",
+        related_name='ancestor_links',
+    )
+    distance = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ['ancestor', 'descendant']
+
+    def __str__(self):
+        return '{} > {}'.format(self.ancestor_id, self.descendant_id)
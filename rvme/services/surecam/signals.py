@@ -0,0 +1,53 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .models import Trip
+
+# Sent after Events or Trips are written in bulk, which bypasses post_save
+events_bulk_created = Signal(providing_args=['events'])
+trips_bulk_created = Signal(providing_args=['trips'])
+
+
+@receiver(pre_save, sender=Trip)
+def set_trip_hierarchy_fields(sender, instance, **kwargs):
+    if instance._state.adding:
+        parent_depth = Trip.objects.filter(
+            pk=instance.parent_trip_id,
+        ).values_list(
+            'depth', flat=True,
+        ).first()
+        instance.is_root = parent_depth is None
+        instance.depth = 0 if parent_depth is None else parent_depth + 1
+        return
+
+    # The hierarchy fields are maintained by queries as other Trips change, so this instance's
+    # copy may be stale and must not be written back over them
+    saved = Trip.objects.filter(
+        pk=instance.pk,
+    ).values_list(
+        'is_root', 'is_leaf', 'depth',
+    ).first()
+    if saved:
+        instance.is_root, instance.is_leaf, instance.depth = saved
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_hierarchy(sender, instance, created, **kwargs):
+    if created:
+        Trip.objects.add_to_hierarchy([instance])
+        return
+
+    changed = instance.tracker.changed()
+    if 'parent_trip_id' in changed:
+        Trip.objects.move_in_hierarchy(instance, changed['parent_trip_id'])
+
+
+@receiver(post_delete, sender=Trip)
+def update_parent_leaf_flag(sender, instance, **kwargs):
+    # The closure rows of the Trip and its children are deleted with them
+    Trip.objects.update_leaf_flags([instance.parent_trip_id])
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def add_bulk_trips_to_hierarchy(sender, trips, **kwargs):
+    Trip.objects.add_to_hierarchy(trips)
@@ -1,3 +1,90 @@
+import datetime
+
 from django.test import TestCase
+from django.utils import timezone
+
+from rvme.core.testing import create_small_fleet
+from .importers import EventImporter, TripImporter
+from .models import Device, Event, Trip
+
+
+class RacingEventImporter(EventImporter):
+    """
+    Inserts the first Event of each chunk itself once the chunk has been checked for existing
+    Events, as another import of the same records running alongside would.
+    """
+
+    def attribute(self, objs):
+        super().attribute(objs)
+        Event.objects.create(
+            event_id=objs[0].event_id, device_id=objs[0].device_id, car_id=objs[0].car_id,
+            timestamp=objs[0].timestamp, type=objs[0].type,
+        )
+
+
+class RacingTripImporter(TripImporter):
+
+    def attribute(self, objs):
+        super().attribute(objs)
+        Trip.objects.create(
+            trip_id=objs[0].trip_id, device_id=objs[0].device_id, car_id=objs[0].car_id,
+            start=objs[0].start, stop=objs[0].stop, mileage=objs[0].mileage,
+        )
+
+
+class SureCamImporterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+        cls.serial = Device.objects.order_by('pk').values_list('serial', flat=True).first()
+
+    def event_record(self, number, **fields):
+        record = {
+            'event_id': 'TEST-E{}'.format(number),
+            'serial': self.serial,
+            'timestamp': datetime.datetime(2019, 2, 14, 12, number, tzinfo=timezone.utc).isoformat(),
+            'type': 'low',
+        }
+        record.update(fields)
+        return record
+
+    def trip_record(self, trip_id, parent_trip_id=None):
+        return {
+            'trip_id': trip_id,
+            'serial': self.serial,
+            'start': '2019-02-14T12:00:00+00:00',
+            'stop': '2019-02-14T12:30:00+00:00',
+            'mileage': 1000,
+            'parent_trip_id': parent_trip_id,
+        }
+
+    def test_invalid_records_skipped(self):
+        records = [self.event_record(1), self.event_record(2)]
+        for field in ['event_id', 'timestamp', 'type']:
+            record = self.event_record(3)
+            del record[field]
+            records.append(record)
+        records += [self.event_record(4, timestamp='yesterday'), self.event_record(5, timestamp=None)]
+        importer = EventImporter().run(records)
+        self.assertEqual((importer.read, importer.created, importer.skipped), (7, 2, 5))
+        self.assertEqual(Event.objects.filter(event_id__startswith='TEST-').count(), 2)
+
+        trip = self.trip_record('TEST-T1')
+        del trip['trip_id']
+        importer = TripImporter().run([trip, dict(self.trip_record('TEST-T2'), mileage='far')])
+        self.assertEqual((importer.created, importer.skipped), (0, 2))
+
+    def test_concurrent_import(self):
+        importer = RacingEventImporter(chunk_size=3).run([self.event_record(number) for number in range(5)])
+        self.assertEqual((importer.read, importer.created, importer.skipped), (5, 3, 2))
+        self.assertEqual(Event.objects.filter(event_id__startswith='TEST-').count(), 5)
+        self.assertEqual(Event.objects.filter(event_id__startswith='TEST-', booking__isnull=False).count(), 3)
 
-# Create your tests here.
+    def test_concurrent_trip_import(self):
+        # The parent is inserted by the other import, so its child is linked to it at the end
+        importer = RacingTripImporter().run([
+            self.trip_record('TEST-T1'), self.trip_record('TEST-T1.1', parent_trip_id='TEST-T1'),
+        ])
+        self.assertEqual((importer.created, importer.skipped), (1, 1))
+        self.assertEqual(Trip.objects.get(trip_id='TEST-T1.1').parent_trip, Trip.objects.get(trip_id='TEST-T1'))
@@ -0,0 +1,268 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import transaction
+from django.utils import timezone
+
+from rvme.bookings.constants import KEY_OPERATIONS, KEY_STATUSES
+from rvme.bookings.models import Booking, Car, CarClass, CarModel, Key, KeyHistory, Location
+from rvme.bookings.signals import bookings_bulk_created
+from rvme.bookings.slots import local_day_start
+from rvme.core.utils import round_to_next_30min
+from .surecam.constants import EVENT_TYPES
+from .surecam.importers import EventImporter, TripImporter
+from .surecam.models import Device
+
+# Share of the generated Events of each type, accelerometer "low" events being most of them
+EVENT_TYPE_WEIGHTS = [
+    (EVENT_TYPES.low, 80),
+    (EVENT_TYPES.medium, 14),
+    (EVENT_TYPES.high, 4),
+    (EVENT_TYPES.input1, 2),
+]
+
+# Number of depots the Cars are spread between and picked up from
+DEPOTS = 10
+
+
+class SyntheticFleet(object):
+    """
+    Generates a fleet of Cars with SureCam Devices, their drivers, Bookings and Keys, and the
+    SureCam trips and events of the journeys made on those Bookings, for load testing the admin.
+
+    Everything is drawn from random number generators seeded from ``seed``, so the same arguments
+    give the same data. The telematics are written through the SureCam importers in chunks, so
+    they're attributed to their Bookings and counted in the rollups as an import would be, using
+    a bounded amount of memory however many are generated.
+    """
+
+    def __init__(self, seed, cars, drivers, events, days, until, trips_per_day=3, chunk_size=5000, progress=None):
+        self.seed = seed
+        self.cars = cars
+        self.drivers = drivers
+        self.events = events
+        self.start = local_day_start(until - datetime.timedelta(days=days - 1))
+        self.end = local_day_start(until + datetime.timedelta(days=1))
+        self.trips_per_day = trips_per_day
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.prefix = 'SYN{}'.format(seed)
+        self.driving_seconds = 0
+
+    def random(self, stream):
+        # Each stream has its own generator, so the data of one doesn't depend on how much of
+        # another has been drawn
+        return random.Random('{}:{}'.format(self.seed, stream))
+
+    def exists(self):
+        return Device.objects.filter(serial__startswith=self.prefix + '-').exists()
+
+    def generate(self):
+        """
+        Writes the fleet, Bookings, Keys, trips and events. Returns the TripImporter and EventImporter.
+        """
+        with transaction.atomic():
+            cars, drivers, locations = self.create_fleet()
+            self.create_bookings(cars, drivers, locations)
+            self.create_keys(cars)
+        trip_importer = TripImporter(chunk_size=self.chunk_size, progress=self.progress).run(self.trip_records())
+        event_importer = EventImporter(chunk_size=self.chunk_size, progress=self.progress).run(self.event_records())
+        return trip_importer, event_importer
+
+    def create_fleet(self):
+        """
+        Creates the depots, Cars, their Devices and the drivers. Returns lists of each's ids.
+        """
+        rng = self.random('fleet')
+        car_class, created = CarClass.objects.get_or_create(label='Synthetic')
+        car_model = CarModel.objects.create(name='Synthetic', car_class=car_class)
+        locations = [
+            Location.objects.create(
+                name='{} depot {}'.format(self.prefix, number),
+                address='{} High Street'.format(number),
+                city='Synthetic',
+                postcode='SY{} 1AA'.format(number),
+            ).pk
+            for number in range(1, DEPOTS + 1)
+        ]
+        cars = []
+        for number in range(1, self.cars + 1):
+            registration_number = 'SY{:02d} {:04d}'.format(self.seed % 100, number)
+            car = Car.objects.create(
+                registration_number=registration_number,
+                model=car_model,
+                location_id=rng.choice(locations),
+            )
+            Device.objects.create(
+                serial='{}-{:05d}'.format(self.prefix, number),
+                project_id=self.prefix,
+                license_plate=registration_number,
+                zone='Synthetic',
+                car=car,
+            )
+            cars.append(car.pk)
+
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(
+                username='{}-driver-{}'.format(self.prefix, number).lower(),
+                email='{}-driver-{}@example.com'.format(self.prefix, number).lower(),
+                password=UNUSABLE_PASSWORD_PREFIX,
+            )
+            for number in range(1, self.drivers + 1)
+        )
+        drivers = list(User.objects.filter(
+            username__startswith='{}-driver-'.format(self.prefix).lower(),
+        ).order_by('pk').values_list('pk', flat=True))
+        return cars, drivers, locations
+
+    def create_bookings(self, cars, drivers, locations):
+        """
+        Books each Car for about half of the period, for a few hours to a few days at a time, by
+        drivers chosen at random. A tenth of the drivers make most of the Bookings.
+        """
+        rng = self.random('bookings')
+        regulars = drivers[:max(len(drivers) // 10, 1)]
+        bookings = []
+        for car_id in cars:
+            booking_end = self.start
+            while True:
+                start_time = round_to_next_30min(booking_end + datetime.timedelta(hours=rng.expovariate(1 / 24)))
+                end_time = start_time + datetime.timedelta(minutes=30 * rng.randint(4, 144))
+                if end_time > self.end:
+                    break
+                start_location = rng.choice(locations)
+                bookings.append(Booking(
+                    user_id=rng.choice(regulars if rng.random() < 0.7 else drivers),
+                    car_id=car_id,
+                    start_location_id=start_location,
+                    end_location_id=start_location,
+                    start_time=start_time,
+                    end_time=end_time,
+                ))
+                booking_end = end_time
+            if len(bookings) >= self.chunk_size:
+                self.write_bookings(bookings)
+                bookings = []
+        self.write_bookings(bookings)
+
+    def write_bookings(self, bookings):
+        Booking.objects.bulk_create(bookings)
+        bookings_bulk_created.send(sender=Booking, bookings=bookings)
+
+    def create_keys(self, cars):
+        """
+        Issues a Key for each of the Cars' Bookings, picked up and put back by its driver.
+        """
+        bookings = Booking.objects.filter(car_id__in=cars).values_list('pk', 'user_id')
+        Key.objects.bulk_create(
+            Key(
+                user_id=user_id,
+                booking_id=booking_id,
+                is_put_back=True,
+                latest_operation=KEY_OPERATIONS.putback,
+                latest_status=KEY_STATUSES.ended,
+            )
+            for booking_id, user_id in bookings.iterator()
+        )
+        KeyHistory.objects.bulk_create(
+            KeyHistory(key_id=key_id, operation=operation, status=status)
+            for key_id in Key.objects.filter(booking__car_id__in=cars).values_list('pk', flat=True).iterator()
+            for operation, status in [
+                (KEY_OPERATIONS.create, KEY_STATUSES.valid),
+                (KEY_OPERATIONS.pickup, KEY_STATUSES.valid),
+                (KEY_OPERATIONS.putback, KEY_STATUSES.ended),
+            ]
+        )
+
+    def journeys(self):
+        """
+        Yields the (Device serial, legs) of each journey made on the Bookings, in order of Car and
+        time. A journey is a list of one to three (start, stop, mileage in metres) legs, made
+        between 7am and 10pm local time.
+        """
+        rng = self.random('journeys')
+        serials = dict(Device.objects.filter(
+            serial__startswith=self.prefix + '-',
+        ).values_list(
+            'car_id', 'serial',
+        ))
+        bookings = Booking.objects.filter(
+            car_id__in=list(serials),
+        ).order_by(
+            'car_id', 'start_time',
+        ).values_list(
+            'car_id', 'start_time', 'end_time',
+        )
+        for car_id, start_time, end_time in bookings.iterator():
+            day = timezone.localtime(start_time).date()
+            while local_day_start(day) < end_time:
+                last_stop = start_time
+                journeys = rng.randint(0, 2 * self.trips_per_day)
+                for minute in sorted(rng.randint(7 * 60, 21 * 60) for journey in range(journeys)):
+                    leg_start = local_day_start(day) + datetime.timedelta(minutes=minute)
+                    legs = []
+                    for leg in range(rng.choice([1, 1, 2, 3])):
+                        minutes = rng.randint(5, 60)
+                        leg_stop = leg_start + datetime.timedelta(minutes=minutes, seconds=rng.randint(0, 59))
+                        legs.append((leg_start, leg_stop, int(minutes * rng.uniform(300, 1000))))
+                        leg_start = leg_stop + datetime.timedelta(minutes=rng.randint(1, 30))
+                    # Journeys don't overlap each other or fall outside the Booking
+                    if legs[0][0] >= last_stop and legs[-1][1] <= end_time:
+                        last_stop = legs[-1][1]
+                        yield serials[car_id], legs
+                day += datetime.timedelta(days=1)
+
+    def trip_records(self):
+        """
+        Yields a SureCam trip record for each journey, and one for each of its legs if it has more
+        than one, as children of the journey's trip.
+        """
+        self.driving_seconds = 0
+        for number, (serial, legs) in enumerate(self.journeys(), 1):
+            trip_id = '{}-T{}'.format(self.prefix, number)
+            yield self.trip_record(trip_id, serial, legs[0][0], legs[-1][1], sum(leg[2] for leg in legs))
+            if len(legs) > 1:
+                for leg_number, (start, stop, mileage) in enumerate(legs, 1):
+                    yield self.trip_record(
+                        '{}.{}'.format(trip_id, leg_number), serial, start, stop, mileage, parent_trip_id=trip_id,
+                    )
+            self.driving_seconds += sum((stop - start).total_seconds() for start, stop, mileage in legs)
+
+    def trip_record(self, trip_id, serial, start, stop, mileage, parent_trip_id=None):
+        return {
+            'trip_id': trip_id,
+            'serial': serial,
+            'start': start.astimezone(timezone.utc).isoformat(),
+            'stop': stop.astimezone(timezone.utc).isoformat(),
+            'mileage': mileage,
+            'state': 'finished',
+            'parent_trip_id': parent_trip_id,
+        }
+
+    def event_records(self):
+        """
+        Yields about ``events`` SureCam event records, spread over the journeys in proportion to
+        their driving time. Must follow trip_records(), which measures the driving time.
+        """
+        if not self.driving_seconds:
+            return
+        rng = self.random('events')
+        types, weights = zip(*EVENT_TYPE_WEIGHTS)
+        per_second = self.events / self.driving_seconds
+        number = 0
+        for serial, legs in self.journeys():
+            for start, stop, mileage in legs:
+                seconds = (stop - start).total_seconds()
+                count = int(seconds * per_second + rng.random())
+                offsets = sorted(rng.uniform(0, seconds) for event in range(count))
+                for offset, event_type in zip(offsets, rng.choices(types, weights, k=count)):
+                    number += 1
+                    yield {
+                        'event_id': '{}-E{}'.format(self.prefix, number),
+                        'serial': serial,
+                        'timestamp': (start + datetime.timedelta(seconds=offset)).astimezone(timezone.utc).isoformat(),
+                        'type': event_type,
+                    }
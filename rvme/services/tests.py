@@ -0,0 +1,276 @@
+import datetime
+import json
+import os
+import pstats
+import tempfile
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import got_request_exception
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rvme.bookings.models import Car
+from rvme.core.filters import PresentRelatedFieldListFilter
+from rvme.core.instrumentation import request_timings
+from rvme.core.testing import create_small_fleet
+from .aggregates import GroupingSet, grouping_sets
+from .benchmarks import render_summary, sample_filter_sets, summary_admins
+from .admin import TRIP_TIME_PERIODS
+from .constants import TELEMATICS_SOURCES
+from .models import (
+    ArchivedTripTotal, DailyPresence, EventDailyCount, EventSummary, TelematicsArchive, TripHourlyMileage,
+    TripSummary,
+)
+from .surecam.models import Event, Trip
+
+
+class ChangeListProfilingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+
+    def get_profiles(self):
+        return [
+            os.path.relpath(os.path.join(directory, name), self.profile_dir.name)
+            for directory, directories, names in os.walk(self.profile_dir.name) for name in names
+        ]
+
+    def test_profile_requested(self):
+        url = reverse('admin:services_tripsummary_changelist')
+        with override_settings(CHANGELIST_PROFILE_DIR=self.profile_dir.name):
+            response = self.client.get(url + '?car__id__exact=1&_profile=1')
+        self.assertEqual(response.status_code, 200)
+        profiles = self.get_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].startswith(os.path.join('services.tripsummary', 'car__id__exact=1', '')))
+        pstats.Stats(os.path.join(self.profile_dir.name, profiles[0]))
+
+    def test_profile_includes_rendering(self):
+        # The response is rendered as usual after the view, so is both profiled and timed
+        request_timings.clear()
+        self.addCleanup(request_timings.clear)
+        receivers = len(got_request_exception.receivers)
+        with override_settings(CHANGELIST_PROFILE_DIR=self.profile_dir.name):
+            self.client.get(reverse('admin:services_tripsummary_changelist') + '?_profile=1')
+        timing, = request_timings.timings()
+        profile, = self.get_profiles()
+        stats = pstats.Stats(os.path.join(self.profile_dir.name, profile)).stats
+        render_time, = [
+            cumulative for (filename, line, function), (calls, primitive, total, cumulative, callers) in stats.items()
+            if filename.endswith(os.path.join('django', 'template', 'response.py')) and function == 'render'
+        ]
+        # Much the same time, less the queries the template makes
+        self.assertGreater(timing.template_time, render_time / 2)
+        self.assertEqual(len(got_request_exception.receivers), receivers)
+
+    def test_profile_sampled(self):
+        url = reverse('admin:services_tripsummary_changelist')
+        with override_settings(CHANGELIST_PROFILE_DIR=self.profile_dir.name, CHANGELIST_PROFILE_SAMPLE_RATE=0):
+            self.client.get(url)
+        self.assertEqual(self.get_profiles(), [])
+        with override_settings(CHANGELIST_PROFILE_DIR=self.profile_dir.name, CHANGELIST_PROFILE_SAMPLE_RATE=1):
+            self.client.get(url)
+        self.assertEqual(len(self.get_profiles()), 1)
+
+
+class ReportPeriodFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_invalid_periods(self):
+        url = reverse('admin:services_utilisationsummary_changelist')
+        for query_string in [
+            'period_start=2019-02-30',
+            'period_end=2019-13-01',
+            'period_start=2019-02-10&period_end=2019-02-01',
+        ]:
+            with self.subTest(query_string=query_string):
+                response = self.client.get('{}?{}'.format(url, query_string))
+                self.assertRedirects(response, '{}?e=1'.format(url), fetch_redirect_response=False)
+
+
+class SummaryDateHierarchyTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_invalid_dates(self):
+        for url_name, query_string in [
+            ('admin:services_eventsummary_changelist', 'timestamp__year=2019&timestamp__month=2&timestamp__day=31'),
+            ('admin:services_eventsummary_changelist', 'timestamp__year=2019&timestamp__month=13'),
+            ('admin:services_tripsummary_changelist', 'stop__year=2019&stop__month=1&stop__day=32'),
+            ('admin:services_tripsummary_changelist', 'stop__year=x'),
+        ]:
+            with self.subTest(url_name=url_name, query_string=query_string):
+                url = reverse(url_name)
+                response = self.client.get('{}?{}'.format(url, query_string))
+                self.assertRedirects(response, '{}?e=1'.format(url), fetch_redirect_response=False)
+
+    def test_valid_date(self):
+        url = reverse('admin:services_tripsummary_changelist')
+        response = self.client.get(url + '?stop__year=2019&stop__month=2&stop__day=28')
+        self.assertEqual(response.status_code, 200)
+
+
+class TelematicsRollupTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+
+    def get_rollups(self):
+        return (
+            set(EventDailyCount.objects.values_list('day', 'car', 'user', 'type', 'count')),
+            set(DailyPresence.objects.values_list('source', 'day', 'car', 'user', 'count')),
+            set(TripHourlyMileage.objects.values_list('day', 'hour', 'car', 'user', 'trips', 'mileage')),
+        )
+
+    def rebuild(self):
+        EventDailyCount.objects.rebuild()
+        TripHourlyMileage.objects.rebuild()
+        for source in (TELEMATICS_SOURCES.event, TELEMATICS_SOURCES.trip):
+            DailyPresence.objects.rebuild(source)
+
+    def test_event_updates(self):
+        cars = list(Car.objects.order_by('pk'))
+        users = list(get_user_model().objects.order_by('pk'))
+        for event in Event.objects.order_by('pk')[:4]:
+            event.car = cars[-1] if event.car_id == cars[0].pk else cars[0]
+            event.user = users[-1] if event.user_id == users[0].pk else users[0]
+            event.type = 'start' if event.type != 'start' else 'stop'
+            event.timestamp -= datetime.timedelta(days=1)
+            event.save()
+        rollups = self.get_rollups()
+        self.rebuild()
+        self.assertEqual(self.get_rollups(), rollups)
+
+    def test_deletes(self):
+        # Every Event and leaf Trip of a Car, so their rows count down to zero and are deleted
+        car = Car.objects.order_by('pk').first()
+        for event in Event.objects.filter(car=car):
+            event.delete()
+        for trip in Trip.objects.filter(car=car).order_by('-depth'):
+            trip.delete()
+        rollups = self.get_rollups()
+        self.rebuild()
+        self.assertEqual(self.get_rollups(), rollups)
+
+
+class GroupingSetsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+
+    def test_matches_separate_queries(self):
+        trips = Trip.objects.annotate(hour=TRIP_TIME_PERIODS['hour'])
+        totals = {'total': Count('pk'), 'total_mileage': Sum('mileage')}
+        groupings = grouping_sets(
+            trips,
+            OrderedDict([
+                ('by_car', GroupingSet(('car__pk', 'car__registration_number'), {'is_root': True})),
+                ('by_hour', GroupingSet(('hour',), {'is_leaf': True})),
+                ('total', GroupingSet((), {'is_root': True})),
+                ('archived', GroupingSet((), {'is_root': True, 'car__pk': 0})),
+            ]),
+            extra_rows=[{'car__pk': 0, 'car__registration_number': 'ARCHIVED', 'is_root': True, 'total': 2,
+                         'total_mileage': 10}],
+            **totals
+        )
+
+        def sort(rows):
+            return sorted((dict(row) for row in rows), key=lambda row: sorted(row.items()))
+
+        self.assertEqual(sort(groupings['by_car']), sort(list(
+            trips.filter(is_root=True).values('car__pk', 'car__registration_number').annotate(**totals).order_by()
+        ) + [{'car__pk': 0, 'car__registration_number': 'ARCHIVED', 'total': 2, 'total_mileage': 10}]))
+        self.assertEqual(sort(groupings['by_hour']), sort(
+            trips.filter(is_leaf=True).values('hour').annotate(**totals).order_by()
+        ))
+        total = Trip.objects.filter(is_root=True).aggregate(**totals)
+        self.assertEqual([dict(row) for row in groupings['total']], [{
+            'total': total['total'] + 2, 'total_mileage': total['total_mileage'] + 10,
+        }])
+        self.assertEqual([dict(row) for row in groupings['archived']], [{'total': 2, 'total_mileage': 10}])
+
+
+class TelematicsArchiveTest(TestCase):
+    # Summary context the Event and Trip Summaries must show the same with their data archived,
+    # as well as the values their car and user filters list
+    SUMMARY_KEYS = [
+        'car_summary', 'car_summary_total', 'driver_summary', 'driver_event_summary', 'driver_event_summary_total',
+        'summary_by_hour', 'summary_by_weekday', 'summary_by_date', 'date_hierarchy_context',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        create_small_fleet(seed=1)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_summaries(self):
+        summaries = {}
+        for model_admin in summary_admins([EventSummary, TripSummary]):
+            for query_string in sample_filter_sets(model_admin):
+                context = render_summary(model_admin, query_string).context_data
+                for key in self.SUMMARY_KEYS:
+                    value = json.loads(json.dumps(context.get(key), cls=DjangoJSONEncoder))
+                    if isinstance(value, list):
+                        # Rows read from the archived totals may come in another order
+                        value.sort(key=lambda row: json.dumps(row, sort_keys=True))
+                    summaries[(model_admin.model._meta.label, query_string, key)] = value
+                PresentRelatedFieldListFilter.values_cache.clear()
+                for spec in context['cl'].filter_specs:
+                    if isinstance(spec, PresentRelatedFieldListFilter):
+                        values, has_empty = spec.get_present_values(context['cl'])
+                        summaries[(model_admin.model._meta.label, query_string, spec.field_path)] = (
+                            sorted(values), has_empty,
+                        )
+        return summaries
+
+    def test_rebuild_keeps_archived_month(self):
+        month = datetime.date(2019, 2, 1)
+        summaries = self.get_summaries()
+        for source in (TELEMATICS_SOURCES.event, TELEMATICS_SOURCES.trip):
+            self.assertTrue(TelematicsArchive.objects.archive(source, month))
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(Trip.objects.exists())
+        self.assertEqual(self.get_summaries(), summaries)
+
+        EventDailyCount.objects.rebuild(month, datetime.date(2019, 2, 28))
+        TripHourlyMileage.objects.rebuild(month, datetime.date(2019, 2, 28))
+        for source in (TELEMATICS_SOURCES.event, TELEMATICS_SOURCES.trip):
+            DailyPresence.objects.rebuild(source, month, datetime.date(2019, 2, 28))
+        self.assertEqual(self.get_summaries(), summaries)
+
+    def test_restore(self):
+        month = datetime.date(2019, 2, 1)
+        summaries = self.get_summaries()
+        for source in (TELEMATICS_SOURCES.event, TELEMATICS_SOURCES.trip):
+            TelematicsArchive.objects.restore(TelematicsArchive.objects.archive(source, month))
+        self.assertFalse(TelematicsArchive.objects.exists())
+        self.assertFalse(ArchivedTripTotal.objects.exists())
+        self.assertEqual(self.get_summaries(), summaries)
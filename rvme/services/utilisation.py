@@ -0,0 +1,113 @@
+import heapq
+from collections import OrderedDict
+from datetime import timedelta
+
+
+class FleetUtilisation(object):
+    """
+    Booked time per Car and peak concurrent Bookings per Location within a period, computed in a
+    single sweep over the Bookings in order of start time.
+
+    Overlapping Bookings of the same Car are only counted once towards its booked time. A Booking
+    counts towards the concurrency of its pick up Location, whether or not it has a Car.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.booked = {}
+        self.peaks = {}
+
+    @property
+    def available(self):
+        return self.end - self.start
+
+    def sweep(self, bookings):
+        """
+        :param bookings: iterable of (car_id, start_location_id, start_time, end_time), in order
+            of start_time
+        """
+        # The booked span still open for each Car, merged with any Bookings overlapping it
+        open_spans = {}
+        # Min-heap of the end times of the Bookings in progress at each Location
+        in_progress = {}
+        for car_id, location_id, start_time, end_time in bookings:
+            start_time, end_time = max(start_time, self.start), min(end_time, self.end)
+            if end_time <= start_time:
+                continue
+
+            if car_id is not None:
+                span = open_spans.get(car_id)
+                if span is None or start_time >= span[1]:
+                    if span is not None:
+                        self.booked[car_id] = self.booked.get(car_id, timedelta(0)) + span[1] - span[0]
+                    open_spans[car_id] = [start_time, end_time]
+                else:
+                    span[1] = max(span[1], end_time)
+
+            ends = in_progress.setdefault(location_id, [])
+            while ends and ends[0] <= start_time:
+                heapq.heappop(ends)
+            heapq.heappush(ends, end_time)
+            if len(ends) > self.peaks.get(location_id, (0, None))[0]:
+                self.peaks[location_id] = (len(ends), start_time)
+
+        for car_id, (start_time, end_time) in open_spans.items():
+            self.booked[car_id] = self.booked.get(car_id, timedelta(0)) + end_time - start_time
+        return self
+
+    def car_rows(self, cars):
+        """
+        Returns a row of booked and available hours for each of the Cars given, which should have
+        their model and car class selected.
+        """
+        return [
+            utilisation_row(
+                OrderedDict([
+                    ('car__pk', car.pk),
+                    ('car__registration_number', car.registration_number),
+                    ('car_class', str(car.model.car_class)),
+                ]),
+                self.booked.get(car.pk, timedelta(0)),
+                self.available,
+            )
+            for car in cars
+        ]
+
+    def class_rows(self, cars):
+        classes = OrderedDict()
+        for car in sorted(cars, key=lambda car: str(car.model.car_class)):
+            classes.setdefault(car.model.car_class, []).append(car)
+        return [
+            utilisation_row(
+                OrderedDict([('car_class', str(car_class)), ('cars', len(class_cars))]),
+                sum((self.booked.get(car.pk, timedelta(0)) for car in class_cars), timedelta(0)),
+                self.available * len(class_cars),
+            )
+            for car_class, class_cars in classes.items()
+        ]
+
+    def total_row(self, cars):
+        return utilisation_row(
+            OrderedDict([('cars', len(cars))]),
+            sum((self.booked.get(car.pk, timedelta(0)) for car in cars), timedelta(0)),
+            self.available * len(cars),
+        )
+
+    def location_rows(self, locations):
+        return [
+            OrderedDict([
+                ('location', location.name),
+                ('peak_bookings', self.peaks[location.pk][0]),
+                ('peak_at', self.peaks[location.pk][1]),
+            ])
+            for location in locations
+            if location.pk in self.peaks
+        ]
+
+
+def utilisation_row(row, booked, available):
+    row['booked_hours'] = round(booked.total_seconds() / 3600, 1)
+    row['available_hours'] = round(available.total_seconds() / 3600, 1)
+    row['utilisation'] = round(100 * booked / available, 1) if available else 0
+    return row
@@ -3,7 +3,14 @@ from django.conf.urls import url, include
 from django.conf.urls.static import static
 from django.contrib import admin
 
+from rvme.core.views import request_timings_view
+
 urlpatterns = [
+    url(
+        r'^admin/request-timings/$',
+        admin.site.admin_view(request_timings_view),
+        name='request_timings',
+    ),
     url(
         r'^admin/',
         admin.site.urls